@@ -0,0 +1,387 @@
+# Caches (mémoire et disque) pour les données externes (Banque Mondiale, OEC)
+#
+# Export d'un instantané du cache disque (à charger au démarrage via OEC_CACHE_SNAPSHOT) :
+# python backend/cache.py .cache/oec_top_producers.sqlite3 oec_snapshot.json --namespace top_producers
+
+import argparse
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class TTLCache:
+    """
+    Cache LRU borné avec durée de vie (TTL) et fenêtre stale-while-revalidate
+
+    Une entrée est « fraîche » pendant `ttl` secondes, puis « périmée » pendant
+    `stale_ttl` secondes supplémentaires : elle est encore servie pendant qu'un
+    rafraîchissement tourne en arrière-plan. Au-delà, elle est considérée absente.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 86400.0, stale_ttl: float = 86400.0,
+                 clock: Callable[[], float] = time.monotonic, refresh_backoff: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_backoff = refresh_backoff
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        # Clé -> instant avant lequel un rafraîchissement échoué n'est pas relancé
+        self._refresh_retry_at: Dict[Hashable, float] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], str]:
+        """Retourner (valeur, état) avec état parmi FRESH, STALE, MISS"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, MISS
+
+        value, stored_at = entry
+        age = self._clock() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None, MISS
+
+        self._entries.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return value, STALE
+        self.hits += 1
+        return value, FRESH
+
+    def state(self, key: Hashable) -> str:
+        """État d'une clé sans effet sur les compteurs ni sur l'ordre LRU"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISS
+        age = self._clock() - entry[1]
+        if age > self.ttl + self.stale_ttl:
+            return MISS
+        return STALE if age > self.ttl else FRESH
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value, state = self.lookup(key)
+        return default if state == MISS else value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (value, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Servir depuis le cache ou appeler `fetch`
+
+        Les résultats `None` (échec de la source) ne sont pas mis en cache.
+        Une entrée périmée est retournée immédiatement et rafraîchie en tâche de fond.
+        """
+        value, state = self.lookup(key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            self.refresh_in_background([key], lambda keys: self._fetch_one(key, fetch))
+            return value
+
+        value = await fetch()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    @staticmethod
+    async def _fetch_one(key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Optional[Dict[Hashable, Any]]:
+        value = await fetch()
+        return None if value is None else {key: value}
+
+    def refresh_in_background(self, keys: List[Hashable],
+                              fetch: Callable[[List[Hashable]], Awaitable[Optional[Dict[Hashable, Any]]]]) -> bool:
+        """
+        Rafraîchir en tâche de fond les clés périmées qui ne le sont pas déjà
+
+        `fetch(clés)` retourne {clé: valeur} (None en cas d'échec). Une clé en
+        cours de rafraîchissement, ou dont le dernier rafraîchissement a échoué
+        il y a moins de `refresh_backoff` secondes, est ignorée.
+        Retourne True si une tâche a été lancée.
+        """
+        now = self._clock()
+        keys = [
+            key for key in dict.fromkeys(keys)
+            if key not in self._refreshing and self._refresh_retry_at.get(key, 0.0) <= now
+        ]
+        if not keys:
+            return False
+
+        async def refresh():
+            try:
+                values = await fetch(keys)
+                if values is None:
+                    raise RuntimeError("source indisponible")
+                for key, value in values.items():
+                    self.set(key, value)
+                    self._refresh_retry_at.pop(key, None)
+                self.refreshes += 1
+            except Exception as e:
+                logging.warning(f"Rafraîchissement du cache échoué pour {len(keys)} clé(s): {e}")
+                retry_at = self._clock() + self.refresh_backoff
+                for key in keys:
+                    self._refresh_retry_at[key] = retry_at
+            finally:
+                for key in keys:
+                    self._refreshing.pop(key, None)
+
+        task = asyncio.create_task(refresh())
+        for key in keys:
+            self._refreshing[key] = task
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "background_refreshes": self.refreshes,
+            "refreshing": len(self._refreshing),
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+class PersistentCache:
+    """
+    Cache clé/valeur persistant (SQLite) qui survit aux redémarrages
+
+    Les valeurs sont sérialisées en JSON. `ttl` (secondes) définit l'expiration ;
+    les entrées expirées sont ignorées à la lecture et purgées par `purge_expired`.
+    Les `memory_size` dernières entrées lues ou écrites sont gardées en mémoire ;
+    depuis la boucle d'événements, utiliser `aget`/`aset`, qui confient les
+    accès SQLite à un thread.
+    """
+
+    def __init__(self, path: Union[str, Path], namespace: str = "default", ttl: Optional[float] = None,
+                 memory_size: int = 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.memory_size = memory_size
+        # clé -> (valeur JSON, stored_at) : une copie est décodée à chaque lecture
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _remember(self, key: str, value: str, stored_at: float):
+        """Appelé sous verrou"""
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _decode(self, entry: Optional[Tuple[str, float]]) -> Optional[Any]:
+        if entry is None or self._is_expired(entry[1]):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(entry[0])
+
+    def _from_memory(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._from_memory(key)
+        if entry is None:
+            with self._lock:
+                entry = self._conn.execute(
+                    "SELECT value, stored_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if entry is not None:
+                    self._remember(key, *entry)
+        return self._decode(entry)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() sans bloquer la boucle d'événements (SQLite lu dans un thread si l'entrée n'est pas en mémoire)"""
+        entry = self._from_memory(key)
+        if entry is not None:
+            return self._decode(entry)
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    async def aset(self, key: str, value: Any):
+        await asyncio.to_thread(self.set, key, value)
+
+    def set_many(self, items: Dict[str, Any], stored_at: Optional[float] = None):
+        """Écrire plusieurs entrées dans une seule transaction"""
+        stored_at = time.time() if stored_at is None else stored_at
+        rows = [(self.namespace, key, json.dumps(value), stored_at) for key, value in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            for _, key, value, _ in rows[-self.memory_size:]:
+                self._remember(key, value, stored_at)
+
+    def purge_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND stored_at < ?",
+                (self.namespace, cutoff)
+            )
+            self._conn.commit()
+            for key in [key for key, (_, stored_at) in self._memory.items() if stored_at < cutoff]:
+                del self._memory[key]
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def load_snapshot(self, snapshot_path: Union[str, Path]) -> int:
+        """
+        Précharger un instantané JSON {"generated_at": <epoch>, "entries": {clé: valeur}}
+
+        Retourne le nombre d'entrées chargées.
+        """
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        entries = snapshot.get("entries", {})
+        self.set_many(entries, stored_at=snapshot.get("generated_at"))
+        return len(entries)
+
+    def export_snapshot(self, snapshot_path: Union[str, Path]) -> int:
+        """Exporter les entrées non expirées dans un instantané JSON"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, stored_at FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchall()
+        entries = {key: json.loads(value) for key, value, stored_at in rows if not self._is_expired(stored_at)}
+        with open(snapshot_path, 'w', encoding='utf-8') as f:
+            json.dump({"generated_at": time.time(), "entries": entries}, f, ensure_ascii=False)
+        return len(entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "entries": len(self),
+            "in_memory": len(self._memory),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class SingleFlight:
+    """
+    Coalescence des appels concurrents identiques
+
+    Tant qu'un appel pour une clé est en cours, les appels suivants pour la même
+    clé attendent son résultat au lieu d'en lancer un nouveau.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.originated = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.originated += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield : l'annulation d'un appelant n'annule pas l'appel partagé
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "originated": self.originated,
+            "coalesced": self.coalesced,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporter un instantané JSON d'un cache disque (PersistentCache)")
+    parser.add_argument("database", help="Fichier SQLite du cache (ex. .cache/oec_top_producers.sqlite3)")
+    parser.add_argument("snapshot", help="Instantané JSON à écrire (à indiquer dans OEC_CACHE_SNAPSHOT)")
+    parser.add_argument("--namespace", default="top_producers", help="Espace de noms des entrées")
+    parser.add_argument("--ttl", type=float, default=None, help="N'exporter que les entrées de moins de TTL secondes")
+    args = parser.parse_args()
+    if not Path(args.database).exists():
+        parser.error(f"Cache introuvable: {args.database}")
+    cache = PersistentCache(args.database, namespace=args.namespace, ttl=args.ttl)
+    try:
+        exported = cache.export_snapshot(args.snapshot)
+    finally:
+        cache.close()
+    print(json.dumps({"snapshot": args.snapshot, "entries": exported}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Gestion des index MongoDB de comprehensive_calculations
+
+- ensure_calculation_indexes : création idempotente au démarrage de l'API
+- check_index_health : vérification des index attendus (exposée dans /api/health/status)
+- explain_benchmark : comparaison explain() scan complet vs index pour les
+  requêtes de /api/statistics, telles qu'émises par statistics_rollup
+
+Usage:
+    python backend/db_indexes.py              # créer les index et afficher leur état
+    python backend/db_indexes.py --benchmark  # comparer les plans d'exécution
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from statistics_rollup import BUCKET_INDEXES, ROLLUP_INDEXES, TOP_READS, StatisticsRollup, range_query, top_query
+
+CALCULATION_INDEXES = [
+    IndexModel([("destination_country", ASCENDING)], name="destination_country_1"),
+    IndexModel([("hs_code", ASCENDING)], name="hs_code_1"),
+    IndexModel([("timestamp", DESCENDING)], name="timestamp_-1"),
+    IndexModel(
+        [("origin_country", ASCENDING), ("destination_country", ASCENDING), ("hs_code", ASCENDING), ("timestamp", DESCENDING)],
+        name="corridor_hs_timestamp"
+    ),
+]
+
+ROLLUP_COLLECTION = "statistics_rollup"
+BUCKETS_COLLECTION = "statistics_buckets"
+
+
+def _expected_index_names() -> List[str]:
+    return [index.document["name"] for index in CALCULATION_INDEXES]
+
+
+async def ensure_calculation_indexes(collection) -> List[str]:
+    """Créer les index attendus (sans effet s'ils existent déjà)"""
+    return await collection.create_indexes(CALCULATION_INDEXES)
+
+
+async def check_index_health(collection) -> Dict[str, Any]:
+    """Comparer les index présents aux index attendus"""
+    present = await collection.index_information()
+    expected = _expected_index_names()
+    missing = [name for name in expected if name not in present]
+    return {
+        "status": "healthy" if not missing else "degraded",
+        "expected": expected,
+        "missing": missing,
+        "present_count": len(present),
+    }
+
+
+def benchmark_cases(now: datetime) -> List[tuple]:
+    """
+    Requêtes évaluées par le benchmark : (nom, collection, filtre, tri, limite, index attendu)
+
+    Ce sont les lectures de /api/statistics, construites par les mêmes
+    fonctions que StatisticsRollup (classements puis période de 7 jours).
+    """
+    # Index de la collection de cumul, par champ de tri
+    rollup_index = {list(index.document["key"])[1]: index.document["name"] for index in ROLLUP_INDEXES}
+    cases = []
+    for name, dimension, sort_field in TOP_READS:
+        query, sort = top_query(dimension, sort_field)
+        cases.append((name, ROLLUP_COLLECTION, query, sort, 10, rollup_index[sort_field]))
+    query, sort = range_query(now - timedelta(days=7), now, "day")
+    cases.append(("time_range_7_days", BUCKETS_COLLECTION, query, sort, 0, BUCKET_INDEXES[0].document["name"]))
+    return cases
+
+
+def _find_execution_stats(explain: Any) -> Dict[str, Any]:
+    """Extraire les compteurs d'exécution, quel que soit le format d'explain (classique ou SBE)"""
+    if isinstance(explain, dict):
+        stats = explain.get("executionStats")
+        if isinstance(stats, dict) and "totalDocsExamined" in stats:
+            return stats
+        for value in explain.values():
+            found = _find_execution_stats(value)
+            if found:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = _find_execution_stats(value)
+            if found:
+                return found
+    return {}
+
+
+async def _explain(db, collection_name: str, query: Dict[str, Any], sort: List[tuple], limit: int,
+                   hint) -> Dict[str, Any]:
+    find = {"find": collection_name, "filter": query, "sort": dict(sort), "hint": hint}
+    if limit:
+        find["limit"] = limit
+    result = await db.command({"explain": find, "verbosity": "executionStats"})
+    stats = _find_execution_stats(result)
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "execution_time_ms": stats.get("executionTimeMillis"),
+    }
+
+
+async def explain_benchmark(db) -> Dict[str, Any]:
+    """Comparer, pour chaque requête, un scan complet ($natural) et le plan indexé"""
+    report = {}
+    for name, collection_name, query, sort, limit, index_name in benchmark_cases(datetime.utcnow()):
+        collection_scan = await _explain(db, collection_name, query, sort, limit, {"$natural": 1})
+        indexed = await _explain(db, collection_name, query, sort, limit, index_name)
+        report[name] = {
+            "collection": collection_name,
+            "index": index_name,
+            "collection_scan": collection_scan,
+            "indexed": indexed,
+        }
+    return report
+
+
+async def _main(benchmark: bool):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        created = await ensure_calculation_indexes(db.comprehensive_calculations)
+        print(f"✅ Index assurés: {', '.join(created)}")
+        print(json.dumps(await check_index_health(db.comprehensive_calculations), indent=2))
+
+        if benchmark:
+            await StatisticsRollup(db[ROLLUP_COLLECTION], db.comprehensive_calculations,
+                                   db[BUCKETS_COLLECTION]).ensure_indexes()
+            rollup = await db[ROLLUP_COLLECTION].estimated_document_count()
+            buckets = await db[BUCKETS_COLLECTION].estimated_document_count()
+            print(f"\n📊 Benchmark explain() des lectures de /api/statistics "
+                  f"({rollup:,} compteurs, {buckets:,} compartiments)")
+            report = await explain_benchmark(db)
+            for name, result in report.items():
+                scan, indexed = result["collection_scan"], result["indexed"]
+                print(f"   • {name:25s} scan: {scan['docs_examined']} docs / {scan['execution_time_ms']} ms"
+                      f"  →  {result['index']}: {indexed['docs_examined']} docs, "
+                      f"{indexed['keys_examined']} clés / {indexed['execution_time_ms']} ms")
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index MongoDB des calculs ZLECAf")
+    parser.add_argument('--benchmark', action='store_true', help="Comparer les plans explain() avec et sans index")
+    args = parser.parse_args()
+    asyncio.run(_main(args.benchmark))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
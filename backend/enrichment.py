@@ -0,0 +1,77 @@
+# Données d'enrichissement d'un calcul tarifaire (APIs externes)
+# Le calcul des droits et taxes est local et immédiat ; les top producteurs
+# africains (OEC) et les indicateurs des pays (Banque mondiale) dépendent
+# d'APIs lentes et ne sont récupérés que lorsqu'ils sont demandés, dans la
+# limite d'un budget de latence par requête.
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+PRODUCERS = "producers"
+COUNTRY_DATA = "country_data"
+ENRICHMENTS = (PRODUCERS, COUNTRY_DATA)
+
+
+def parse_include(include: Optional[str]) -> Tuple[str, ...]:
+    """
+    Interpréter le paramètre `include` (liste séparée par des virgules)
+
+    Absent ou « all » : tous les enrichissements (comportement historique) ;
+    vide ou « none » : aucun. ValueError pour un enrichissement inconnu.
+    """
+    if include is None or include.strip() == "all":
+        return ENRICHMENTS
+    requested = {name.strip() for name in include.split(",") if name.strip()} - {"none"}
+    unknown = requested - set(ENRICHMENTS)
+    if unknown:
+        raise ValueError(f"Enrichissements inconnus: {', '.join(sorted(unknown))} ({', '.join(ENRICHMENTS)})")
+    return tuple(name for name in ENRICHMENTS if name in requested)
+
+
+def empty_enrichment() -> Dict[str, Any]:
+    return {"top_african_producers": [], "origin_country_data": {}, "destination_country_data": {}, "degraded": []}
+
+
+async def _within_budget(name: str, awaitable, budget: Optional[float]) -> Tuple[Any, bool]:
+    """(résultat de `awaitable`, False), ou (None, True) s'il n'est pas disponible dans le budget"""
+    if budget is None:
+        return await awaitable, False
+    try:
+        return await asyncio.wait_for(awaitable, timeout=budget), False
+    except asyncio.TimeoutError:
+        logging.warning(f"Enrichissement {name} hors budget ({budget:.2f}s), réponse partielle")
+        return None, True
+
+
+async def fetch_enrichment(oec_client, wb_client, hs_code: str, origin_wb_code: str, destination_wb_code: str,
+                           include: Tuple[str, ...] = ENRICHMENTS, budget: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Récupérer en parallèle les seuls enrichissements demandés
+
+    Les enrichissements non obtenus dans `budget` secondes sont listés dans
+    `degraded` et renvoyés à partir du cache (indicateurs Banque mondiale) ou
+    vides ; les appels des clients étant partagés (SingleFlight), ils se
+    poursuivent en arrière-plan et alimentent le cache pour les requêtes suivantes.
+    """
+    enrichment = empty_enrichment()
+    tasks = {}
+    if PRODUCERS in include:
+        tasks[PRODUCERS] = oec_client.get_top_producers(hs_code)
+    if COUNTRY_DATA in include:
+        tasks[COUNTRY_DATA] = wb_client.get_country_data([origin_wb_code, destination_wb_code])
+    if not tasks:
+        return enrichment
+
+    outcomes = await asyncio.gather(*(_within_budget(name, task, budget) for name, task in tasks.items()))
+    results = {name: value for name, (value, _) in zip(tasks, outcomes)}
+    enrichment["degraded"] = [name for name, (_, late) in zip(tasks, outcomes) if late]
+    if COUNTRY_DATA in enrichment["degraded"]:
+        results[COUNTRY_DATA] = wb_client.cached_country_data([origin_wb_code, destination_wb_code])
+    if PRODUCERS in results:
+        enrichment["top_african_producers"] = results[PRODUCERS] or []
+    if COUNTRY_DATA in results:
+        wb_data = results[COUNTRY_DATA] or {}
+        enrichment["origin_country_data"] = wb_data.get(origin_wb_code, {})
+        enrichment["destination_country_data"] = wb_data.get(destination_wb_code, {})
+    return enrichment
@@ -0,0 +1,117 @@
+# Diffusion d'événements serveur (Server-Sent Events)
+# Les producteurs (statistiques cumulées, travaux de calcul) publient des
+# événements ; chaque client abonné dispose d'une file bornée, vidée par le
+# flux text/event-stream de /api/events.
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Collection, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sujets publiés
+TOPICS = ("statistics", "job")
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Encoder un événement au format text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    for line in json.dumps(data, ensure_ascii=False, default=_json_default).split("\n"):
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """File d'un client abonné, filtrée par sujets et éventuellement par prédicat"""
+
+    def __init__(self, topics: Collection[str], max_queue: int,
+                 accept: Optional[Callable[[str, Any], bool]] = None):
+        self.topics = set(topics)
+        self.accept = accept
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def wants(self, topic: str, data: Any) -> bool:
+        return topic in self.topics and (self.accept is None or self.accept(topic, data))
+
+
+class EventBroadcaster:
+    """
+    Diffuseur en mémoire vers les clients SSE du processus
+
+    Un client trop lent ne ralentit pas les producteurs : lorsque sa file est
+    pleine, l'événement le plus ancien est abandonné.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscriptions: Set[Subscription] = set()
+        self._next_id = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, topics: Collection[str] = TOPICS,
+                  accept: Optional[Callable[[str, Any], bool]] = None) -> Subscription:
+        subscription = Subscription(topics, self.max_queue, accept)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, topic: str, data: Any):
+        """Publier un événement vers tous les abonnés intéressés (sans attente)"""
+        self._next_id += 1
+        self.published += 1
+        event = (self._next_id, topic, data)
+        for subscription in list(self._subscriptions):
+            if not subscription.wants(topic, data):
+                continue
+            if subscription.queue.full():
+                subscription.queue.get_nowait()
+                subscription.dropped += 1
+                self.dropped += 1
+            subscription.queue.put_nowait(event)
+
+    async def stream(self, subscription: Subscription, initial: Iterable[Tuple[str, Any]] = (),
+                     heartbeat: float = 15.0,
+                     stale: Optional[Callable[[str, Any], bool]] = None) -> AsyncIterator[str]:
+        """
+        Flux text/event-stream d'un abonné
+
+        Les événements `initial` (instantané) sont envoyés d'abord ; les
+        événements reçus entre l'abonnement et l'instantané restent dans la
+        file et ceux que `stale` déclare déjà inclus dans l'instantané sont
+        écartés. Un commentaire keep-alive est émis après `heartbeat` secondes
+        sans événement.
+        """
+        try:
+            for topic, data in initial:
+                yield format_sse(topic, data)
+            while True:
+                try:
+                    event_id, topic, data = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if stale is not None and stale(topic, data):
+                    continue
+                yield format_sse(topic, data, event_id)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
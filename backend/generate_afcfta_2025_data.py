@@ -48,6 +48,7 @@ DISMANTLING_CATEGORIES = {
     "C": {"name": "Category C", "description": "Linear reduction to 0% over 13 years", "years": 13},
     "Sensitive": {"name": "Sensitive", "description": "Linear reduction to 0% over 15 years", "years": 15},
     "Excluded": {"name": "Excluded", "description": "Excluded from liberalization", "years": None},
+    "Immediate": {"name": "Immediate", "description": "Immediate dismantling - 0% from start", "years": 0},
 }
 
 
@@ -0,0 +1,380 @@
+# File de travaux de calcul pour les très gros lots
+# Un travail est découpé en blocs persistés dans MongoDB ; un nombre borné de
+# workers asyncio traite les travaux et confie chaque bloc (calcul NumPy) à un
+# pool de processus, pour ne jamais bloquer la boucle d'événements qui sert
+# /calculate-tariff. L'état étant en base, les travaux inachevés reprennent
+# au redémarrage à partir du premier bloc non traité. Un travail est réservé
+# par une seule instance à la fois (propriétaire et bail renouvelé à chaque
+# bloc) ; un bail expiré permet à une autre instance de le reprendre. Un
+# travail en cours de réception porte aussi un bail, renouvelé à chaque bloc
+# écrit : expiré, le travail et ses blocs sont supprimés.
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import Executor
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from landed_cost import BATCH_TOTAL_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+RECEIVING = "receiving"
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Calcul d'un bloc : expéditions -> (lignes de résultat, totaux du bloc)
+ChunkCompute = Callable[[List[Dict[str, Any]]], Tuple[List[Dict[str, Any]], Dict[str, float]]]
+
+
+# Calcul dans les processus du pool : le moteur tarifaire est chargé une fois
+# par processus par l'initialiseur, puis réutilisé pour chaque bloc.
+_process_engine = None
+
+
+def init_process_engine(data_dir: str, countries: List[str], iso3_to_iso2: Dict[str, str]):
+    """Initialiseur du pool de processus : charger le moteur tarifaire"""
+    global _process_engine
+    from tariff_engine import TariffEngine
+    _process_engine = TariffEngine.load(data_dir, countries, iso3_to_iso2)
+
+
+def compute_tariff_chunk(shipments: List[Dict[str, Any]], engine=None) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """Calculer un bloc d'expéditions avec calculate_tariff_batch"""
+    from landed_cost import calculate_tariff_batch
+    engine = engine or _process_engine
+    columns = calculate_tariff_batch(
+        engine,
+        destinations=[s["destination_country"] for s in shipments],
+        hs_codes=[s["hs_code"] for s in shipments],
+        values=[s["value"] for s in shipments],
+        years=[s.get("year") for s in shipments],
+    )
+    names = list(columns.keys())
+    rows = [
+        {
+            "origin_country": shipment["origin_country"],
+            "destination_country": shipment["destination_country"],
+            "hs_code": shipment["hs_code"],
+            "year": shipment.get("year"),
+            **dict(zip(names, row)),
+        }
+        for shipment, row in zip(shipments, zip(*(columns[name].tolist() for name in names)))
+    ]
+    totals = {name: float(columns[name].sum()) for name in BATCH_TOTAL_COLUMNS}
+    return rows, totals
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Document de travail tel qu'exposé par l'API"""
+    job = {key: value for key, value in job.items() if key != "_id"}
+    total = job.get("total") or 0
+    job["progress"] = job.get("processed", 0) / total * 100 if total else 100.0
+    totals = job.get("totals") or {}
+    normal_total = totals.get("normal_total_cost", 0)
+    if totals:
+        totals["total_savings_percentage"] = (
+            totals.get("total_savings_with_taxes", 0) / normal_total * 100 if normal_total > 0 else 0
+        )
+    return job
+
+
+async def _iterate(items: Union[Iterable, AsyncIterable]):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class JobQueue:
+    """
+    Travaux de calcul persistés, traités par `workers` tâches asyncio
+
+    `jobs` contient un document par travail (statut, progression, totaux),
+    `chunks` un document par bloc (expéditions puis lignes de résultat).
+    `on_progress` est appelé avec le document public après chaque bloc.
+    Au plus `max_pending` travaux attendent dans la file locale ; les travaux
+    repris au démarrage ou après expiration d'un bail s'y ajoutent toujours.
+    """
+
+    def __init__(self, jobs_collection, chunks_collection, compute: ChunkCompute,
+                 executor: Optional[Executor] = None, workers: int = 2, chunk_size: int = 2000,
+                 max_pending: int = 100, name: str = "jobs", lease: float = 300.0,
+                 on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.jobs = jobs_collection
+        self.chunks = chunks_collection
+        self.compute = compute
+        self.executor = executor
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending
+        self.name = name
+        self.lease = lease
+        self.on_progress = on_progress
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[str] = set()
+        self._receiving = 0
+        self._tasks: List[asyncio.Task] = []
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def ensure_indexes(self):
+        await self.chunks.create_index([("job_id", 1), ("index", 1)], unique=True)
+        await self.jobs.create_index([("status", 1), ("created_at", 1)])
+
+    async def start(self):
+        """Démarrer les workers et remettre en file les travaux inachevés"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._queued = set()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+        await self._reap()
+        await self._requeue()
+        self._watcher = asyncio.create_task(self._watch(), name=f"{self.name}-leases")
+
+    def _claimable(self) -> Dict[str, Any]:
+        """Travaux en file, ou en cours dont le bail a expiré (instance arrêtée)"""
+        return {"$or": [
+            {"status": QUEUED},
+            {"status": RUNNING, "lease_expires_at": {"$lt": datetime.utcnow()}},
+        ]}
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _requeue(self):
+        cursor = self.jobs.find(self._claimable(), {"_id": 1}).sort("created_at", 1)
+        async for job in cursor:
+            if job["_id"] not in self._queued:
+                logger.info(f"{self.name}: reprise du travail {job['_id']}")
+                self._enqueue(job["_id"])
+
+    async def _reap(self):
+        """Supprimer les travaux restés en réception après l'arrêt de leur instance (bail expiré)"""
+        expired = {"status": RECEIVING, "lease_expires_at": {"$lt": datetime.utcnow()}}
+        async for job in self.jobs.find(expired, {"_id": 1}):
+            result = await self.jobs.delete_one({"_id": job["_id"], **expired})
+            if result.deleted_count:
+                await self.chunks.delete_many({"job_id": job["_id"]})
+                logger.warning(f"{self.name}: réception interrompue, travail {job['_id']} supprimé")
+
+    async def _watch(self):
+        """Reprendre périodiquement les travaux dont le bail a expiré"""
+        while True:
+            await asyncio.sleep(self.lease / 2)
+            try:
+                await self._reap()
+                await self._requeue()
+            except Exception as e:
+                logger.error(f"{self.name}: reprise des travaux impossible: {e}")
+
+    async def submit(self, shipments: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Enregistrer un travail et le mettre en file (RuntimeError si la file est pleine)
+
+        Les expéditions peuvent être produites en flux : chaque bloc est écrit
+        dès qu'il est complet. Si l'itération échoue, le travail et ses blocs
+        sont supprimés et l'exception est propagée.
+        """
+        if self._queue is None:
+            await self.start()
+        # Réservation d'une place avant toute attente : pas de course entre soumissions
+        if len(self._queued) + self._receiving >= self.max_pending:
+            raise RuntimeError(f"{self.name}: file pleine ({self.max_pending} travaux en attente)")
+        self._receiving += 1
+        try:
+            job = await self._receive(shipments)
+            self._enqueue(job["_id"])
+        finally:
+            self._receiving -= 1
+        return _public(job)
+
+    async def _receive(self, shipments) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+        job = {
+            "_id": job_id,
+            "id": job_id,
+            "status": RECEIVING,
+            "total": 0,
+            "processed": 0,
+            "chunks": 0,
+            "chunks_done": 0,
+            "totals": {name: 0.0 for name in BATCH_TOTAL_COLUMNS},
+            "error": None,
+            "owner": self.owner,
+            "lease_expires_at": self._lease_expiry(),
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        await self.jobs.insert_one(dict(job))
+        try:
+            chunk: List[Dict[str, Any]] = []
+            async for shipment in _iterate(shipments):
+                chunk.append(shipment)
+                if len(chunk) >= self.chunk_size:
+                    await self._write_chunk(job, chunk)
+                    chunk = []
+            if chunk:
+                await self._write_chunk(job, chunk)
+            job["status"] = QUEUED
+            await self.jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": QUEUED, "total": job["total"], "chunks": job["chunks"],
+                          "owner": None, "lease_expires_at": None}}
+            )
+        except BaseException:
+            await self.chunks.delete_many({"job_id": job_id})
+            await self.jobs.delete_one({"_id": job_id})
+            raise
+        return job
+
+    async def _write_chunk(self, job: Dict[str, Any], shipments: List[Dict[str, Any]]):
+        await self.chunks.insert_one({
+            "job_id": job["_id"],
+            "index": job["chunks"],
+            "done": False,
+            "shipments": shipments,
+            "results": None,
+        })
+        job["chunks"] += 1
+        job["total"] += len(shipments)
+        renewed = await self.jobs.update_one(
+            {"_id": job["_id"], "status": RECEIVING, "owner": self.owner},
+            {"$set": {"lease_expires_at": self._lease_expiry()}}
+        )
+        if not renewed.modified_count:
+            raise RuntimeError(f"{self.name}: bail de réception du travail {job['_id']} expiré")
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.jobs.find_one({"_id": job_id})
+        return _public(job) if job else None
+
+    async def iter_results(self, job_id: str):
+        """Lignes de résultat d'un travail, bloc par bloc, dans l'ordre de soumission"""
+        cursor = self.chunks.find({"job_id": job_id, "done": True}, {"results": 1, "_id": 0}).sort("index", 1)
+        async for chunk in cursor:
+            for row in chunk["results"]:
+                yield row
+
+    async def _run(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name}: échec du travail {job_id}: {e}")
+                await self.jobs.update_one(
+                    {"_id": job_id, "owner": self.owner},
+                    {"$set": {"status": FAILED, "error": str(e), "finished_at": datetime.utcnow()}}
+                )
+                await self._notify(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease)
+
+    async def _process(self, job_id: str):
+        # Réservation atomique : un travail déjà pris (bail en cours) ou terminé est ignoré
+        claimed = await self.jobs.find_one_and_update(
+            {"_id": job_id, **self._claimable()},
+            {"$set": {
+                "status": RUNNING,
+                "owner": self.owner,
+                "lease_expires_at": self._lease_expiry(),
+                "started_at": datetime.utcnow(),
+            }}
+        )
+        if claimed is None:
+            return
+        mine = {"_id": job_id, "owner": self.owner}
+        loop = asyncio.get_running_loop()
+        cursor = self.chunks.find({"job_id": job_id, "done": False}, {"index": 1, "shipments": 1}).sort("index", 1)
+        async for chunk in cursor:
+            rows, totals = await loop.run_in_executor(self.executor, self.compute, chunk["shipments"])
+            # Un bloc déjà enregistré par une autre instance n'est pas compté deux fois
+            result = await self.chunks.update_one(
+                {"_id": chunk["_id"], "done": False},
+                {"$set": {"done": True, "results": rows, "shipments": []}}
+            )
+            update = {"$set": {"lease_expires_at": self._lease_expiry()}}
+            if result.modified_count:
+                update["$inc"] = {
+                    "processed": len(rows),
+                    "chunks_done": 1,
+                    **{f"totals.{name}": value for name, value in totals.items()},
+                }
+            await self.jobs.update_one(mine, update)
+            await self._notify(job_id)
+
+        await self.jobs.update_one(
+            mine,
+            {"$set": {"status": COMPLETED, "finished_at": datetime.utcnow(), "lease_expires_at": None}}
+        )
+        await self._notify(job_id)
+
+    async def _notify(self, job_id: str):
+        if self.on_progress is None:
+            return
+        try:
+            job = await self.status(job_id)
+            if job is not None:
+                result = self.on_progress(job)
+                if asyncio.iscoroutine(result):
+                    await result
+        except Exception as e:
+            logger.error(f"{self.name}: échec de la notification de progression: {e}")
+
+    async def stop(self):
+        """Arrêter les workers ; les travaux en cours sont remis en file pour la prochaine instance"""
+        tasks = self._tasks + ([self._watcher] if self._watcher is not None else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._watcher = None
+        # Rendre les travaux interrompus sans attendre l'expiration du bail
+        try:
+            await self.jobs.update_many(
+                {"owner": self.owner, "status": RUNNING},
+                {"$set": {"status": QUEUED, "lease_expires_at": None}}
+            )
+        except Exception as e:
+            logger.error(f"{self.name}: libération des travaux impossible: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "pending": len(self._queued),
+            "receiving": self._receiving,
+            "max_pending": self.max_pending,
+            "chunk_size": self.chunk_size,
+            "lease": self.lease,
+            "owner": self.owner,
+        }
@@ -0,0 +1,252 @@
+# Moteur vectorisé de calcul du coût de revient (droits + TVA + prélèvements)
+# Applique la formule de tax_rates.calculate_all_taxes sur des tableaux NumPy
+# afin de traiter un manifeste complet en une seule passe.
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from tariff_engine import TariffEngine
+
+
+def destination_tax_rates(engine: TariffEngine, columns: np.ndarray) -> Dict[str, np.ndarray]:
+    """Taux de TVA et de prélèvements (en %) pour des colonnes pays du moteur tarifaire"""
+    return {
+        "vat_rate": engine.vat_rate[columns],
+        "statistical_fee_rate": engine.statistical_fee_rate[columns],
+        "community_levy_rate": engine.community_levy_rate[columns],
+        "ecowas_levy_rate": engine.ecowas_levy_rate[columns],
+    }
+
+
+def calculate_all_taxes_vectorized(values: np.ndarray, customs_duties: np.ndarray,
+                                   rates: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Équivalent vectorisé de calculate_all_taxes
+
+    `rates` provient de destination_tax_rates() et doit être aligné sur `values`.
+    """
+    statistical_fee = values * (rates["statistical_fee_rate"] / 100)
+    community_levy = values * (rates["community_levy_rate"] / 100)
+    ecowas_levy = values * (rates["ecowas_levy_rate"] / 100)
+
+    vat_base = values + customs_duties + statistical_fee + community_levy + ecowas_levy
+    vat_amount = vat_base * (rates["vat_rate"] / 100)
+
+    other_taxes_total = statistical_fee + community_levy + ecowas_levy
+    total_cost = values + customs_duties + vat_amount + other_taxes_total
+
+    return {
+        "vat_rate": rates["vat_rate"],
+        "vat_amount": vat_amount,
+        "statistical_fee_amount": statistical_fee,
+        "community_levy_amount": community_levy,
+        "ecowas_levy_amount": ecowas_levy,
+        "other_taxes_total": other_taxes_total,
+        "vat_base": vat_base,
+        "total_cost": total_cost,
+    }
+
+
+def total_costs(engine: TariffEngine, columns: np.ndarray, values: np.ndarray,
+                customs_duties: np.ndarray) -> np.ndarray:
+    """Coûts de revient totaux par les coefficients affines (sans détail des taxes)"""
+    return engine.value_coefficient[columns] * values + engine.duty_coefficient[columns] * customs_duties
+
+
+def _percentage(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Pourcentage numerator/denominator, 0 lorsque le dénominateur est nul"""
+    result = np.zeros_like(numerator, dtype=float)
+    np.divide(numerator * 100, denominator, out=result, where=denominator > 0)
+    return result
+
+
+def _landed_cost_columns(values: np.ndarray, normal_rate: np.ndarray, zlecaf_rate: np.ndarray,
+                         rates: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Droits, taxes et économies pour des vecteurs alignés de valeurs et de taux"""
+    normal_amount = values * normal_rate
+    zlecaf_amount = values * zlecaf_rate
+    savings = normal_amount - zlecaf_amount
+
+    normal_taxes = calculate_all_taxes_vectorized(values, normal_amount, rates)
+    zlecaf_taxes = calculate_all_taxes_vectorized(values, zlecaf_amount, rates)
+
+    total_savings_with_taxes = normal_taxes["total_cost"] - zlecaf_taxes["total_cost"]
+
+    return {
+        "value": values,
+        "normal_tariff_rate": normal_rate,
+        "normal_tariff_amount": normal_amount,
+        "zlecaf_tariff_rate": zlecaf_rate,
+        "zlecaf_tariff_amount": zlecaf_amount,
+        "normal_vat_rate": normal_taxes["vat_rate"],
+        "normal_vat_amount": normal_taxes["vat_amount"],
+        "normal_statistical_fee": normal_taxes["statistical_fee_amount"],
+        "normal_community_levy": normal_taxes["community_levy_amount"],
+        "normal_ecowas_levy": normal_taxes["ecowas_levy_amount"],
+        "normal_other_taxes_total": normal_taxes["other_taxes_total"],
+        "normal_total_cost": normal_taxes["total_cost"],
+        "zlecaf_vat_rate": zlecaf_taxes["vat_rate"],
+        "zlecaf_vat_amount": zlecaf_taxes["vat_amount"],
+        "zlecaf_statistical_fee": zlecaf_taxes["statistical_fee_amount"],
+        "zlecaf_community_levy": zlecaf_taxes["community_levy_amount"],
+        "zlecaf_ecowas_levy": zlecaf_taxes["ecowas_levy_amount"],
+        "zlecaf_other_taxes_total": zlecaf_taxes["other_taxes_total"],
+        "zlecaf_total_cost": zlecaf_taxes["total_cost"],
+        "savings": savings,
+        "savings_percentage": _percentage(savings, normal_amount),
+        "total_savings_with_taxes": total_savings_with_taxes,
+        "total_savings_percentage": _percentage(total_savings_with_taxes, normal_taxes["total_cost"]),
+    }
+
+
+def calculate_tariff_batch(engine: TariffEngine, destinations: Iterable[str], hs_codes: Iterable[str],
+                           values: Iterable[float],
+                           years: Optional[Iterable[Optional[int]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Calculer droits, taxes et économies NPF vs ZLECAf pour tout un lot d'expéditions
+
+    Les taux sont lus dans les matrices du moteur tarifaire (mêmes taux que le
+    calcul unitaire), à l'année demandée pour chaque ligne. Les colonnes
+    renvoyées portent les mêmes noms que les champs de TariffCalculationResponse.
+    """
+    destinations = list(destinations)
+    columns = engine.columns_for(destinations)
+    values = np.asarray(list(values), dtype=float)
+
+    normal_rate, zlecaf_rate = engine.resolve_many(hs_codes, destinations, years)
+
+    return _landed_cost_columns(values, normal_rate, zlecaf_rate, destination_tax_rates(engine, columns))
+
+
+def calculate_tariff_trajectory(engine: TariffEngine, destination: str, hs_code: str, value: float,
+                                years: Iterable[int]) -> Dict[str, np.ndarray]:
+    """
+    Coût de revient d'une expédition pour chaque année du calendrier de démantèlement
+
+    Une seule ligne du cube annuel est lue puis tout le calcul est fait sur
+    l'axe des années ; les colonnes sont celles de calculate_tariff_batch plus `year`.
+    """
+    years = np.asarray(list(years), dtype=int)
+    row = engine.row_for(hs_code)
+    column = engine.country_index[destination]
+    indices = engine.year_indices(years)
+
+    values = np.full(len(years), float(value))
+    normal_rate = np.full(len(years), engine.normal_rates[row, column])
+    zlecaf_rate = engine.zlecaf_rates_by_year[row, column, indices]
+    columns = np.full(len(years), column, dtype=np.intp)
+
+    return {"year": years, **_landed_cost_columns(values, normal_rate, zlecaf_rate, destination_tax_rates(engine, columns))}
+
+
+def solve_max_values(engine: TariffEngine, destinations: Iterable[str], hs_code: str,
+                     target_total_cost: float, year: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Valeur FOB maximale donnant un coût de revient total `target_total_cost`
+
+    Inverse exact de total = a·valeur + b·(taux·valeur), soit
+    valeur = total / (a + b·taux), pour les régimes NPF et ZLECAf.
+    """
+    destinations = list(destinations)
+    columns = engine.columns_for(destinations)
+    normal_rate, zlecaf_rate = engine.resolve_many([hs_code] * len(destinations), destinations,
+                                                   None if year is None else [year] * len(destinations))
+    a = engine.value_coefficient[columns]
+    b = engine.duty_coefficient[columns]
+
+    normal_value = target_total_cost / (a + b * normal_rate)
+    zlecaf_value = target_total_cost / (a + b * zlecaf_rate)
+    value_gain = zlecaf_value - normal_value
+
+    return {
+        "destination_country": np.asarray(destinations, dtype=str),
+        "normal_tariff_rate": normal_rate,
+        "zlecaf_tariff_rate": zlecaf_rate,
+        "normal_max_value": normal_value,
+        "zlecaf_max_value": zlecaf_value,
+        "value_gain": value_gain,
+        "value_gain_percentage": _percentage(value_gain, normal_value),
+    }
+
+
+# Matrices de corridors par unité de valeur, mémorisées par (version des taux, chapitre, année)
+CORRIDOR_MEMO_SIZE = 256
+_corridor_memo: "OrderedDict[Tuple[str, str, Optional[int]], Dict[str, np.ndarray]]" = OrderedDict()
+
+
+def corridor_savings_matrix(engine: TariffEngine, chapter: str, value: float,
+                            year: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Économies ZLECAf origine x destination pour un chapitre SH et une valeur de référence
+
+    Droits et taxes sont linéaires en la valeur : les économies par unité de
+    valeur sont calculées une fois par destination (coefficients affines du
+    moteur), diffusées sur l'axe des origines puis mémorisées ; seule la mise
+    à l'échelle dépend de `value`.
+    La diagonale (origine = destination) vaut NaN.
+    """
+    key = (engine.version, chapter, year)
+    unit = _corridor_memo.get(key)
+    if unit is None:
+        n_countries = len(engine.countries)
+        destinations = np.arange(n_countries, dtype=np.intp)
+        row = engine.row_for(chapter)
+        normal_duty = engine.normal_rates[row]
+        zlecaf_duty = engine.zlecaf_rates[row] if year is None else engine.zlecaf_rates_by_year[row, :, engine.year_index(year)]
+        ones = np.ones(n_countries)
+        normal_total = total_costs(engine, destinations, ones, normal_duty)
+        total_savings = normal_total - total_costs(engine, destinations, ones, zlecaf_duty)
+        per_destination = {
+            "savings": normal_duty - zlecaf_duty,
+            "total_savings_with_taxes": total_savings,
+            "total_savings_percentage": _percentage(total_savings, normal_total),
+        }
+
+        unit = {}
+        for name in ("savings", "total_savings_with_taxes", "total_savings_percentage"):
+            matrix = np.tile(per_destination[name], (n_countries, 1))
+            np.fill_diagonal(matrix, np.nan)
+            matrix.setflags(write=False)
+            unit[name] = matrix
+        _corridor_memo[key] = unit
+        if len(_corridor_memo) > CORRIDOR_MEMO_SIZE:
+            _corridor_memo.popitem(last=False)
+    else:
+        _corridor_memo.move_to_end(key)
+
+    return {
+        "savings": unit["savings"] * value,
+        "total_savings_with_taxes": unit["total_savings_with_taxes"] * value,
+        # Pourcentage indépendant de la valeur (nul pour une valeur nulle, comme le calcul unitaire)
+        "total_savings_percentage": unit["total_savings_percentage"] if value > 0 else np.where(
+            np.isnan(unit["total_savings_percentage"]), np.nan, 0.0
+        ),
+    }
+
+
+# Colonnes sommées dans les totaux d'un lot
+BATCH_TOTAL_COLUMNS = [
+    "value",
+    "normal_tariff_amount",
+    "zlecaf_tariff_amount",
+    "normal_vat_amount",
+    "zlecaf_vat_amount",
+    "normal_other_taxes_total",
+    "zlecaf_other_taxes_total",
+    "normal_total_cost",
+    "zlecaf_total_cost",
+    "savings",
+    "total_savings_with_taxes",
+]
+
+
+def summarize_batch(columns: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """Totaux agrégés d'un lot calculé par calculate_tariff_batch"""
+    totals = {name: float(columns[name].sum()) for name in BATCH_TOTAL_COLUMNS}
+    normal_total = totals["normal_total_cost"]
+    totals["total_savings_percentage"] = (
+        totals["total_savings_with_taxes"] / normal_total * 100 if normal_total > 0 else 0
+    )
+    return totals
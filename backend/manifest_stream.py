@@ -0,0 +1,214 @@
+# Calcul en flux de manifestes volumineux (CSV ou NDJSON)
+# Le corps de la requête est lu par morceaux, découpé en lignes, regroupé en
+# blocs de taille fixe calculés par landed_cost.calculate_tariff_batch, et les
+# résultats sont renvoyés en NDJSON au fil de l'eau : la mémoire utilisée ne
+# dépend que de la taille d'un bloc, pas de celle du fichier.
+
+import codecs
+import csv
+import json
+import math
+from typing import Any, AsyncIterator, Collection, Dict, List, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from landed_cost import BATCH_TOTAL_COLUMNS, calculate_tariff_batch
+from tariff_engine import TariffEngine
+
+FORMATS = ("csv", "ndjson")
+
+# Champs d'une expédition (mêmes noms que TariffCalculationRequest)
+SHIPMENT_FIELDS = ("origin_country", "destination_country", "hs_code", "value", "year")
+
+# Longueur maximale d'une ligne (caractères) ; au-delà la ligne est rejetée
+MAX_LINE_LENGTH = 64 * 1024
+
+
+def schedule_years(engine: TariffEngine) -> range:
+    """Années couvertes par le calendrier de démantèlement du moteur"""
+    return range(int(engine.years[0]), int(engine.years[-1]) + 1)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = "utf-8",
+                     max_line_length: int = MAX_LINE_LENGTH) -> AsyncIterator[Optional[str]]:
+    """
+    Découper un flux d'octets en lignes de texte, sans le lire en entier
+
+    Seul le texte nouvellement décodé est parcouru à chaque morceau. Une ligne
+    de plus de `max_line_length` caractères est abandonnée au fil de la
+    lecture et remplacée par None ; la lecture reprend à la ligne suivante.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parts: List[str] = []
+    length = 0
+    too_long = False
+
+    def take(text: str):
+        nonlocal length, too_long, parts
+        length += len(text)
+        if length > max_line_length:
+            too_long, parts = True, []
+        elif text:
+            parts.append(text)
+
+    def line_end() -> Optional[str]:
+        nonlocal length, too_long, parts
+        line = None if too_long else "".join(parts).rstrip("\r")
+        parts, length, too_long = [], 0, False
+        return line
+
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        start = 0
+        end = text.find("\n")
+        while end >= 0:
+            take(text[start:end])
+            yield line_end()
+            start = end + 1
+            end = text.find("\n", start)
+        take(text[start:])
+    take(decoder.decode(b"", final=True))
+    if too_long or parts:
+        yield line_end()
+
+
+def _parse_shipment(record: Dict[str, Any], valid_countries: Collection[str],
+                    years: Optional[range] = None) -> Dict[str, Any]:
+    """Valider et convertir une expédition ; ValueError si elle est invalide"""
+    missing = [field for field in SHIPMENT_FIELDS[:4] if record.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Champs manquants: {', '.join(missing)}")
+    shipment = {
+        "origin_country": str(record["origin_country"]).strip().upper(),
+        "destination_country": str(record["destination_country"]).strip().upper(),
+        "hs_code": str(record["hs_code"]).strip(),
+        "value": float(record["value"]),
+        "year": int(record["year"]) if record.get("year") not in (None, "") else None,
+    }
+    if not math.isfinite(shipment["value"]) or shipment["value"] < 0:
+        raise ValueError(f"Valeur invalide: {record['value']}")
+    if shipment["origin_country"] not in valid_countries or shipment["destination_country"] not in valid_countries:
+        raise ValueError("Pays non membre de la ZLECAf")
+    if years is not None and shipment["year"] is not None and shipment["year"] not in years:
+        raise ValueError(f"Année {shipment['year']} hors du calendrier de démantèlement ({years[0]}-{years[-1]})")
+    return shipment
+
+
+async def parse_shipments(lines: AsyncIterator[Optional[str]], fmt: str, valid_countries: Collection[str],
+                          years: Optional[range] = None) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Produire (numéro de ligne, expédition, erreur) pour chaque ligne non vide
+
+    Pour le CSV, la première ligne est l'en-tête ; les champs entre guillemets
+    ne peuvent pas contenir de saut de ligne. `years` restreint les années
+    acceptées (calendrier chargé, voir schedule_years).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu: {fmt}")
+    header: Optional[List[str]] = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if line is None:
+            yield line_number, None, "Ligne trop longue"
+            continue
+        if not line.strip():
+            continue
+        try:
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [name.strip() for name in values]
+                    continue
+                record = dict(zip(header, values))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Objet JSON attendu")
+            yield line_number, _parse_shipment(record, valid_countries, years), None
+        except (ValueError, TypeError) as e:
+            yield line_number, None, str(e)
+
+
+def _encode(document: Dict[str, Any]) -> bytes:
+    return (json.dumps(document, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _calculate_chunk(engine: TariffEngine, lines: List[int], shipments: List[Dict[str, Any]],
+                     totals: Dict[str, float]) -> bytes:
+    columns = calculate_tariff_batch(
+        engine,
+        destinations=[s["destination_country"] for s in shipments],
+        hs_codes=[s["hs_code"] for s in shipments],
+        values=[s["value"] for s in shipments],
+        years=[s["year"] for s in shipments],
+    )
+    for name in BATCH_TOTAL_COLUMNS:
+        totals[name] += float(columns[name].sum())
+
+    names = list(columns.keys())
+    rows = zip(*(columns[name].tolist() for name in names))
+    return b"".join(
+        _encode({
+            "line": line,
+            "origin_country": shipment["origin_country"],
+            "destination_country": shipment["destination_country"],
+            "hs_code": shipment["hs_code"],
+            "year": shipment["year"],
+            **dict(zip(names, row)),
+        })
+        for line, shipment, row in zip(lines, shipments, rows)
+    )
+
+
+async def stream_tariff_results(engine: TariffEngine, chunks: AsyncIterator[bytes], fmt: str,
+                                valid_countries: Collection[str], chunk_size: int = 1000) -> AsyncIterator[bytes]:
+    """
+    Calculer un manifeste en flux et produire les résultats NDJSON
+
+    Chaque ligne valide donne une ligne de résultat, chaque ligne invalide une
+    ligne {"line", "error"} émise immédiatement (donc avant le bloc en cours) ;
+    une dernière ligne {"summary": ...} donne les compteurs et les totaux.
+    """
+    totals = {name: 0.0 for name in BATCH_TOTAL_COLUMNS}
+    count, errors = 0, 0
+    lines: List[int] = []
+    shipments: List[Dict[str, Any]] = []
+
+    async for line, shipment, error in parse_shipments(iter_lines(chunks), fmt, valid_countries, schedule_years(engine)):
+        if error is not None:
+            errors += 1
+            yield _encode({"line": line, "error": error})
+            continue
+        lines.append(line)
+        shipments.append(shipment)
+        if len(shipments) >= chunk_size:
+            count += len(shipments)
+            yield _calculate_chunk(engine, lines, shipments, totals)
+            lines, shipments = [], []
+
+    if shipments:
+        count += len(shipments)
+        yield _calculate_chunk(engine, lines, shipments, totals)
+
+    normal_total = totals["normal_total_cost"]
+    totals["total_savings_percentage"] = (
+        totals["total_savings_with_taxes"] / normal_total * 100 if normal_total > 0 else 0
+    )
+    yield _encode({"summary": {"count": count, "errors": errors, "totals": totals}})
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Réponse en flux produite pendant la lecture du corps de la requête
+
+    StreamingResponse écoute `receive` pour détecter la déconnexion du client
+    et consommerait alors les morceaux du corps ; ici c'est le générateur, via
+    request.stream(), qui lit `receive` (ClientDisconnect en cas de coupure).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,153 @@
+# Résilience des appels aux APIs externes (Banque Mondiale, OEC)
+# Disjoncteur par fournisseur, délai d'expiration adaptatif calculé sur les
+# latences observées et requêtes couvertes (hedged) : une seconde requête
+# identique est lancée si la première tarde au-delà de la latence habituelle.
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé : le disjoncteur du fournisseur est ouvert"""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états
+
+    Après `failure_threshold` échecs consécutifs il s'ouvre et refuse les appels
+    pendant `reset_timeout` secondes ; un seul appel d'essai est ensuite admis
+    (demi-ouvert), dont le résultat referme ou rouvre le disjoncteur.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self._state = CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._probing or (self._state == CLOSED and self._failures >= self.failure_threshold):
+            self._state = OPEN
+            self._opened_at = self._clock()
+            self.opened += 1
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """
+    Latences récentes d'un fournisseur
+
+    Le délai d'expiration vaut `multiplier` × p95 borné à [minimum, maximum]
+    (maximum tant que moins de `min_samples` mesures) ; le délai de couverture
+    est le p95 lui-même.
+    """
+
+    def __init__(self, minimum: float, maximum: float, multiplier: float = 3.0,
+                 window: int = 100, min_samples: int = 10):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self) -> float:
+        p95 = self.percentile(0.95)
+        if p95 is None:
+            return self.maximum
+        return min(self.maximum, max(self.minimum, p95 * self.multiplier))
+
+    def hedge_delay(self) -> Optional[float]:
+        return self.percentile(0.95)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self._samples),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "timeout": self.timeout(),
+        }
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float],
+                 on_hedge: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Exécuter `call` ; si aucun résultat après `delay` secondes, lancer une
+    seconde tentative et retenir la première réussie (l'autre est annulée)
+
+    Réservé aux requêtes idempotentes. Sans délai, un seul appel est fait.
+    """
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(call()))
+            if on_hedge is not None:
+                on_hedge()
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,4 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -7,14 +10,40 @@ import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any, Union
+import time
 import uuid
-from datetime import datetime
-import requests
+from datetime import datetime, timedelta, timezone
+import httpx
 import pandas as pd
+import numpy as np
 import asyncio
+import heapq
 import json
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from country_data import get_country_data, REAL_COUNTRY_DATA
 from tax_rates import calculate_all_taxes, get_vat_rate
+from tariff_engine import TariffEngine
+from landed_cost import (
+    calculate_tariff_batch, calculate_tariff_trajectory, corridor_savings_matrix, solve_max_values,
+    summarize_batch
+)
+from manifest_stream import (
+    FORMATS as MANIFEST_FORMATS, DuplexStreamingResponse, iter_lines, parse_shipments, schedule_years,
+    stream_tariff_results
+)
+from write_behind import WriteBehindQueue
+from enrichment import ENRICHMENTS, fetch_enrichment, parse_include
+from job_queue import JobQueue, COMPLETED as JOB_COMPLETED, compute_tariff_chunk, init_process_engine
+from statistics_rollup import StatisticsRollup, GRANULARITIES as STATISTICS_GRANULARITIES, statistics_delta
+from event_stream import EventBroadcaster, TOPICS as EVENT_TOPICS
+from db_indexes import ensure_calculation_indexes, check_index_health
+from cache import TTLCache, PersistentCache, SingleFlight, MISS, STALE
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
+from warmup import CacheWarmer
+from wb_bulk import IndicatorTable
+from trade_matrix import TradeMatrix
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,12 +53,52 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Statistiques cumulées, incrémentées à chaque lot de calculs enregistré
+statistics_rollup = StatisticsRollup(db.statistics_rollup, db.comprehensive_calculations, db.statistics_buckets)
+
+# Événements poussés aux clients abonnés à /api/events (SSE)
+event_broadcaster = EventBroadcaster(max_queue=int(os.environ.get('EVENT_QUEUE_MAX', '100')))
+EVENT_HEARTBEAT = float(os.environ.get('EVENT_HEARTBEAT', '15'))
+
+async def apply_calculation_batch(documents: List[Dict[str, Any]]):
+    """Cumuler un lot de calculs enregistrés puis publier la variation des statistiques"""
+    sequence = await statistics_rollup.record(documents)
+    # Lot mis en attente (compteurs en cours d'initialisation) : inclus dans les prochains instantanés
+    if sequence is not None:
+        event_broadcaster.publish("statistics", {**statistics_delta(documents), "sequence": sequence})
+
+# Écriture différée des calculs : insert_many par lots hors du chemin de la requête
+calculation_writer = WriteBehindQueue(
+    db.comprehensive_calculations,
+    batch_size=int(os.environ.get('CALC_WRITE_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('CALC_WRITE_FLUSH_INTERVAL', '1.0')),
+    max_queue=int(os.environ.get('CALC_WRITE_QUEUE_MAX', '10000')),
+    name='comprehensive_calculations',
+    on_flush=apply_calculation_batch,
+    retries=int(os.environ.get('CALC_WRITE_RETRIES', '3'))
+)
+
 # Create the main app without a prefix
 app = FastAPI(title="Système Commercial ZLECAf - API Complète", version="2.0.0")
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+def _json_safe(value: Any) -> Any:
+    """Remplacer les flottants non finis (inf, nan) par leur représentation textuelle"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def request_validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Erreurs de validation (422) : la valeur rejetée peut être inf ou nan, non représentable en JSON"""
+    return JSONResponse(status_code=422, content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
+
 # Pays membres de la ZLECAf avec données économiques
 AFRICAN_COUNTRIES = [
     {"code": "DZ", "name": "Algérie", "region": "Afrique du Nord", "iso3": "DZA", "wb_code": "DZA", "population": 44700000},
@@ -88,6 +157,52 @@ AFRICAN_COUNTRIES = [
     {"code": "ZW", "name": "Zimbabwe", "region": "Afrique de l'Est", "iso3": "ZWE", "wb_code": "ZWE", "population": 15000000}
 ]
 
+AFRICAN_COUNTRY_CODES = {country['code'] for country in AFRICAN_COUNTRIES}
+AFRICAN_COUNTRIES_BY_CODE = {country['code']: country for country in AFRICAN_COUNTRIES}
+AFRICAN_COUNTRIES_BY_ISO3 = {country['iso3']: country for country in AFRICAN_COUNTRIES}
+
+# Taille maximale d'un lot pour /calculate-tariff/batch
+MAX_BATCH_SHIPMENTS = int(os.environ.get('MAX_BATCH_SHIPMENTS', '10000'))
+
+# Taille des blocs calculés par /calculate-tariff/stream
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', '1000'))
+
+# Nombre maximal d'années d'une trajectoire tarifaire
+MAX_TRAJECTORY_YEARS = 50
+
+# Moteur tarifaire SH6 précompilé, chargé une fois depuis les données de release
+TARIFF_DATA_DIR = Path(os.environ.get('TARIFF_DATA_DIR', ROOT_DIR.parent / 'frontend' / 'public' / 'data'))
+tariff_engine = TariffEngine.load(
+    TARIFF_DATA_DIR,
+    countries=[country['code'] for country in AFRICAN_COUNTRIES],
+    iso3_to_iso2={country['iso3']: country['code'] for country in AFRICAN_COUNTRIES}
+)
+
+# Travaux de calcul en arrière-plan : workers asyncio bornés, blocs calculés
+# dans un pool de processus (chaque processus charge son propre moteur tarifaire)
+MAX_JOB_SHIPMENTS = int(os.environ.get('MAX_JOB_SHIPMENTS', '1000000'))
+job_executor = ProcessPoolExecutor(
+    max_workers=int(os.environ.get('JOB_PROCESS_WORKERS', str(max(2, (os.cpu_count() or 2) // 2)))),
+    mp_context=multiprocessing.get_context('spawn'),
+    initializer=init_process_engine,
+    initargs=(
+        str(TARIFF_DATA_DIR),
+        [country['code'] for country in AFRICAN_COUNTRIES],
+        {country['iso3']: country['code'] for country in AFRICAN_COUNTRIES}
+    )
+)
+calculation_jobs = JobQueue(
+    db.calculation_jobs,
+    db.calculation_job_chunks,
+    compute_tariff_chunk,
+    executor=job_executor,
+    workers=int(os.environ.get('JOB_WORKERS', '2')),
+    chunk_size=int(os.environ.get('JOB_CHUNK_SIZE', '2000')),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', '100')),
+    lease=float(os.environ.get('JOB_LEASE_SECONDS', '300')),
+    on_progress=lambda job: event_broadcaster.publish("job", job)
+)
+
 # Règles d'origine ZLECAf par secteur/code SH
 ZLECAF_RULES_OF_ORIGIN = {
     "01": {"rule": "Entièrement obtenus", "requirement": "100% africain", "regional_content": 100},
@@ -189,96 +304,433 @@ ZLECAF_RULES_OF_ORIGIN = {
 }
 
 # API Clients pour données externes
-class WorldBankAPIClient:
+def create_http_client() -> httpx.AsyncClient:
+    """Client HTTP asynchrone avec pool de connexions keep-alive par hôte"""
+    return httpx.AsyncClient(
+        headers={'User-Agent': 'ZLECAf-API/1.0'},
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0),
+        timeout=httpx.Timeout(10.0, connect=5.0),
+    )
+
+class AsyncAPIClient:
+    """
+    Base des clients externes : un pool httpx partagé par client
+
+    Chaque fournisseur a son disjoncteur et son délai d'expiration adaptatif
+    (borné par `max_timeout`) ; les requêtes lentes sont couvertes par une
+    seconde requête identique si HEDGE_REQUESTS est actif.
+    """
+    def __init__(self, base_url: str, name: str, max_timeout: float):
+        self.base_url = base_url
+        self.name = name
+        self._http: Optional[httpx.AsyncClient] = None
+        # Les requêtes identiques simultanées partagent un seul appel HTTP
+        self.flights = SingleFlight()
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(os.environ.get('BREAKER_RESET_TIMEOUT', '30'))
+        )
+        self.latency = LatencyTracker(
+            minimum=float(os.environ.get('EXTERNAL_TIMEOUT_MIN', '1.0')),
+            maximum=max_timeout
+        )
+        self.hedging = os.environ.get('HEDGE_REQUESTS', 'true').lower() == 'true'
+        self.hedged_requests = 0
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Création paresseuse pour rattacher le pool à la boucle d'événements active
+        if self._http is None or self._http.is_closed:
+            self._http = create_http_client()
+        return self._http
+
+    async def _get(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """GET protégé par le disjoncteur, avec délai adaptatif et couverture des requêtes lentes"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name}: disjoncteur ouvert")
+        timeout = self.latency.timeout()
+        hedge_delay = self.latency.hedge_delay() if self.hedging else None
+        
+        def count_hedge():
+            self.hedged_requests += 1
+        
+        started = time.monotonic()
+        try:
+            response = await hedged(
+                lambda: self.http.get(url, params=params, timeout=timeout), hedge_delay, on_hedge=count_hedge
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            self.latency.record(time.monotonic() - started)
+        return response
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.stats(),
+            "latency": self.latency.stats(),
+            "hedging": self.hedging,
+            "hedged_requests": self.hedged_requests,
+        }
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+class WorldBankAPIClient(AsyncAPIClient):
     def __init__(self):
-        self.base_url = "https://api.worldbank.org/v2"
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': 'ZLECAf-API/1.0'})
+        super().__init__("https://api.worldbank.org/v2", "world_bank", float(os.environ.get('WB_TIMEOUT_MAX', '10')))
+        self.date_range = '2020:2023'
+        self.source_id = '2'
+        self.batch_page_size = 1000
+        # Les indicateurs évoluent au plus une fois par an : cache long avec rafraîchissement en arrière-plan
+        self.cache = TTLCache(
+            maxsize=int(os.environ.get('WB_CACHE_MAXSIZE', '2048')),
+            ttl=float(os.environ.get('WB_CACHE_TTL', '86400')),
+            stale_ttl=float(os.environ.get('WB_CACHE_STALE_TTL', '604800'))
+        )
+        # Mode hors ligne : réponses tirées du téléchargement en masse (WB_BULK_PATH), sans HTTP
+        self.offline = os.environ.get('WB_OFFLINE', 'false').lower() == 'true'
+        self.snapshot: Optional[IndicatorTable] = None
+
+    DEFAULT_INDICATORS = ['NY.GDP.MKTP.CD', 'SP.POP.TOTL', 'NY.GDP.PCAP.CD', 'FP.CPI.TOTL.ZG']
+    # Valeur mise en cache pour une paire demandée sans observation (évite de la redemander à chaque calcul)
+    NO_DATA = {}
+
+    def load_snapshot(self, path: Union[str, Path], countries: Optional[List[str]] = None,
+                      indicators: Optional[List[str]] = None) -> IndicatorTable:
+        """Charger un téléchargement en masse (CSV, ZIP ou répertoire) pour le mode hors ligne"""
+        self.snapshot = IndicatorTable.load(path, countries, indicators or self.DEFAULT_INDICATORS)
+        return self.snapshot
+
+    def _offline_country_data(self, country_codes: List[str], indicators: List[str]) -> Dict[str, Any]:
+        if self.snapshot is None:
+            return {country: {} for country in country_codes}
+        return self.snapshot.country_data(country_codes, indicators, self.date_range)
+
+    def cached_country_data(self, country_codes: List[str], indicators: List[str] = None) -> Dict[str, Any]:
+        """Données déjà en cache (fraîches ou périmées), sans aucun appel HTTP"""
+        indicators = indicators or self.DEFAULT_INDICATORS
+        if self.offline:
+            return self._offline_country_data(country_codes, indicators)
+        all_data = {country: {} for country in country_codes}
+        for country in country_codes:
+            for indicator in indicators:
+                entry, state = self.cache.lookup((country, indicator, self.date_range))
+                if state != MISS and entry is not self.NO_DATA:
+                    all_data[country][indicator] = entry
+        return all_data
+
+    def uncached_countries(self, country_codes: List[str], indicators: List[str] = None) -> List[str]:
+        """Pays dont au moins une paire (pays, indicateur) est absente du cache, y compris sans observation"""
+        if self.offline:
+            # Réponses tirées du téléchargement en masse, le cache n'est pas utilisé
+            return []
+        indicators = indicators or self.DEFAULT_INDICATORS
+        return [
+            country for country in country_codes
+            if any(self.cache.state((country, indicator, self.date_range)) == MISS for indicator in indicators)
+        ]
 
     async def get_country_data(self, country_codes: List[str], indicators: List[str] = None) -> Dict[str, Any]:
         """Récupérer les données économiques des pays depuis la Banque Mondiale"""
         if indicators is None:
-            indicators = ['NY.GDP.MKTP.CD', 'SP.POP.TOTL', 'NY.GDP.PCAP.CD', 'FP.CPI.TOTL.ZG']
+            indicators = self.DEFAULT_INDICATORS
+        if self.offline:
+            return self._offline_country_data(country_codes, indicators)
+        
+        all_data = {country: {} for country in country_codes}
+        missing, stale = [], []
+        for country in country_codes:
+            for indicator in indicators:
+                entry, state = self.cache.lookup((country, indicator, self.date_range))
+                if state == MISS:
+                    missing.append((country, indicator))
+                    continue
+                if state == STALE:
+                    stale.append((country, indicator))
+                if entry is not self.NO_DATA:
+                    all_data[country][indicator] = entry
+        
+        # Les paires absentes du cache sont récupérées en une seule requête groupée
+        if missing:
+            fetched = await self._fetch_pairs(missing) or {}
+            for country, indicator in missing:
+                entry = fetched.get(country, {}).get(indicator)
+                if entry:
+                    all_data[country][indicator] = entry
+        
+        # Les paires périmées sont servies telles quelles et rafraîchies en arrière-plan
+        # (une seule fois par paire, via le cache)
+        if stale:
+            self.cache.refresh_in_background(
+                [(country, indicator, self.date_range) for country, indicator in stale],
+                self._refresh_keys
+            )
+        
+        return all_data
+
+    async def _refresh_keys(self, keys: List[tuple]) -> Optional[Dict[tuple, Any]]:
+        """Rafraîchissement en arrière-plan : recharger les paires, None si la requête échoue"""
+        data = await self._fetch_pairs([(country, indicator) for country, indicator, _ in keys])
+        if data is None:
+            return None
+        return {
+            (country, indicator, date_range): data.get(country, {}).get(indicator, self.NO_DATA)
+            for country, indicator, date_range in keys
+        }
+
+    async def _fetch_pairs(self, pairs: List[tuple]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Requête groupée (coalescée) couvrant un ensemble de paires (pays, indicateur)"""
+        countries = sorted({country for country, _ in pairs})
+        indicators = sorted({indicator for _, indicator in pairs})
+        key = (tuple(countries), tuple(indicators), self.date_range)
+        return await self.flights.do(key, lambda: self._load_batch(countries, indicators))
+
+    async def _load_batch(self, countries: List[str], indicators: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Interroger l'API et alimenter le cache pour toutes les paires demandées
+
+        Les paires sans observation sont mises en cache avec NO_DATA (mêmes TTL et
+        fenêtre de rafraîchissement) ; rien n'est mis en cache si la requête échoue
+        (None est alors retourné).
+        """
+        rows = await self._request_indicator_rows(countries, indicators)
+        if rows is None:
+            return None
+        data = self.parse_indicator_rows(rows, countries)
+        for country in countries:
+            for indicator in indicators:
+                entry = data.get(country, {}).get(indicator, self.NO_DATA)
+                self.cache.set((country, indicator, self.date_range), entry)
+        return data
+
+    async def fetch_indicators_batch(self, countries: List[str], indicators: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Récupérer plusieurs pays et indicateurs en une requête paginée
+
+        L'API accepte des listes séparées par « ; » ; les requêtes multi-indicateurs
+        doivent préciser la source (2 = World Development Indicators).
+        Retourne {pays: {indicateur: {'value', 'date'}}} avec la valeur la plus récente.
+        """
+        rows = await self._request_indicator_rows(countries, indicators)
+        return self.parse_indicator_rows(rows or [], countries)
+
+    async def _request_indicator_rows(self, countries: List[str], indicators: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """Toutes les lignes de la requête paginée ; None si une page n'a pas pu être obtenue"""
+        url = f"{self.base_url}/country/{';'.join(countries)}/indicator/{';'.join(indicators)}"
+        params = {
+            'format': 'json',
+            'date': self.date_range,
+            'per_page': self.batch_page_size
+        }
+        if len(indicators) > 1:
+            params['source'] = self.source_id
         
+        rows = []
+        page = 1
         try:
-            all_data = {}
-            for country in country_codes:
-                country_data = {}
-                for indicator in indicators:
-                    url = f"{self.base_url}/country/{country}/indicator/{indicator}"
-                    params = {
-                        'format': 'json',
-                        'date': '2020:2023',
-                        'per_page': 10
-                    }
-                    
-                    response = self.session.get(url, params=params, timeout=10)
-                    if response.status_code == 200:
-                        data = response.json()
-                        if len(data) > 1 and data[1]:
-                            latest_data = data[1][0] if data[1] else None
-                            if latest_data and latest_data['value']:
-                                country_data[indicator] = {
-                                    'value': latest_data['value'],
-                                    'date': latest_data['date']
-                                }
-                
-                all_data[country] = country_data
-            
-            return all_data
+            while True:
+                response = await self._get(url, {**params, 'page': page})
+                if response.status_code != 200:
+                    return None
+                data = response.json()
+                if len(data) < 2 or not data[1]:
+                    break
+                rows.extend(data[1])
+                if page >= int(data[0].get('pages', 1)):
+                    break
+                page += 1
+        except CircuitOpenError:
+            return None
         except Exception as e:
             logging.error(f"Erreur World Bank API: {e}")
-            return {}
+            return None
+        
+        return rows
 
-class OECAPIClient:
+    @staticmethod
+    def parse_indicator_rows(rows: List[Dict[str, Any]], countries: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Conserver, pour chaque (pays, indicateur), l'observation la plus récente si elle est renseignée"""
+        requested = set(countries)
+        latest = {}
+        for row in rows:
+            country = row.get('countryiso3code') or (row.get('country') or {}).get('id')
+            indicator = (row.get('indicator') or {}).get('id')
+            if country not in requested or not indicator:
+                continue
+            current = latest.get((country, indicator))
+            if current is None or row.get('date', '') > current.get('date', ''):
+                latest[(country, indicator)] = row
+        
+        all_data = {}
+        for (country, indicator), row in latest.items():
+            if row.get('value'):
+                all_data.setdefault(country, {})[indicator] = {
+                    'value': row['value'],
+                    'date': row['date']
+                }
+        return all_data
+
+class OECAPIClient(AsyncAPIClient):
     def __init__(self):
-        self.base_url = "https://api-v2.oec.world"
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': 'ZLECAf-API/1.0'})
+        super().__init__("https://api-v2.oec.world", "oec", float(os.environ.get('OEC_TIMEOUT_MAX', '15')))
+        # Le résultat ne dépend que de (HS4, année) : cache disque persistant entre déploiements
+        cache_dir = Path(os.environ.get('OEC_CACHE_DIR', ROOT_DIR / '.cache'))
+        self.cache = PersistentCache(
+            cache_dir / 'oec_top_producers.sqlite3',
+            namespace='top_producers',
+            ttl=float(os.environ.get('OEC_CACHE_TTL', str(30 * 86400)))
+        )
+        # Matrice locale des exportations SH4 (TRADE_MATRIX_DIR) : top producteurs sans appel à l'API
+        self.trade_matrix: Optional[TradeMatrix] = None
+        self._african_columns: Optional[np.ndarray] = None
+
+    def attach_trade_matrix(self, matrix: TradeMatrix):
+        self.trade_matrix = matrix
+        self._african_columns = matrix.column_mask(AFRICAN_COUNTRIES_BY_ISO3)
+
+    @staticmethod
+    def producer_entry(iso3: str, export_value: float, year: int) -> Dict[str, Any]:
+        country = AFRICAN_COUNTRIES_BY_ISO3.get(iso3)
+        return {
+            'country_code': iso3,
+            'country_name': country['name'] if country else iso3,
+            'export_value': export_value,
+            'year': year
+        }
+
+    @staticmethod
+    def product_code(hs_code: str) -> str:
+        return hs_code[:4] if len(hs_code) > 4 else hs_code
 
     async def get_top_producers(self, hs_code: str, year: int = 2021) -> List[Dict[str, Any]]:
         """Récupérer le top 5 des pays africains producteurs pour un code SH"""
+        product = self.product_code(hs_code)
+        if self.trade_matrix is not None and self.trade_matrix.covers(product, year):
+            return [
+                self.producer_entry(iso3, value, year)
+                for iso3, value in self.trade_matrix.top_exporters(product, year, self._african_columns)
+            ]
+        cache_key = f"{product}:{year}"
+        
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            return cached
+        
+        producers = await self.flights.do(cache_key, lambda: self._load_top_producers(product, year))
+        return producers if producers is not None else []
+
+    async def _load_top_producers(self, product: str, year: int) -> Optional[List[Dict[str, Any]]]:
+        """Interroger l'API OEC et alimenter le cache disque"""
+        producers = await self._request_top_producers(product, year)
+        if producers is not None:
+            await self.cache.aset(f"{product}:{year}", producers)
+        return producers
+
+    async def _request_top_producers(self, product: str, year: int) -> Optional[List[Dict[str, Any]]]:
+        """Interroger l'API OEC ; None en cas d'échec (non mis en cache)"""
         try:
             endpoint = "tesseract/data.jsonrecords"
             params = {
                 'cube': 'trade_i_hs4_eci',
                 'drilldowns': 'Reporter',
                 'measures': 'Export Value',
-                'Product': hs_code[:4] if len(hs_code) > 4 else hs_code,
+                'Product': product,
                 'time': str(year),
                 'Trade Flow': '2'  # Exports
             }
             
-            response = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=15)
-            if response.status_code == 200:
-                data = response.json()
-                if 'data' in data and data['data']:
-                    # Filtrer pour les pays africains seulement
-                    african_codes = [country['iso3'] for country in AFRICAN_COUNTRIES]
-                    african_exports = []
-                    
-                    for item in data['data']:
-                        if item.get('Reporter') in african_codes:
-                            african_exports.append({
-                                'country_code': item.get('Reporter'),
-                                'country_name': next((c['name'] for c in AFRICAN_COUNTRIES if c['iso3'] == item.get('Reporter')), item.get('Reporter')),
-                                'export_value': item.get('Export Value', 0),
-                                'year': year
-                            })
-                    
-                    # Trier par valeur d'export et prendre le top 5
-                    african_exports.sort(key=lambda x: x['export_value'], reverse=True)
-                    return african_exports[:5]
+            response = await self._get(f"{self.base_url}/{endpoint}", params)
+            if response.status_code != 200:
+                return None
             
-            return []
+            data = response.json()
+            # Filtrer pour les pays africains seulement (recherche par dictionnaire ISO3)
+            african_exports = [
+                item for item in data.get('data') or []
+                if item.get('Reporter') in AFRICAN_COUNTRIES_BY_ISO3
+            ]
+            # Top 5 par valeur d'export (sélection partielle)
+            top = heapq.nlargest(5, african_exports, key=lambda item: item.get('Export Value', 0))
+            return [self.producer_entry(item['Reporter'], item.get('Export Value', 0), year) for item in top]
+        except CircuitOpenError:
+            return None
         except Exception as e:
             logging.error(f"Erreur OEC API: {e}")
-            return []
+            return None
+
+    async def warm_cache(self, hs_codes: List[str], year: int = 2021, concurrency: int = 8,
+                         progress: Optional[Dict[str, int]] = None) -> int:
+        """
+        Précharger le cache disque pour une liste de codes SH ; retourne le nombre d'entrées ajoutées
+
+        `progress` ({"done", "total", "failed"}) est tenu à jour au fil des
+        produits SH4 ; un produit déjà en cache ou couvert par la matrice locale
+        compte comme traité.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        products = sorted({self.product_code(code) for code in hs_codes})
+        progress = progress if progress is not None else {"done": 0, "total": 0, "failed": 0}
+        progress["total"] = len(products)
+        
+        async def warm(product: str) -> int:
+            cache_key = f"{product}:{year}"
+            added = 0
+            if self.trade_matrix is None or not self.trade_matrix.covers(product, year):
+                if await self.cache.aget(cache_key) is None:
+                    async with semaphore:
+                        producers = await self.flights.do(cache_key, lambda: self._load_top_producers(product, year))
+                    if producers is None:
+                        progress["failed"] += 1
+                    else:
+                        added = 1
+            progress["done"] += 1
+            return added
+        
+        return sum(await asyncio.gather(*(warm(product) for product in products)))
 
 # Clients API globaux
 wb_client = WorldBankAPIClient()
 oec_client = OECAPIClient()
 
+# Préchauffage des caches externes : codes SH les plus demandés (cumuls), à défaut
+# les positions SH4 de la nomenclature tarifaire (lignes SH6 ramenées à leur position)
+WARMUP_HS_LIMIT = int(os.environ.get('WARMUP_HS_LIMIT', '50'))
+
+def schedule_hs4_codes() -> List[str]:
+    """Positions SH4 couvertes par le moteur tarifaire"""
+    return sorted({code[:4] for code in tariff_engine.hs6_rows} | set(tariff_engine.hs4_rows))
+
+async def popular_hs_codes() -> List[str]:
+    try:
+        rollup = await statistics_rollup.read(limit=WARMUP_HS_LIMIT)
+        codes = [row["_id"] for row in rollup["popular_hs_codes"] if row["_id"]]
+    except Exception as e:
+        logging.warning(f"Codes SH populaires indisponibles pour le préchauffage: {e}")
+        codes = []
+    return codes or schedule_hs4_codes()[:WARMUP_HS_LIMIT]
+
+cache_warmer = CacheWarmer(
+    wb_client,
+    oec_client,
+    [country['wb_code'] for country in AFRICAN_COUNTRIES],
+    popular_hs_codes,
+    interval=float(os.environ.get('WARMUP_INTERVAL', str(6 * 3600))),
+    enabled=os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+)
+
+# Budget de latence total des enrichissements externes d'une requête (secondes, 0 = sans limite)
+ENRICHMENT_BUDGET = float(os.environ.get('ENRICHMENT_BUDGET', '2.0')) or None
+
 # Define Models
 class CountryInfo(BaseModel):
     code: str
@@ -292,7 +744,73 @@ class TariffCalculationRequest(BaseModel):
     origin_country: str
     destination_country: str
     hs_code: str
+    # Valeur en USD : positive et finie (inf/nan rendraient la réponse JSON invalide)
+    value: float = Field(..., ge=0, allow_inf_nan=False)
+    # Année d'application du calendrier de démantèlement (taux ZLECAf final si absente)
+    year: Optional[int] = None
+
+class TariffBatchRequest(BaseModel):
+    shipments: List[TariffCalculationRequest]
+
+class TariffBatchResponse(BaseModel):
+    count: int
+    results: List[Dict[str, Any]]
+    totals: Dict[str, float]
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class TariffTrajectoryResponse(BaseModel):
+    origin_country: str
+    destination_country: str
+    hs_code: str
+    value: float
+    start_year: int
+    end_year: int
+    years: List[Dict[str, Any]]
+    tariff_data_version: str
+
+class CorridorHeatmapResponse(BaseModel):
+    chapter: str
     value: float
+    year: Optional[int] = None
+    # Ordre des lignes (origines) et des colonnes (destinations)
+    countries: List[str]
+    savings: List[List[Optional[float]]]
+    total_savings_with_taxes: List[List[Optional[float]]]
+    total_savings_percentage: List[List[Optional[float]]]
+    tariff_data_version: str
+
+class LandedCostCoefficientsResponse(BaseModel):
+    formula: str
+    tariff_data_version: str
+    coefficients: List[Dict[str, Any]]
+
+class ReverseLandedCostRequest(BaseModel):
+    hs_code: str
+    target_total_cost: float = Field(..., ge=0, allow_inf_nan=False)
+    # Destinations évaluées (tous les pays membres si absent)
+    destinations: Optional[List[str]] = None
+    year: Optional[int] = None
+
+class ReverseLandedCostResponse(BaseModel):
+    hs_code: str
+    target_total_cost: float
+    year: Optional[int] = None
+    results: List[Dict[str, Any]]
+    tariff_data_version: str
+
+class CalculationJob(BaseModel):
+    id: str
+    status: str
+    total: int
+    processed: int
+    progress: float
+    chunks: int
+    chunks_done: int
+    totals: Dict[str, float]
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class TariffCalculationResponse(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -300,6 +818,7 @@ class TariffCalculationResponse(BaseModel):
     destination_country: str
     hs_code: str
     value: float
+    year: Optional[int] = None
     # Tarifs normaux (hors ZLECAf)
     normal_tariff_rate: float
     normal_tariff_amount: float
@@ -329,12 +848,25 @@ class TariffCalculationResponse(BaseModel):
     total_savings_percentage: float
     # Règles d'origine
     rules_of_origin: Dict[str, Any]
-    # Top producteurs africains
+    # Top producteurs africains (vide si non demandé via `include`)
+    top_african_producers: List[Dict[str, Any]] = []
+    # Données économiques des pays (vides si non demandées via `include`)
+    origin_country_data: Dict[str, Any] = {}
+    destination_country_data: Dict[str, Any] = {}
+    # Enrichissements demandés, et ceux servis partiellement faute de réponse dans le budget de latence
+    included: List[str] = list(ENRICHMENTS)
+    degraded: List[str] = []
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class TradeEnrichmentResponse(BaseModel):
+    hs_code: str
+    origin_country: str
+    destination_country: str
+    included: List[str]
+    degraded: List[str] = []
     top_african_producers: List[Dict[str, Any]]
-    # Données économiques des pays
     origin_country_data: Dict[str, Any]
     destination_country_data: Dict[str, Any]
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class CountryEconomicProfile(BaseModel):
     country_code: str
@@ -363,6 +895,15 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@api_router.get("/health/ready")
+async def readiness_check():
+    """Prête à recevoir du trafic une fois les caches externes préchauffés (503 sinon)"""
+    warmup = cache_warmer.stats()
+    return JSONResponse(
+        status_code=200 if cache_warmer.ready else 503,
+        content={"ready": cache_warmer.ready, "warmup": warmup, "timestamp": datetime.now().isoformat()}
+    )
+
 @api_router.get("/health/status")
 async def detailed_health_status():
     """Detailed health status with system checks"""
@@ -379,7 +920,8 @@ async def detailed_health_status():
         await db.command("ping")
         health_status["checks"]["database"] = {
             "status": "healthy",
-            "message": "MongoDB connection active"
+            "message": "MongoDB connection active",
+            "indexes": await check_index_health(db.comprehensive_calculations)
         }
     except Exception as e:
         health_status["checks"]["database"] = {
@@ -395,14 +937,53 @@ async def detailed_health_status():
             "/api/",
             "/api/health",
             "/api/health/status",
+            "/api/health/ready",
             "/api/countries",
             "/api/country-profile/{country_code}",
             "/api/calculate-tariff",
+            "/api/calculate-tariff/batch",
+            "/api/trade-enrichment",
+            "/api/calculate-tariff/stream",
+            "/api/jobs",
+            "/api/jobs/{job_id}",
+            "/api/jobs/{job_id}/results",
+            "/api/events",
+            "/api/tariff-trajectory",
+            "/api/corridor-heatmap",
+            "/api/landed-cost-coefficients",
+            "/api/reverse-landed-cost",
             "/api/rules-of-origin/{hs_code}",
             "/api/statistics"
         ]
     }
     
+    # Caches des données externes
+    health_status["checks"]["caches"] = {
+        "world_bank": wb_client.cache.stats(),
+        "oec": oec_client.cache.stats()
+    }
+    health_status["checks"]["write_behind"] = calculation_writer.stats()
+    health_status["checks"]["tariff_engine"] = tariff_engine.stats()
+    health_status["checks"]["jobs"] = calculation_jobs.stats()
+    health_status["checks"]["events"] = event_broadcaster.stats()
+    health_status["checks"]["external_providers"] = {
+        "world_bank": {
+            **wb_client.resilience_stats(),
+            "offline": wb_client.offline,
+            "snapshot": wb_client.snapshot.stats() if wb_client.snapshot is not None else None
+        },
+        "oec": {
+            **oec_client.resilience_stats(),
+            "trade_matrix": oec_client.trade_matrix.stats() if oec_client.trade_matrix is not None else None
+        },
+        "enrichment_budget": ENRICHMENT_BUDGET
+    }
+    health_status["checks"]["warmup"] = cache_warmer.stats()
+    health_status["checks"]["external_fetches"] = {
+        "world_bank": wb_client.flights.stats(),
+        "oec": oec_client.flights.stats()
+    }
+    
     # Check data availability
     health_status["checks"]["data"] = {
         "status": "healthy",
@@ -503,9 +1084,38 @@ async def get_rules_of_origin(hs_code: str):
         }
     }
 
+def _parse_include_or_400(include: Optional[str]) -> tuple:
+    try:
+        return parse_include(include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_year_or_400(year: Optional[int]) -> Optional[int]:
+    """Année du calendrier de démantèlement (None = taux final), 400 hors de la période chargée"""
+    if year is None:
+        return None
+    try:
+        return tariff_engine.check_year(year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @api_router.post("/calculate-tariff", response_model=TariffCalculationResponse)
-async def calculate_comprehensive_tariff(request: TariffCalculationRequest):
-    """Calculer les tarifs complets avec données officielles et règles d'origine"""
+async def calculate_comprehensive_tariff(
+    request: TariffCalculationRequest,
+    include: Optional[str] = Query(
+        None,
+        description="Enrichissements externes à inclure: producers, country_data, all (défaut) ou none"
+    )
+):
+    """
+    Calculer les tarifs complets avec données officielles et règles d'origine
+
+    Droits et taxes sont calculés localement ; `include=none` renvoie la
+    réponse sans attendre les APIs OEC et Banque mondiale, dont les données
+    restent disponibles via /trade-enrichment.
+    """
+    
+    included = _parse_include_or_400(include)
     
     # Vérifier que les pays sont membres de la ZLECAf
     origin_country = next((c for c in AFRICAN_COUNTRIES if c['code'] == request.origin_country), None)
@@ -513,22 +1123,12 @@ async def calculate_comprehensive_tariff(request: TariffCalculationRequest):
     
     if not origin_country or not dest_country:
         raise HTTPException(status_code=400, detail="L'un des pays sélectionnés n'est pas membre de la ZLECAf")
+    _check_year_or_400(request.year)
     
-    # Calcul des tarifs selon le code SH6
+    # Calcul des tarifs selon le code SH6 (repli SH4 puis SH2 pour le pays de destination)
     sector_code = request.hs_code[:2]
     
-    # Tarifs normaux (simulation basée sur des données réelles moyennes)
-    normal_rates = {
-        "01": 0.25,         "02": 0.25,         "03": 0.20,         "04": 0.30,         "05": 0.15,         "06": 0.15,         "07": 0.20,         "08": 0.20,         "09": 0.15,         "10": 0.15,         "11": 0.20,         "12": 0.15,         "13": 0.15,         "14": 0.10,         "15": 0.20,         "16": 0.30,         "17": 0.25,         "18": 0.20,         "19": 0.25,         "20": 0.30,         "21": 0.25,         "22": 0.35,         "23": 0.20,         "24": 0.50,         "25": 0.05,         "26": 0.02,         "27": 0.05,         "28": 0.10,         "29": 0.12,         "30": 0.05,         "31": 0.10,         "32": 0.15,         "33": 0.20,         "34": 0.12,         "35": 0.12,         "36": 0.10,         "37": 0.08,         "38": 0.15,         "39": 0.18,         "40": 0.15,         "50": 0.15,         "51": 0.15,         "52": 0.15,         "53": 0.12,         "54": 0.15,         "55": 0.15,         "56": 0.15,         "57": 0.15,         "58": 0.18,         "59": 0.15,         "60": 0.20,         "61": 0.30,         "62": 0.30,         "63": 0.25,         "84": 0.05,         "85": 0.05,         "86": 0.05,         "87": 0.25,         "88": 0.05,         "89": 0.08
-    }
-    
-    # Tarifs ZLECAf (réduction progressive prévue)
-    zlecaf_rates = {
-        "01": 0.00,         "02": 0.00,         "03": 0.00,         "04": 0.00,         "05": 0.00,         "06": 0.00,         "07": 0.00,         "08": 0.00,         "09": 0.00,         "10": 0.00,         "11": 0.00,         "12": 0.00,         "13": 0.00,         "14": 0.00,         "15": 0.00,         "16": 0.00,         "17": 0.00,         "18": 0.00,         "19": 0.00,         "20": 0.00,         "21": 0.00,         "22": 0.00,         "23": 0.00,         "24": 0.00,         "25": 0.00,         "26": 0.00,         "27": 0.00,         "28": 0.00,         "29": 0.00,         "30": 0.00,         "31": 0.00,         "32": 0.00,         "33": 0.00,         "34": 0.00,         "35": 0.00,         "36": 0.00,         "37": 0.00,         "38": 0.00,         "39": 0.00,         "40": 0.00,         "50": 0.00,         "51": 0.00,         "52": 0.00,         "53": 0.00,         "54": 0.00,         "55": 0.00,         "56": 0.00,         "57": 0.00,         "58": 0.00,         "59": 0.00,         "60": 0.00,         "61": 0.00,         "62": 0.00,         "63": 0.00,         "84": 0.00,         "85": 0.00,         "86": 0.00,         "87": 0.15,         "88": 0.00,         "89": 0.00
-    }
-    
-    normal_rate = normal_rates.get(sector_code, 0.15)
-    zlecaf_rate = zlecaf_rates.get(sector_code, 0.03)
+    normal_rate, zlecaf_rate = tariff_engine.resolve(request.hs_code, request.destination_country, request.year)
     
     # Calculs des droits de douane en USD
     normal_amount = request.value * normal_rate
@@ -561,11 +1161,11 @@ async def calculate_comprehensive_tariff(request: TariffCalculationRequest):
         "regional_content": 40
     })
     
-    # Récupérer les top producteurs africains
-    top_producers = await oec_client.get_top_producers(request.hs_code)
-    
-    # Récupérer les données économiques des pays
-    wb_data = await wb_client.get_country_data([origin_country['wb_code'], dest_country['wb_code']])
+    # Récupérer en parallèle les enrichissements demandés (top producteurs, données des pays)
+    enrichment = await fetch_enrichment(
+        oec_client, wb_client, request.hs_code, origin_country['wb_code'], dest_country['wb_code'], included,
+        budget=ENRICHMENT_BUDGET
+    )
     
     # Création de la réponse complète avec toutes les taxes
     result = TariffCalculationResponse(
@@ -573,6 +1173,7 @@ async def calculate_comprehensive_tariff(request: TariffCalculationRequest):
         destination_country=request.destination_country,
         hs_code=request.hs_code,
         value=request.value,
+        year=request.year,
         # Tarifs de douane
         normal_tariff_rate=normal_rate,
         normal_tariff_amount=normal_amount,
@@ -601,54 +1202,409 @@ async def calculate_comprehensive_tariff(request: TariffCalculationRequest):
         total_savings_percentage=total_savings_percentage,
         # Autres données
         rules_of_origin=rules,
-        top_african_producers=top_producers,
-        origin_country_data=wb_data.get(origin_country['wb_code'], {}),
-        destination_country_data=wb_data.get(dest_country['wb_code'], {})
+        included=list(included),
+        **enrichment
     )
     
-    # Sauvegarder en base de données
-    await db.comprehensive_calculations.insert_one(result.dict())
+    # Sauvegarder en base de données (écriture différée par lots)
+    await calculation_writer.enqueue(result.dict())
     
     return result
 
-@api_router.get("/statistics")
-async def get_comprehensive_statistics():
-    """Récupérer les statistiques complètes ZLECAf"""
+@api_router.get("/trade-enrichment", response_model=TradeEnrichmentResponse)
+async def get_trade_enrichment(
+    origin_country: str,
+    destination_country: str,
+    hs_code: str,
+    include: Optional[str] = Query(None, description="producers, country_data, all (défaut)")
+):
+    """Top producteurs africains et indicateurs Banque mondiale d'un calcul, récupérés à la demande"""
+    
+    included = _parse_include_or_400(include)
+    origin = AFRICAN_COUNTRIES_BY_CODE.get(origin_country.upper())
+    destination = AFRICAN_COUNTRIES_BY_CODE.get(destination_country.upper())
+    if not origin or not destination:
+        raise HTTPException(status_code=400, detail="L'un des pays sélectionnés n'est pas membre de la ZLECAf")
+    
+    enrichment = await fetch_enrichment(
+        oec_client, wb_client, hs_code, origin['wb_code'], destination['wb_code'], included,
+        budget=ENRICHMENT_BUDGET
+    )
+    return TradeEnrichmentResponse(
+        hs_code=hs_code,
+        origin_country=origin['code'],
+        destination_country=destination['code'],
+        included=list(included),
+        **enrichment
+    )
+
+@api_router.post("/calculate-tariff/batch", response_model=TariffBatchResponse)
+async def calculate_tariff_batch_endpoint(request: TariffBatchRequest):
+    """Calculer droits et taxes pour un manifeste complet en une seule passe vectorisée"""
     
-    # Statistiques de base
-    total_calculations = await db.comprehensive_calculations.count_documents({})
+    shipments = request.shipments
+    if len(shipments) > MAX_BATCH_SHIPMENTS:
+        raise HTTPException(status_code=400, detail=f"Lot trop volumineux (maximum {MAX_BATCH_SHIPMENTS} expéditions)")
     
-    # Économies totales
-    pipeline_savings = [
-        {"$group": {"_id": None, "total_savings": {"$sum": "$savings"}}}
+    # Vérifier que tous les pays sont membres de la ZLECAf
+    invalid_rows = [
+        index for index, shipment in enumerate(shipments)
+        if shipment.origin_country not in AFRICAN_COUNTRY_CODES
+        or shipment.destination_country not in AFRICAN_COUNTRY_CODES
     ]
-    savings_result = await db.comprehensive_calculations.aggregate(pipeline_savings).to_list(1)
-    total_savings = savings_result[0]["total_savings"] if savings_result else 0
-    
-    # Pays les plus actifs
-    pipeline_countries = [
-        {"$group": {"_id": "$origin_country", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
+    if invalid_rows:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Pays non membres de la ZLECAf dans le lot", "rows": invalid_rows[:100]}
+        )
+    first_year, last_year = int(tariff_engine.years[0]), int(tariff_engine.years[-1])
+    invalid_years = [
+        index for index, shipment in enumerate(shipments)
+        if shipment.year is not None and not first_year <= shipment.year <= last_year
     ]
-    countries_result = await db.comprehensive_calculations.aggregate(pipeline_countries).to_list(10)
+    if invalid_years:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"Années hors du calendrier de démantèlement ({first_year}-{last_year}) dans le lot",
+                "rows": invalid_years[:100]
+            }
+        )
+    
+    columns = calculate_tariff_batch(
+        tariff_engine,
+        destinations=[s.destination_country for s in shipments],
+        hs_codes=[s.hs_code for s in shipments],
+        values=[s.value for s in shipments],
+        years=[s.year for s in shipments]
+    )
     
-    # Codes SH les plus utilisés
-    pipeline_hs = [
-        {"$group": {"_id": "$hs_code", "count": {"$sum": 1}, "avg_savings": {"$avg": "$savings"}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
+    # Reconstruire les lignes à partir des colonnes calculées
+    names = list(columns.keys())
+    rows = zip(*(columns[name].tolist() for name in names))
+    results = [
+        {
+            "origin_country": shipment.origin_country,
+            "destination_country": shipment.destination_country,
+            "hs_code": shipment.hs_code,
+            "year": shipment.year,
+            **dict(zip(names, row))
+        }
+        for shipment, row in zip(shipments, rows)
     ]
-    hs_result = await db.comprehensive_calculations.aggregate(pipeline_hs).to_list(10)
-    
-    # Secteurs les plus bénéficiaires
-    pipeline_sectors = [
-        {"$addFields": {"sector": {"$substr": ["$hs_code", 0, 2]}}},
-        {"$group": {"_id": "$sector", "count": {"$sum": 1}, "total_savings": {"$sum": "$savings"}}},
-        {"$sort": {"total_savings": -1}},
-        {"$limit": 10}
+    
+    return TariffBatchResponse(
+        count=len(results),
+        results=results,
+        totals=summarize_batch(columns)
+    )
+
+@api_router.get("/tariff-trajectory", response_model=TariffTrajectoryResponse)
+async def get_tariff_trajectory(
+    origin_country: str,
+    destination_country: str,
+    hs_code: str,
+    value: float = Query(..., ge=0),
+    start_year: int = 2025,
+    end_year: int = 2035
+):
+    """Droits, coût de revient et économies pour chaque année du démantèlement, en une passe vectorisée"""
+    
+    if origin_country not in AFRICAN_COUNTRY_CODES or destination_country not in AFRICAN_COUNTRY_CODES:
+        raise HTTPException(status_code=400, detail="L'un des pays sélectionnés n'est pas membre de la ZLECAf")
+    if not math.isfinite(value):
+        raise HTTPException(status_code=400, detail="La valeur doit être un nombre fini")
+    if start_year > end_year or end_year - start_year > MAX_TRAJECTORY_YEARS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Période invalide (start_year <= end_year, {MAX_TRAJECTORY_YEARS} ans au maximum)"
+        )
+    _check_year_or_400(start_year)
+    _check_year_or_400(end_year)
+    
+    columns = calculate_tariff_trajectory(
+        tariff_engine,
+        destination=destination_country,
+        hs_code=hs_code,
+        value=value,
+        years=range(start_year, end_year + 1)
+    )
+    names = list(columns.keys())
+    years = [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+    
+    return TariffTrajectoryResponse(
+        origin_country=origin_country,
+        destination_country=destination_country,
+        hs_code=hs_code,
+        value=value,
+        start_year=start_year,
+        end_year=end_year,
+        years=years,
+        tariff_data_version=tariff_engine.version
+    )
+
+def _matrix_to_rows(matrix) -> List[List[Optional[float]]]:
+    """Matrice NumPy -> listes JSON (NaN -> null)"""
+    return [[None if cell != cell else cell for cell in row] for row in matrix.tolist()]
+
+@api_router.get("/corridor-heatmap", response_model=CorridorHeatmapResponse)
+async def get_corridor_heatmap(
+    chapter: str,
+    value: float = Query(..., ge=0),
+    year: Optional[int] = None
+):
+    """Matrice origine x destination des économies ZLECAf pour un chapitre SH et une valeur de référence"""
+    
+    if len(chapter) != 2 or not chapter.isdigit():
+        raise HTTPException(status_code=400, detail="Le chapitre SH doit comporter 2 chiffres")
+    if not math.isfinite(value):
+        raise HTTPException(status_code=400, detail="La valeur de référence doit être un nombre fini")
+    _check_year_or_400(year)
+    
+    matrices = corridor_savings_matrix(tariff_engine, chapter, value, year)
+    
+    return CorridorHeatmapResponse(
+        chapter=chapter,
+        value=value,
+        year=year,
+        countries=tariff_engine.countries,
+        savings=_matrix_to_rows(matrices["savings"]),
+        total_savings_with_taxes=_matrix_to_rows(matrices["total_savings_with_taxes"]),
+        total_savings_percentage=_matrix_to_rows(matrices["total_savings_percentage"]),
+        tariff_data_version=tariff_engine.version
+    )
+
+@api_router.get("/landed-cost-coefficients", response_model=LandedCostCoefficientsResponse)
+async def get_landed_cost_coefficients():
+    """Coefficients affines du coût de revient par destination, pour une tarification hors ligne"""
+    coefficients = [
+        {
+            "country": code,
+            "a": a,
+            "b": b,
+            "vat_rate": vat,
+            "statistical_fee_rate": statistical_fee,
+            "community_levy_rate": community_levy,
+            "ecowas_levy_rate": ecowas_levy
+        }
+        for code, a, b, vat, statistical_fee, community_levy, ecowas_levy in zip(
+            tariff_engine.countries,
+            tariff_engine.value_coefficient.tolist(),
+            tariff_engine.duty_coefficient.tolist(),
+            tariff_engine.vat_rate.tolist(),
+            tariff_engine.statistical_fee_rate.tolist(),
+            tariff_engine.community_levy_rate.tolist(),
+            tariff_engine.ecowas_levy_rate.tolist()
+        )
     ]
-    sectors_result = await db.comprehensive_calculations.aggregate(pipeline_sectors).to_list(10)
+    return LandedCostCoefficientsResponse(
+        formula="total_cost = a * value + b * customs_duty",
+        tariff_data_version=tariff_engine.version,
+        coefficients=coefficients
+    )
+
+@api_router.post("/reverse-landed-cost", response_model=ReverseLandedCostResponse)
+async def reverse_landed_cost(request: ReverseLandedCostRequest):
+    """Valeur FOB maximale pour un coût de revient cible, en NPF et en ZLECAf (résolution exacte)"""
+    
+    destinations = request.destinations or [country['code'] for country in AFRICAN_COUNTRIES]
+    invalid = [code for code in destinations if code not in AFRICAN_COUNTRY_CODES]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Pays non membres de la ZLECAf", "countries": invalid[:100]}
+        )
+    _check_year_or_400(request.year)
+    
+    columns = solve_max_values(
+        tariff_engine,
+        destinations=destinations,
+        hs_code=request.hs_code,
+        target_total_cost=request.target_total_cost,
+        year=request.year
+    )
+    names = list(columns.keys())
+    results = [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+    
+    return ReverseLandedCostResponse(
+        hs_code=request.hs_code,
+        target_total_cost=request.target_total_cost,
+        year=request.year,
+        results=results,
+        tariff_data_version=tariff_engine.version
+    )
+
+@api_router.post("/calculate-tariff/stream")
+async def calculate_tariff_stream(request: Request, format: Optional[str] = None):
+    """
+    Calculer un manifeste CSV ou NDJSON envoyé en flux (corps brut de la requête)
+
+    Les résultats sont renvoyés en NDJSON au fur et à mesure, bloc par bloc.
+    Le format est déduit du Content-Type si `format` n'est pas précisé.
+    """
+    
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in MANIFEST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {fmt} (csv ou ndjson)")
+    
+    return DuplexStreamingResponse(
+        stream_tariff_results(
+            tariff_engine,
+            request.stream(),
+            fmt,
+            valid_countries=AFRICAN_COUNTRY_CODES,
+            chunk_size=STREAM_CHUNK_SIZE
+        ),
+        media_type="application/x-ndjson"
+    )
+
+@api_router.post("/jobs", response_model=CalculationJob, status_code=202)
+async def submit_calculation_job(request: Request, format: Optional[str] = None):
+    """
+    Soumettre un manifeste CSV ou NDJSON trop volumineux pour une requête HTTP
+
+    Le corps est lu en flux (mêmes formats que /calculate-tariff/stream) et
+    enregistré bloc par bloc ; suivre la progression via /jobs/{job_id}.
+    Une ligne invalide rejette tout le travail.
+    """
+    
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in MANIFEST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {fmt} (csv ou ndjson)")
+    
+    async def shipments():
+        count = 0
+        invalid_rows = []
+        lines = iter_lines(request.stream())
+        async for line, shipment, error in parse_shipments(lines, fmt, AFRICAN_COUNTRY_CODES, schedule_years(tariff_engine)):
+            if error is not None:
+                invalid_rows.append({"line": line, "error": error})
+                continue
+            count += 1
+            if count > MAX_JOB_SHIPMENTS:
+                raise HTTPException(status_code=400, detail=f"Travail trop volumineux (maximum {MAX_JOB_SHIPMENTS} expéditions)")
+            if not invalid_rows:
+                yield shipment
+        if invalid_rows:
+            raise HTTPException(
+                status_code=400,
+                detail={"message": "Lignes invalides dans le manifeste", "rows": invalid_rows[:100]}
+            )
+    
+    try:
+        job = await calculation_jobs.submit(shipments())
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return CalculationJob(**job)
+
+@api_router.get("/jobs/{job_id}", response_model=CalculationJob)
+async def get_calculation_job(job_id: str):
+    """Statut et progression d'un travail de calcul"""
+    job = await calculation_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Travail introuvable")
+    return CalculationJob(**job)
+
+@api_router.get("/jobs/{job_id}/results")
+async def get_calculation_job_results(job_id: str):
+    """Résultats d'un travail terminé, en NDJSON (une ligne par expédition, dans l'ordre de soumission)"""
+    job = await calculation_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Travail introuvable")
+    if job["status"] != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Travail non terminé (statut: {job['status']})")
+    
+    async def rows():
+        async for row in calculation_jobs.iter_results(job_id):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+@api_router.get("/events")
+async def stream_events(
+    topics: Optional[str] = Query(None, description="Sujets séparés par des virgules: statistics, job (par défaut: statistics, et job si job_id est fourni)"),
+    job_id: Optional[str] = Query(None, description="Travail de calcul à suivre (obligatoire pour le sujet job)")
+):
+    """
+    Flux Server-Sent Events des variations de statistiques et de la progression d'un travail
+
+    Avec le sujet `statistics`, un instantané (`statistics_snapshot`, même
+    contenu que /statistics) est envoyé à l'ouverture, puis chaque lot de
+    calculs enregistrés publie un événement `statistics` à ajouter à cet
+    instantané ; `job` publie le document du travail `job_id` après chaque
+    bloc traité. Chaque variation porte le numéro `sequence` de son lot : celles
+    reçues pendant la construction de l'instantané et déjà incluses sont écartées.
+    """
+    
+    if topics is None:
+        requested = {"statistics", "job"} if job_id is not None else {"statistics"}
+    else:
+        requested = {topic.strip() for topic in topics.split(",") if topic.strip()}
+    unknown = requested - set(EVENT_TOPICS)
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Sujets inconnus: {', '.join(sorted(unknown)) or '(aucun)'}")
+    if "job" in requested and job_id is None:
+        raise HTTPException(status_code=400, detail="Le sujet job nécessite job_id")
+    
+    accept = None
+    if "job" in requested:
+        accept = lambda topic, data: topic != "job" or data.get("id") == job_id
+    subscription = event_broadcaster.subscribe(requested, accept)
+    
+    # Abonnement avant l'instantané : aucune variation n'est perdue entre les deux
+    initial = []
+    stale = None
+    if "statistics" in requested:
+        try:
+            snapshot = await build_statistics()
+            initial.append(("statistics_snapshot", snapshot))
+            stale = lambda topic, data: topic == "statistics" and data["sequence"] <= snapshot["sequence"]
+        except Exception as e:
+            logging.warning(f"Instantané des statistiques indisponible: {e}")
+    if "job" in requested:
+        job = await calculation_jobs.status(job_id)
+        if job is not None:
+            initial.append(("job", job))
+    
+    return StreamingResponse(
+        event_broadcaster.stream(subscription, initial, heartbeat=EVENT_HEARTBEAT, stale=stale),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _as_naive_utc(value: datetime) -> datetime:
+    """Les compartiments sont indexés en UTC naïf, comme les timestamps des calculs"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@api_router.get("/statistics")
+async def get_comprehensive_statistics(
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    granularity: Optional[str] = None
+):
+    """Récupérer les statistiques complètes ZLECAf (optionnellement sur une période)"""
+    
+    # Statistiques sur une période, servies par les compartiments horaires/journaliers
+    time_range = None
+    if from_date or to_date or granularity:
+        granularity = granularity or "day"
+        if granularity not in STATISTICS_GRANULARITIES:
+            raise HTTPException(status_code=400, detail=f"Granularité invalide (valeurs possibles: {', '.join(STATISTICS_GRANULARITIES)})")
+        to_date = _as_naive_utc(to_date) if to_date else datetime.utcnow()
+        from_date = _as_naive_utc(from_date) if from_date else to_date - timedelta(days=7)
+        if from_date >= to_date:
+            raise HTTPException(status_code=400, detail="La date de début doit précéder la date de fin")
+        time_range = await statistics_rollup.read_range(from_date, to_date, granularity)
+    
+    return await build_statistics(time_range)
+
+async def build_statistics(time_range: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Contenu de /statistics, également envoyé comme instantané du flux /events"""
+    
+    # Compteurs cumulés (maintenus à l'insertion, indépendants de la taille de la collection)
+    rollup, sequence = await statistics_rollup.snapshot()
     
     # Calcul de l'impact économique potentiel
     african_population = sum([country['population'] for country in AFRICAN_COUNTRIES])
@@ -656,17 +1612,20 @@ async def get_comprehensive_statistics():
     
     return {
         "overview": {
-            "total_calculations": total_calculations,
-            "total_savings": total_savings,
+            "total_calculations": rollup["total_calculations"],
+            "total_savings": rollup["total_savings"],
             "african_countries_members": len(AFRICAN_COUNTRIES),
             "combined_population": african_population,
             "estimated_combined_gdp": estimated_gdp
         },
         "trade_statistics": {
-            "most_active_countries": countries_result,
-            "popular_hs_codes": hs_result,
-            "top_beneficiary_sectors": sectors_result
+            "most_active_countries": rollup["most_active_countries"],
+            "popular_hs_codes": rollup["popular_hs_codes"],
+            "top_beneficiary_sectors": rollup["top_beneficiary_sectors"]
         },
+        "time_range": time_range,
+        # Dernier lot inclus : les événements statistics de numéro inférieur ou égal sont déjà comptés
+        "sequence": sequence,
         "zlecaf_impact": {
             "average_tariff_reduction": "85%",
             "estimated_trade_creation": "52 milliards USD",
@@ -753,6 +1712,67 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.on_event("startup")
+async def initialize_database():
+    try:
+        created = await ensure_calculation_indexes(db.comprehensive_calculations)
+        logger.info(f"Index comprehensive_calculations: {', '.join(created)}")
+    except Exception as e:
+        logger.error(f"Création des index impossible: {e}")
+    try:
+        await statistics_rollup.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Création des index des statistiques cumulées impossible: {e}")
+    # Reconstruction éventuelle en arrière-plan ; les lots enregistrés d'ici là sont mis en attente
+    statistics_rollup.start()
+    calculation_writer.start()
+    try:
+        await calculation_jobs.ensure_indexes()
+        await calculation_jobs.start()
+    except Exception as e:
+        logger.error(f"Démarrage de la file de travaux impossible: {e}")
+
+@app.on_event("startup")
+async def load_external_data_snapshots():
+    # Instantané HS4 complet des top producteurs OEC, chargé avant le premier trafic
+    snapshot_path = os.environ.get('OEC_CACHE_SNAPSHOT')
+    if snapshot_path and Path(snapshot_path).exists():
+        loaded = await asyncio.to_thread(oec_client.cache.load_snapshot, snapshot_path)
+        logger.info(f"Cache OEC préchargé depuis {snapshot_path}: {loaded} entrées")
+    await asyncio.to_thread(oec_client.cache.purge_expired)
+    # Téléchargement en masse Banque mondiale, lu hors de la boucle d'événements
+    bulk_path = os.environ.get('WB_BULK_PATH')
+    if bulk_path and Path(bulk_path).exists():
+        indicators = [code for code in os.environ.get('WB_BULK_INDICATORS', '').split(',') if code] or None
+        try:
+            await asyncio.to_thread(
+                wb_client.load_snapshot, bulk_path, [country['wb_code'] for country in AFRICAN_COUNTRIES], indicators
+            )
+        except Exception as e:
+            logger.error(f"Chargement des indicateurs Banque mondiale depuis {bulk_path} impossible: {e}")
+    elif wb_client.offline:
+        logger.warning("WB_OFFLINE actif sans WB_BULK_PATH : données Banque mondiale vides")
+    # Matrice des exportations SH4 (produite par backend/trade_matrix.py), ouverte en mmap
+    matrix_dir = os.environ.get('TRADE_MATRIX_DIR')
+    if matrix_dir and Path(matrix_dir).exists():
+        try:
+            oec_client.attach_trade_matrix(TradeMatrix.open(matrix_dir))
+            logger.info(f"Matrice des exportations chargée depuis {matrix_dir}: {oec_client.trade_matrix.stats()}")
+        except Exception as e:
+            logger.error(f"Ouverture de la matrice des exportations {matrix_dir} impossible: {e}")
+    # Préchauffage en arrière-plan : /api/health/ready répond 503 jusqu'au premier passage complet
+    cache_warmer.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Vider la file d'écriture avant de fermer la connexion MongoDB
+    await calculation_writer.drain()
+    # Les travaux en cours reprendront au prochain démarrage
+    await calculation_jobs.stop()
+    await cache_warmer.stop()
+    await statistics_rollup.stop()
+    job_executor.shutdown(wait=False, cancel_futures=True)
+    await wb_client.aclose()
+    await oec_client.aclose()
+    oec_client.cache.close()
     client.close()
\ No newline at end of file
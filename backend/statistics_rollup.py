@@ -0,0 +1,425 @@
+# Statistiques ZLECAf maintenues de façon incrémentale
+# Chaque lot de calculs enregistrés incrémente ($inc) des compteurs dans une
+# collection de cumul ; /api/statistics lit ces compteurs au lieu d'agréger
+# toute la collection comprehensive_calculations.
+# Des compartiments horaires et journaliers (par corridor et chapitre SH)
+# permettent en plus de répondre aux requêtes sur une période.
+# La reconstruction depuis l'historique tourne en tâche de fond : elle ne
+# parcourt que les calculs antérieurs à une limite haute (plus grand `_id` au
+# début du parcours) et les lots enregistrés entre-temps sont mis en attente,
+# puis seuls ceux au-delà de la limite sont cumulés une fois la reconstruction
+# terminée.
+
+import asyncio
+import logging
+import os
+import socket
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW_ID = "overview"
+# Marqueur de reconstruction : verrou (rebuilding, owner, lease_expires_at), high_water et completed_at
+REBUILD_ID = "rebuild"
+
+# Dimension -> fonction d'extraction de la clé depuis un calcul
+DIMENSIONS = {
+    "origin_country": lambda doc: doc.get("origin_country"),
+    "hs_code": lambda doc: doc.get("hs_code"),
+    "sector": lambda doc: (doc.get("hs_code") or "")[:2],
+}
+
+
+def build_rollup_increments(documents: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """
+    Regrouper un lot de calculs en incréments par (dimension, clé)
+
+    La vue d'ensemble est renvoyée sous la clé (OVERVIEW_ID, "").
+    """
+    increments: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: {"count": 0, "total_savings": 0.0})
+    for doc in documents:
+        savings = doc.get("savings") or 0.0
+        targets = [(OVERVIEW_ID, "")] + [
+            (dimension, key) for dimension, extract in DIMENSIONS.items()
+            if (key := extract(doc))
+        ]
+        for target in targets:
+            increments[target]["count"] += 1
+            increments[target]["total_savings"] += savings
+    return dict(increments)
+
+
+def statistics_delta(documents: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Variation des statistiques apportée par un lot de calculs
+
+    Format publié aux clients SSE : totaux de la vue d'ensemble puis compteurs
+    par dimension, à ajouter à l'instantané détenu par le client.
+    """
+    delta: Dict[str, Any] = {"total_calculations": 0, "total_savings": 0.0}
+    delta.update({dimension: {} for dimension in DIMENSIONS})
+    for (dimension, key), values in build_rollup_increments(documents).items():
+        if dimension == OVERVIEW_ID:
+            delta["total_calculations"] = values["count"]
+            delta["total_savings"] = values["total_savings"]
+        else:
+            delta[dimension][key] = values
+    return delta
+
+
+# Granularités des compartiments temporels
+GRANULARITIES = ("hour", "day")
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Début du compartiment contenant `timestamp`"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Granularité inconnue: {granularity}")
+
+
+def build_bucket_increments(documents: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, datetime], Dict[str, float]]:
+    """
+    Regrouper un lot de calculs en incréments par (granularité, début de compartiment)
+
+    Les compteurs par corridor et par chapitre SH sont des champs imbriqués
+    (`corridors.CI-SN.count`, `chapters.01.total_savings`) adaptés à $inc ;
+    seuls des codes alphanumériques (chapitre : deux chiffres) entrent dans le
+    chemin du champ, un « . » ou un « $ » y serait interprété par MongoDB.
+    """
+    increments: Dict[Tuple[str, datetime], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for doc in documents:
+        timestamp = doc.get("timestamp")
+        if not isinstance(timestamp, datetime):
+            continue
+        savings = doc.get("savings") or 0.0
+        fields = [""]
+        origin, destination = str(doc.get("origin_country") or ""), str(doc.get("destination_country") or "")
+        if origin.isalnum() and destination.isalnum():
+            fields.append(f"corridors.{origin}-{destination}.")
+        chapter = str(doc.get("hs_code") or "")[:2]
+        if len(chapter) == 2 and chapter.isascii() and chapter.isdigit():
+            fields.append(f"chapters.{chapter}.")
+        for granularity in GRANULARITIES:
+            bucket = increments[(granularity, bucket_start(timestamp, granularity))]
+            for prefix in fields:
+                bucket[f"{prefix}count"] += 1
+                bucket[f"{prefix}total_savings"] += savings
+    return {key: dict(values) for key, values in increments.items()}
+
+
+def _bucket_id(granularity: str, start: datetime) -> str:
+    return f"{granularity}:{start.isoformat()}"
+
+
+def _merge_counters(target: Dict[str, Dict[str, float]], counters: Dict[str, Dict[str, float]]):
+    for key, values in (counters or {}).items():
+        merged = target.setdefault(key, {"count": 0, "total_savings": 0.0})
+        merged["count"] += values.get("count", 0)
+        merged["total_savings"] += values.get("total_savings", 0.0)
+
+
+def _top_counters(counters: Dict[str, Dict[str, float]], limit: int) -> List[Dict[str, Any]]:
+    ranked = sorted(counters.items(), key=lambda item: item[1]["count"], reverse=True)[:limit]
+    return [{"_id": key, "count": values["count"], "total_savings": values["total_savings"]} for key, values in ranked]
+
+
+# Index des lectures de /api/statistics (noms par défaut de MongoDB)
+ROLLUP_INDEXES = [
+    IndexModel([("dimension", ASCENDING), ("count", DESCENDING)]),
+    IndexModel([("dimension", ASCENDING), ("total_savings", DESCENDING)]),
+]
+BUCKET_INDEXES = [IndexModel([("granularity", ASCENDING), ("bucket_start", ASCENDING)])]
+
+# Classements lus par read() : (champ de la réponse, dimension, tri)
+TOP_READS = (
+    ("most_active_countries", "origin_country", "count"),
+    ("popular_hs_codes", "hs_code", "count"),
+    ("top_beneficiary_sectors", "sector", "total_savings"),
+)
+
+
+def top_query(dimension: str, sort_field: str) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+    """(filtre, tri) d'un classement de la collection de cumul"""
+    return {"dimension": dimension}, [(sort_field, DESCENDING)]
+
+
+def range_query(start: datetime, end: datetime, granularity: str) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+    """(filtre, tri) des compartiments couvrant [start, end)"""
+    return (
+        {"granularity": granularity, "bucket_start": {"$gte": bucket_start(start, granularity), "$lt": end}},
+        [("bucket_start", ASCENDING)],
+    )
+
+
+def _rollup_id(dimension: str, key: str) -> str:
+    return OVERVIEW_ID if dimension == OVERVIEW_ID else f"{dimension}:{key}"
+
+
+class StatisticsRollup:
+    """Compteurs cumulés des calculs, stockés dans une collection dédiée"""
+
+    def __init__(self, rollup_collection, source_collection, buckets_collection=None):
+        self.rollup = rollup_collection
+        self.source = source_collection
+        self.buckets = buckets_collection
+        # Incréments activés une fois les compteurs initialisés ; lots en attente jusque-là
+        self.ready = False
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        # Numéro du dernier lot cumulé par ce processus ; le verrou sépare lots et instantanés
+        self.sequence = 0
+        self._lock = asyncio.Lock()
+
+    async def ensure_indexes(self):
+        await self.rollup.create_indexes(ROLLUP_INDEXES)
+        if self.buckets is not None:
+            await self.buckets.create_indexes(BUCKET_INDEXES)
+
+    async def apply(self, documents: List[Dict[str, Any]], overview: bool = True):
+        """Incrémenter les compteurs pour un lot de calculs enregistrés (sans la vue d'ensemble si `overview` est faux)"""
+        increments = build_rollup_increments(documents)
+        if not overview:
+            increments.pop((OVERVIEW_ID, ""), None)
+        if not increments:
+            return
+        operations = [
+            UpdateOne(
+                {"_id": _rollup_id(dimension, key)},
+                {"$inc": values, "$set": {"dimension": dimension, "key": key}},
+                upsert=True
+            )
+            for (dimension, key), values in increments.items()
+        ]
+        await self.rollup.bulk_write(operations, ordered=False)
+
+        if self.buckets is not None:
+            bucket_operations = [
+                UpdateOne(
+                    {"_id": _bucket_id(granularity, start)},
+                    {"$inc": values, "$set": {"granularity": granularity, "bucket_start": start}},
+                    upsert=True
+                )
+                for (granularity, start), values in build_bucket_increments(documents).items()
+            ]
+            if bucket_operations:
+                await self.buckets.bulk_write(bucket_operations, ordered=False)
+
+    async def record(self, documents: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Cumuler un lot de calculs enregistrés et retourner son numéro de séquence
+
+        Tant que les compteurs ne sont pas initialisés, le lot est mis en
+        attente et None est retourné.
+        """
+        if not self.ready:
+            self._pending.extend(documents)
+            return None
+        async with self._lock:
+            await self.apply(documents)
+            self.sequence += 1
+            return self.sequence
+
+    async def snapshot(self, limit: int = 10) -> Tuple[Dict[str, Any], int]:
+        """read() et numéro du dernier lot qu'il inclut (aucun lot n'est cumulé pendant la lecture)"""
+        async with self._lock:
+            return await self.read(limit), self.sequence
+
+    async def ensure_initialized(self) -> bool:
+        """
+        Reconstruire les compteurs depuis l'historique s'ils n'existent pas ou si une reconstruction a été interrompue
+
+        Retourne False si une autre instance reconstruit encore les compteurs.
+        """
+        marker = await self.rollup.find_one({"_id": REBUILD_ID})
+        if marker is None:
+            # Compteurs antérieurs au marqueur : la vue d'ensemble suffit
+            if await self.rollup.find_one({"_id": OVERVIEW_ID}) is not None:
+                return True
+        elif marker.get("completed_at") is not None and not marker.get("rebuilding"):
+            return True
+        return await self.rebuild()
+
+    async def initialize(self, retry_interval: float = 5.0):
+        """
+        Initialiser les compteurs puis activer les incréments
+
+        Les lots en attente dont l'`_id` ne dépasse pas la limite haute de la
+        dernière reconstruction y sont déjà comptés et sont écartés.
+        """
+        while True:
+            try:
+                if await self.ensure_initialized():
+                    marker = await self.rollup.find_one({"_id": REBUILD_ID}) or {}
+                    break
+            except Exception as e:
+                logger.error(f"Initialisation des statistiques cumulées impossible: {e}")
+            await asyncio.sleep(retry_interval)
+        high_water = marker.get("high_water")
+        pending, self._pending = self._pending, []
+        if high_water is not None:
+            pending = [doc for doc in pending if doc.get("_id") is None or doc["_id"] > high_water]
+        self.ready = True
+        async with self._lock:
+            await self.apply(pending)
+            self.sequence += 1
+        logger.info(f"Statistiques cumulées initialisées ({len(pending)} calculs en attente cumulés)")
+
+    def start(self):
+        """Lancer l'initialisation en tâche de fond, sans retarder le démarrage"""
+        if self.ready or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self.initialize(), name="statistics-rollup")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _acquire_rebuild(self, owner: str, lease: float) -> bool:
+        """Prendre le verrou de reconstruction (libre, ou bail expiré) ; False s'il est détenu ailleurs"""
+        now = datetime.utcnow()
+        try:
+            await self.rollup.find_one_and_update(
+                {"_id": REBUILD_ID, "$or": [{"rebuilding": False}, {"lease_expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "rebuilding": True,
+                    "owner": owner,
+                    "started_at": now,
+                    "lease_expires_at": now + timedelta(seconds=lease),
+                    "completed_at": None,
+                    "high_water": None,
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def rebuild(self, batch_size: int = 10000, lease: float = 600.0) -> bool:
+        """
+        Recalculer entièrement les compteurs en parcourant comprehensive_calculations
+
+        Seuls les calculs dont l'`_id` ne dépasse pas la limite haute relevée au
+        début du parcours sont comptés ; la limite est enregistrée dans le
+        marqueur pour que chaque instance écarte ces calculs de ses lots en
+        attente. Une seule instance reconstruit à la fois (verrou à bail renouvelé à
+        chaque lot) ; la vue d'ensemble est écrite en dernier, puis le
+        marqueur reçoit `completed_at`. Retourne False si une autre
+        instance reconstruit déjà.
+        """
+        owner = f"{socket.gethostname()}-{os.getpid()}"
+        if not await self._acquire_rebuild(owner, lease):
+            logger.info("Reconstruction des statistiques cumulées déjà en cours sur une autre instance")
+            return False
+        logger.info("Reconstruction des statistiques cumulées...")
+        mine = {"_id": REBUILD_ID, "owner": owner}
+        await self.rollup.delete_many({"_id": {"$ne": REBUILD_ID}})
+        if self.buckets is not None:
+            await self.buckets.delete_many({})
+        latest = await self.source.find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+        high_water = latest["_id"] if latest else None
+        await self.rollup.update_one(mine, {"$set": {"high_water": high_water}})
+        count, total_savings = 0, 0.0
+        batch = []
+        projection = {"origin_country": 1, "destination_country": 1, "hs_code": 1, "savings": 1, "timestamp": 1, "_id": 0}
+        cursor = self.source.find({} if high_water is None else {"_id": {"$lte": high_water}}, projection)
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await self.apply(batch, overview=False)
+                count += len(batch)
+                total_savings += sum(doc.get("savings") or 0.0 for doc in batch)
+                batch = []
+                await self.rollup.update_one(
+                    mine, {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease)}}
+                )
+        if batch:
+            await self.apply(batch, overview=False)
+            count += len(batch)
+            total_savings += sum(doc.get("savings") or 0.0 for doc in batch)
+        # $inc : les calculs cumulés entre-temps par une autre instance restent comptés
+        await self.rollup.update_one(
+            {"_id": OVERVIEW_ID},
+            {"$inc": {"count": count, "total_savings": total_savings},
+             "$set": {"dimension": OVERVIEW_ID, "key": ""}},
+            upsert=True
+        )
+        await self.rollup.update_one(
+            mine, {"$set": {"rebuilding": False, "lease_expires_at": None, "completed_at": datetime.utcnow()}}
+        )
+        logger.info(f"Statistiques cumulées reconstruites ({count} calculs)")
+        return True
+
+    async def _top(self, dimension: str, sort_field: str, limit: int) -> List[Dict[str, Any]]:
+        query, sort = top_query(dimension, sort_field)
+        cursor = self.rollup.find(query).sort(sort).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def read(self, limit: int = 10) -> Dict[str, Any]:
+        """Lire les statistiques au format historique de /api/statistics"""
+        overview = await self.rollup.find_one({"_id": OVERVIEW_ID}) or {}
+        countries, hs_codes, sectors = [
+            await self._top(dimension, sort_field, limit) for _, dimension, sort_field in TOP_READS
+        ]
+        return {
+            "total_calculations": overview.get("count", 0),
+            "total_savings": overview.get("total_savings", 0),
+            "most_active_countries": [
+                {"_id": row["key"], "count": row["count"]} for row in countries
+            ],
+            "popular_hs_codes": [
+                {"_id": row["key"], "count": row["count"], "avg_savings": row["total_savings"] / row["count"]}
+                for row in hs_codes
+            ],
+            "top_beneficiary_sectors": [
+                {"_id": row["key"], "count": row["count"], "total_savings": row["total_savings"]}
+                for row in sectors
+            ],
+        }
+
+    async def read_range(self, start: datetime, end: datetime, granularity: str = "day",
+                         limit: int = 10) -> Dict[str, Any]:
+        """Statistiques sur [start, end) à partir des compartiments pré-agrégés"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularité inconnue: {granularity}")
+        query, sort = range_query(start, end, granularity)
+        cursor = self.buckets.find(query).sort(sort)
+
+        series = []
+        corridors: Dict[str, Dict[str, float]] = {}
+        chapters: Dict[str, Dict[str, float]] = {}
+        total_calculations, total_savings = 0, 0.0
+        async for bucket in cursor:
+            series.append({
+                "bucket_start": bucket["bucket_start"].isoformat(),
+                "count": bucket.get("count", 0),
+                "total_savings": bucket.get("total_savings", 0.0),
+            })
+            total_calculations += bucket.get("count", 0)
+            total_savings += bucket.get("total_savings", 0.0)
+            _merge_counters(corridors, bucket.get("corridors"))
+            _merge_counters(chapters, bucket.get("chapters"))
+
+        return {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "granularity": granularity,
+            "total_calculations": total_calculations,
+            "total_savings": total_savings,
+            "series": series,
+            "top_corridors": _top_counters(corridors, limit),
+            "top_hs_chapters": _top_counters(chapters, limit),
+        }
@@ -0,0 +1,400 @@
+# Moteur tarifaire précompilé ZLECAf
+# Les taux NPF et ZLECAf sont résolus une fois pour toutes au chargement en
+# matrices denses (lignes = codes SH6/SH4/SH2, colonnes = pays de destination).
+# Une recherche par requête se réduit alors à deux accès dictionnaire et un
+# accès tableau, sans allocation.
+# Le calendrier de démantèlement est précalculé de la même façon dans un cube
+# (ligne, pays, année) : un taux ZLECAf pour une année donnée coûte un accès.
+
+import csv
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from tax_rates import (
+    NORMAL_TARIFF_RATES,
+    ZLECAF_TARIFF_RATES,
+    DEFAULT_NORMAL_TARIFF_RATE,
+    DEFAULT_ZLECAF_TARIFF_RATE,
+    get_normal_tariff_rate,
+    get_zlecaf_tariff_rate,
+    get_vat_rate,
+    get_statistical_fee_rate,
+    get_community_levy_rate,
+    get_ecowas_levy_rate,
+)
+from generate_afcfta_2025_data import DISMANTLING_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Fichiers de la release (frontend/public/data) utilisés par le moteur
+RATES_BY_YEAR_FILE = 'zlecaf_afcfta_rates_by_year_2025.csv'
+DISMANTLING_SCHEDULE_FILE = 'zlecaf_dismantling_schedule.csv'
+DISMANTLING_MATRIX_FILE = 'zlecaf_dismantling_matrix_2025.csv'
+IMMEDIATE_DISMANTLED_FILE = 'zlecaf_immediate_dismantled_2025.csv'
+
+# Année 0 du démantèlement ; le cube couvre jusqu'à la fin de la catégorie la plus longue
+DISMANTLING_BASE_YEAR = 2025
+LAST_SCHEDULE_YEAR = DISMANTLING_BASE_YEAR + max(
+    category["years"] or 0 for category in DISMANTLING_CATEGORIES.values()
+)
+
+# Un taux surchargé : (pays ISO2, code SH à 2, 4 ou 6 chiffres, taux NPF, taux ZLECAf)
+# Les taux sont des fractions (0.15 = 15 %) ; None conserve la valeur du niveau parent.
+RateOverride = Tuple[str, str, Optional[float], Optional[float]]
+
+# Un calendrier : (pays ISO2, code SH, catégorie de DISMANTLING_CATEGORIES
+# ou points {année: taux ZLECAf} interpolés linéairement)
+Schedule = Tuple[str, str, Union[str, Dict[int, float]]]
+
+
+def normalize_hs_code(hs_code: str) -> str:
+    """Ne conserver que les chiffres d'un code SH (« 0101.21 » -> « 010121 »)"""
+    return ''.join(ch for ch in str(hs_code) if ch.isdigit())
+
+
+def _parse_pct(value: str) -> Optional[float]:
+    value = (value or '').strip()
+    return float(value) / 100 if value else None
+
+
+def remaining_share(category: str, years: np.ndarray) -> np.ndarray:
+    """Part de l'écart NPF -> taux final restant à démanteler pour chaque année"""
+    duration = DISMANTLING_CATEGORIES[category]["years"]
+    if duration is None:
+        return np.ones(len(years))
+    if duration == 0:
+        return np.zeros(len(years))
+    return np.clip(1 - (years - DISMANTLING_BASE_YEAR) / duration, 0, 1)
+
+
+class TariffEngine:
+    """
+    Taux NPF/ZLECAf par (code SH, pays de destination) résolus SH6 -> SH4 -> SH2
+
+    Toutes les lignes (SH2, SH4 puis SH6) sont empilées dans deux matrices
+    `normal_rates` et `zlecaf_rates` de forme (lignes, pays) ; chaque ligne SH4
+    hérite de son chapitre et chaque ligne SH6 de sa position SH4 lorsqu'aucun
+    taux spécifique n'est publié. `zlecaf_rates_by_year` (lignes, pays, années)
+    donne le taux ZLECAf applicable chaque année selon le même héritage ; sans
+    calendrier connu, le taux final s'applique dès la première année.
+    """
+
+    def __init__(self, countries: Iterable[str], overrides: Iterable[RateOverride] = (),
+                 nomenclature: Iterable[str] = (), schedules: Iterable[Schedule] = (),
+                 first_year: int = DISMANTLING_BASE_YEAR, last_year: int = LAST_SCHEDULE_YEAR,
+                 version: Optional[str] = None):
+        self.countries: List[str] = list(countries)
+        self.country_index: Dict[str, int] = {code: i for i, code in enumerate(self.countries)}
+        overrides = [
+            (country, normalize_hs_code(code), normal, zlecaf)
+            for country, code, normal, zlecaf in overrides
+            if country in self.country_index and len(normalize_hs_code(code)) in (2, 4, 6)
+        ]
+        schedules = [
+            (country, normalize_hs_code(code), schedule)
+            for country, code, schedule in schedules
+            if country in self.country_index and len(normalize_hs_code(code)) in (2, 4, 6)
+            and (not isinstance(schedule, str) or schedule in DISMANTLING_CATEGORIES)
+        ]
+        self.override_count = len(overrides)
+        self.schedule_count = len(schedules)
+        self.years = np.arange(first_year, last_year + 1)
+        self._compile(overrides, schedules, {normalize_hs_code(code) for code in nomenclature})
+
+        # Vecteurs de taxes par destination (en %), alignés sur `countries`
+        self.vat_rate = self._country_vector(get_vat_rate)
+        self.statistical_fee_rate = self._country_vector(get_statistical_fee_rate)
+        self.community_levy_rate = self._country_vector(get_community_levy_rate)
+        self.ecowas_levy_rate = self._country_vector(get_ecowas_levy_rate)
+
+        # calculate_all_taxes est affine : total = a·valeur + b·droits, avec
+        # b = 1 + TVA et a = b·(1 + prélèvements assis sur la valeur)
+        self.duty_coefficient = 1 + self.vat_rate / 100
+        self.value_coefficient = self.duty_coefficient * (
+            1 + (self.statistical_fee_rate + self.community_levy_rate + self.ecowas_levy_rate) / 100
+        )
+        self.duty_coefficient.setflags(write=False)
+        self.value_coefficient.setflags(write=False)
+        self.version = version or self._compute_version(overrides, schedules)
+
+    def _country_vector(self, getter) -> np.ndarray:
+        vector = np.array([getter(code) for code in self.countries], dtype=float)
+        vector.setflags(write=False)
+        return vector
+
+    def _compile(self, overrides: List[RateOverride], schedules: List[Schedule], nomenclature: set):
+        codes_by_level: Dict[int, set] = {4: set(), 6: {code for code in nomenclature if len(code) == 6}}
+        for _, code, *_ in overrides + schedules:
+            if len(code) in codes_by_level:
+                codes_by_level[len(code)].add(code)
+
+        # Lignes : 100 chapitres SH2 + une ligne par défaut, puis SH4, puis SH6
+        hs2_codes = [f"{chapter:02d}" for chapter in range(100)]
+        self.default_row = len(hs2_codes)
+        self.hs2_rows = {code: row for row, code in enumerate(hs2_codes)}
+        hs4_codes = sorted(codes_by_level[4])
+        offset = self.default_row + 1
+        self.hs4_rows = {code: offset + i for i, code in enumerate(hs4_codes)}
+        hs6_codes = sorted(codes_by_level[6])
+        offset += len(hs4_codes)
+        self.hs6_rows = {code: offset + i for i, code in enumerate(hs6_codes)}
+        rows = {**self.hs2_rows, **self.hs4_rows, **self.hs6_rows}
+
+        # Blocs (niveau, début, fin, lignes parentes) traités dans l'ordre d'héritage
+        blocks = [
+            (2, 0, self.default_row + 1, None),
+            (4, self.default_row + 1, offset, np.array([self.hs2_rows[code[:2]] for code in hs4_codes], dtype=np.intp)),
+            (6, offset, offset + len(hs6_codes), np.array(
+                [self.hs4_rows.get(code[:4], self.hs2_rows[code[:2]]) for code in hs6_codes], dtype=np.intp
+            )),
+        ]
+
+        n_rows, n_countries = offset + len(hs6_codes), len(self.countries)
+        normal = np.empty((n_rows, n_countries))
+        zlecaf = np.empty((n_rows, n_countries))
+        normal[:self.default_row + 1] = np.array(
+            [get_normal_tariff_rate(code) for code in hs2_codes] + [DEFAULT_NORMAL_TARIFF_RATE]
+        )[:, None]
+        zlecaf[:self.default_row + 1] = np.array(
+            [get_zlecaf_tariff_rate(code) for code in hs2_codes] + [DEFAULT_ZLECAF_TARIFF_RATE]
+        )[:, None]
+        own_zlecaf = np.zeros((n_rows, n_countries), dtype=bool)
+
+        for level, start, stop, parents in blocks:
+            if parents is not None:
+                normal[start:stop] = normal[parents]
+                zlecaf[start:stop] = zlecaf[parents]
+            for country, code, normal_rate, zlecaf_rate in overrides:
+                if len(code) != level:
+                    continue
+                row, column = rows[code], self.country_index[country]
+                if normal_rate is not None:
+                    normal[row, column] = normal_rate
+                if zlecaf_rate is not None:
+                    zlecaf[row, column] = zlecaf_rate
+                    own_zlecaf[row, column] = True
+            # Lignes exclues de la libéralisation : le taux final reste le taux NPF
+            for country, code, schedule in schedules:
+                if len(code) == level and isinstance(schedule, str) and DISMANTLING_CATEGORIES[schedule]["years"] is None:
+                    row, column = rows[code], self.country_index[country]
+                    zlecaf[row, column] = normal[row, column]
+                    own_zlecaf[row, column] = True
+
+        # Cube annuel : taux final par défaut, hérité du parent sauf taux propre,
+        # puis catégories de démantèlement et points publiés
+        cube = np.repeat(zlecaf[:, :, None], len(self.years), axis=2)
+        for level, start, stop, parents in blocks:
+            if parents is not None:
+                inherited = ~own_zlecaf[start:stop]
+                block = cube[start:stop]
+                block[inherited] = cube[parents][inherited]
+            for country, code, schedule in schedules:
+                if len(code) != level:
+                    continue
+                row, column = rows[code], self.country_index[country]
+                if isinstance(schedule, str):
+                    final = zlecaf[row, column]
+                    cube[row, column] = final + (normal[row, column] - final) * remaining_share(schedule, self.years)
+                else:
+                    points = sorted(schedule.items())
+                    cube[row, column] = np.interp(self.years, [p[0] for p in points], [p[1] for p in points])
+
+        self.normal_rates = normal
+        self.zlecaf_rates = zlecaf
+        self.zlecaf_rates_by_year = cube
+        for matrix in (self.normal_rates, self.zlecaf_rates, self.zlecaf_rates_by_year):
+            matrix.setflags(write=False)
+        self.row_for = lru_cache(maxsize=65536)(self._resolve_row)
+
+    def _compute_version(self, overrides: List[RateOverride], schedules: List[Schedule]) -> str:
+        digest = hashlib.sha1()
+        digest.update(json.dumps([NORMAL_TARIFF_RATES, ZLECAF_TARIFF_RATES], sort_keys=True).encode())
+        digest.update(json.dumps(sorted(overrides, key=lambda o: (o[0], o[1])), default=str).encode())
+        digest.update(json.dumps(sorted(schedules, key=lambda s: (s[0], s[1])), sort_keys=True, default=str).encode())
+        digest.update(json.dumps(sorted(self.hs6_rows)).encode())
+        digest.update(f"{self.years[0]}-{self.years[-1]}".encode())
+        digest.update(self.value_coefficient.tobytes() + self.duty_coefficient.tobytes())
+        return digest.hexdigest()[:12]
+
+    def _resolve_row(self, hs_code: str) -> int:
+        """Ligne des matrices pour un code SH (repli SH6 -> SH4 -> SH2 -> défaut)"""
+        code = normalize_hs_code(hs_code)
+        row = self.hs6_rows.get(code[:6]) if len(code) >= 6 else None
+        if row is None and len(code) >= 4:
+            row = self.hs4_rows.get(code[:4])
+        if row is None:
+            row = self.hs2_rows.get(code[:2], self.default_row)
+        return row
+
+    def check_year(self, year: int) -> int:
+        """Valider une année du calendrier ; ValueError si elle sort de la période couverte"""
+        first, last = int(self.years[0]), int(self.years[-1])
+        if not first <= int(year) <= last:
+            raise ValueError(f"Année {year} hors du calendrier de démantèlement ({first}-{last})")
+        return int(year)
+
+    def year_index(self, year: int) -> int:
+        """Indice de l'année dans le cube (ValueError hors de la période couverte)"""
+        return self.check_year(year) - int(self.years[0])
+
+    def year_indices(self, years: Iterable[int]) -> np.ndarray:
+        """Version vectorisée de year_index"""
+        indices = np.asarray(list(years), dtype=int) - int(self.years[0])
+        outside = (indices < 0) | (indices >= len(self.years))
+        if outside.any():
+            self.check_year(int(indices[outside][0]) + int(self.years[0]))
+        return indices.astype(np.intp)
+
+    def resolve(self, hs_code: str, destination: str, year: Optional[int] = None) -> Tuple[float, float]:
+        """
+        Taux (NPF, ZLECAf) pour un code SH importé dans `destination` (ISO2)
+
+        Sans `year`, le taux ZLECAf final est renvoyé.
+        """
+        row = self.row_for(hs_code)
+        column = self.country_index[destination]
+        if year is None:
+            return float(self.normal_rates[row, column]), float(self.zlecaf_rates[row, column])
+        return float(self.normal_rates[row, column]), float(self.zlecaf_rates_by_year[row, column, self.year_index(year)])
+
+    def rows_for(self, hs_codes: Iterable[str]) -> np.ndarray:
+        """Lignes des matrices pour une suite de codes SH"""
+        codes = np.asarray(list(hs_codes), dtype=str)
+        if codes.size == 0:
+            return np.zeros(0, dtype=np.intp)
+        uniques, inverse = np.unique(codes, return_inverse=True)
+        return np.array([self.row_for(code) for code in uniques], dtype=np.intp)[inverse.reshape(-1)]
+
+    def columns_for(self, destinations: Iterable[str]) -> np.ndarray:
+        """Colonnes des matrices pour une suite de pays ISO2 (KeyError si non membre)"""
+        codes = np.asarray(list(destinations), dtype=str)
+        if codes.size == 0:
+            return np.zeros(0, dtype=np.intp)
+        uniques, inverse = np.unique(codes, return_inverse=True)
+        return np.array([self.country_index[code] for code in uniques], dtype=np.intp)[inverse.reshape(-1)]
+
+    def resolve_many(self, hs_codes: Iterable[str], destinations: Iterable[str],
+                     years: Optional[Iterable[Optional[int]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Version vectorisée de resolve
+
+        `years` est aligné sur les codes ; une année None donne le taux final.
+        """
+        rows = self.rows_for(hs_codes)
+        columns = self.columns_for(destinations)
+        normal = self.normal_rates[rows, columns]
+        zlecaf = self.zlecaf_rates[rows, columns]
+        if years is not None:
+            years = list(years)
+            dated = np.array([year is not None for year in years], dtype=bool)
+            if dated.any():
+                indices = self.year_indices(year for year in years if year is not None)
+                zlecaf[dated] = self.zlecaf_rates_by_year[rows[dated], columns[dated], indices]
+        return normal, zlecaf
+
+    def stats(self) -> Dict[str, Union[int, str]]:
+        return {
+            "version": self.version,
+            "countries": len(self.countries),
+            "hs6_lines": len(self.hs6_rows),
+            "hs4_lines": len(self.hs4_rows),
+            "overrides": self.override_count,
+            "schedules": self.schedule_count,
+            "years": f"{self.years[0]}-{self.years[-1]}",
+            "matrix_bytes": int(self.normal_rates.nbytes + self.zlecaf_rates.nbytes + self.zlecaf_rates_by_year.nbytes),
+        }
+
+    @classmethod
+    def load(cls, data_dir: Union[str, Path], countries: Iterable[str],
+             iso3_to_iso2: Dict[str, str]) -> "TariffEngine":
+        """
+        Construire le moteur à partir des fichiers de la release
+
+        - zlecaf_dismantling_schedule.csv : taux par pays et chapitre SH2
+          (Year_k = taux ZLECAf en année k ; Year_0 = taux NPF de base)
+        - zlecaf_afcfta_rates_by_year_2025.csv : taux publiés par pays, SH6 et année,
+          ou à défaut catégorie de démantèlement (colonne schedule)
+        - zlecaf_immediate_dismantled_2025.csv : positions démantelées immédiatement
+        - zlecaf_dismantling_matrix_2025.csv : nomenclature SH6 et catégorie par pays
+        Les fichiers absents ou les valeurs vides sont ignorés.
+        """
+        data_dir = Path(data_dir)
+        overrides: List[RateOverride] = []
+        schedules: List[Schedule] = []
+        nomenclature: List[str] = []
+
+        def iso2(code: str) -> str:
+            return iso3_to_iso2.get(code, code)
+
+        matrix_path = data_dir / DISMANTLING_MATRIX_FILE
+        if matrix_path.exists():
+            with open(matrix_path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if not row.get('hs6_code'):
+                        continue
+                    nomenclature.append(row['hs6_code'])
+                    for column, value in row.items():
+                        if column in iso3_to_iso2 and (value or '').strip() in DISMANTLING_CATEGORIES:
+                            schedules.append((iso2(column), row['hs6_code'], value.strip()))
+
+        immediate_path = data_dir / IMMEDIATE_DISMANTLED_FILE
+        if immediate_path.exists():
+            with open(immediate_path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    mfn = _parse_pct(row.get('initial_mfn_rate_pct'))
+                    if mfn is not None:
+                        overrides.append((iso2(row['country']), row['hs6_code'], mfn, None))
+                    if row.get('schedule') in DISMANTLING_CATEGORIES:
+                        schedules.append((iso2(row['country']), row['hs6_code'], row['schedule']))
+
+        schedule_path = data_dir / DISMANTLING_SCHEDULE_FILE
+        if schedule_path.exists():
+            with open(schedule_path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    points = {
+                        DISMANTLING_BASE_YEAR + int(key.split('_')[1]): rate
+                        for key, value in row.items()
+                        if key and key.startswith('Year_') and (rate := _parse_pct(value)) is not None
+                    }
+                    if points:
+                        first, last = min(points), max(points)
+                        overrides.append((row['Country'], row['HS2'], points[first], points[last]))
+                        schedules.append((row['Country'], row['HS2'], points))
+                    elif row.get('Category') in DISMANTLING_CATEGORIES:
+                        schedules.append((row['Country'], row['HS2'], row['Category']))
+
+        rates_path = data_dir / RATES_BY_YEAR_FILE
+        if rates_path.exists():
+            published: Dict[Tuple[str, str], Dict[str, object]] = {}
+            with open(rates_path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    entry = published.setdefault(
+                        (iso2(row['country']), row['hs6_code']), {"mfn": None, "points": {}, "category": None}
+                    )
+                    mfn = _parse_pct(row['mfn_rate_pct'])
+                    afcfta = _parse_pct(row['afcfta_rate_pct'])
+                    if mfn is not None and entry["mfn"] is None:
+                        entry["mfn"] = mfn
+                    if afcfta is not None:
+                        entry["points"][int(row['year'])] = afcfta
+                    if (row.get('schedule') or '').strip() in DISMANTLING_CATEGORIES:
+                        entry["category"] = row['schedule'].strip()
+            for (country, code), entry in published.items():
+                points = entry["points"]
+                final = points[max(points)] if points else None
+                if entry["mfn"] is not None or final is not None:
+                    overrides.append((country, code, entry["mfn"], final))
+                if points:
+                    schedules.append((country, code, points))
+                elif entry["category"]:
+                    schedules.append((country, code, entry["category"]))
+
+        engine = cls(countries, overrides=overrides, nomenclature=nomenclature, schedules=schedules)
+        logger.info(f"Moteur tarifaire chargé: {engine.stats()}")
+        return engine
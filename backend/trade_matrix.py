@@ -0,0 +1,219 @@
+# Matrice creuse des exportations SH4 × pays, pour les top producteurs hors ligne
+# Un export des flux (SH4, exportateur ISO3, année, valeur) est converti une
+# fois en matrice CSR (lignes = année × SH4, colonnes = pays) enregistrée en
+# fichiers .npy ; le serveur les ouvre en mémoire partagée (mmap) et calcule
+# le top des exportateurs africains sans appel à l'API OEC.
+#
+# Usage : python backend/trade_matrix.py export_hs4.csv data/trade_matrix
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = "metadata.json"
+ARRAYS = ("indptr", "indices", "data")
+
+# Noms de colonnes acceptés pour chaque champ de l'export
+COLUMN_ALIASES = {
+    "product": ("hs4", "hs4 id", "hs6", "hs6 id", "product", "product id"),
+    "country": ("exporter", "exporter iso3", "reporter", "reporter iso3", "country", "iso3"),
+    "year": ("year", "time"),
+    "value": ("export value", "export_value", "trade value", "trade_value", "value"),
+}
+
+# Colonnes d'identifiants OEC : section (1 ou 2 chiffres) suivie du SH4 (ex. 178703 -> 8703)
+OEC_ID_COLUMNS = ("hs4 id", "product id")
+
+
+def hs4_code(product: str, oec_id: bool = False) -> Optional[str]:
+    """
+    Position SH4 d'un code produit, None si sa longueur n'est pas reconnue
+
+    Un code SH a 4 chiffres (SH4) ou 6 chiffres (SH6, dont on garde la
+    position) ; un identifiant OEC en a 5 ou 6 et se termine par le SH4.
+    """
+    if not (product.isascii() and product.isdigit()):
+        return None
+    if oec_id:
+        return product[-4:] if len(product) in (5, 6) else None
+    if len(product) == 4:
+        return product
+    if len(product) == 6:
+        return product[:4]
+    return None
+
+
+def _open_text(path: Path) -> io.TextIOBase:
+    if path.suffix.lower() == ".gz":
+        return io.TextIOWrapper(gzip.open(path), encoding="utf-8-sig", newline="")
+    if path.suffix.lower() == ".zip":
+        archive = zipfile.ZipFile(path)
+        name = next(name for name in archive.namelist() if name.lower().endswith(".csv"))
+        return io.TextIOWrapper(archive.open(name), encoding="utf-8-sig", newline="")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def iter_trade_rows(path: Union[str, Path]) -> Iterator[Tuple[str, str, int, float]]:
+    """
+    (SH4, ISO3, année, valeur) pour chaque ligne valide d'un export CSV (éventuellement .gz ou .zip)
+
+    Les lignes dont le code produit n'est ni un SH4, ni un SH6, ni un
+    identifiant OEC sont ignorées et comptées dans un avertissement.
+    """
+    with _open_text(Path(path)) as handle:
+        reader = csv.reader(handle)
+        header = [name.strip().lower() for name in next(reader)]
+        columns = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            index = next((header.index(alias) for alias in aliases if alias in header), None)
+            if index is None:
+                raise ValueError(f"Colonne {field} introuvable dans {path} (attendu: {', '.join(aliases)})")
+            columns[field] = index
+        oec_id = header[columns["product"]] in OEC_ID_COLUMNS
+        rejected = 0
+        for values in reader:
+            try:
+                product = values[columns["product"]].strip()
+                value = float(values[columns["value"]])
+                year = int(values[columns["year"]])
+            except (IndexError, ValueError):
+                continue
+            code = hs4_code(product, oec_id)
+            if code is None:
+                rejected += 1
+                continue
+            yield code, values[columns["country"]].strip().upper(), year, value
+        if rejected:
+            logger.warning(f"{rejected} lignes ignorées dans {path} : code produit ni SH4, ni SH6, ni identifiant OEC")
+
+
+class TradeMatrix:
+    """
+    Exportations en CSR : la ligne (année, SH4) liste les pays exportateurs
+
+    `products`, `countries` et `years` donnent les libellés des axes ; les
+    tableaux indptr/indices/data peuvent être des memmap en lecture seule.
+    """
+
+    def __init__(self, products: List[str], countries: List[str], years: List[int],
+                 indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.products = list(products)
+        self.countries = list(countries)
+        self.years = list(years)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.product_index = {code: i for i, code in enumerate(self.products)}
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[str, str, int, float]]) -> "TradeMatrix":
+        """Construire la matrice ; les doublons (SH4, pays, année) sont additionnés"""
+        totals: Dict[Tuple[int, str, str], float] = defaultdict(float)
+        for product, country, year, value in rows:
+            totals[(year, product, country)] += value
+
+        products = sorted({product for _, product, _ in totals})
+        countries = sorted({country for _, _, country in totals})
+        years = sorted({year for year, _, _ in totals})
+        product_index = {code: i for i, code in enumerate(products)}
+        country_index = {code: i for i, code in enumerate(countries)}
+        year_index = {year: i for i, year in enumerate(years)}
+
+        n_rows = len(years) * len(products)
+        entries = sorted(
+            (year_index[year] * len(products) + product_index[product], country_index[country], value)
+            for (year, product, country), value in totals.items()
+        )
+        row_ids = np.fromiter((entry[0] for entry in entries), dtype=np.int64, count=len(entries))
+        indices = np.fromiter((entry[1] for entry in entries), dtype=np.int32, count=len(entries))
+        data = np.fromiter((entry[2] for entry in entries), dtype=np.float64, count=len(entries))
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=n_rows), out=indptr[1:])
+        return cls(products, countries, years, indptr, indices, data)
+
+    @classmethod
+    def ingest(cls, dump_path: Union[str, Path], directory: Union[str, Path]) -> "TradeMatrix":
+        """Convertir un export CSV en matrice enregistrée dans `directory`, puis l'ouvrir en mmap"""
+        cls.build(iter_trade_rows(dump_path)).save(directory)
+        return cls.open(directory)
+
+    def save(self, directory: Union[str, Path]):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        metadata = {"products": self.products, "countries": self.countries, "years": self.years}
+        (directory / METADATA_FILE).write_text(json.dumps(metadata), encoding="utf-8")
+
+    @classmethod
+    def open(cls, directory: Union[str, Path]) -> "TradeMatrix":
+        """Ouvrir une matrice enregistrée ; les tableaux restent sur disque (mmap, lecture seule)"""
+        directory = Path(directory)
+        metadata = json.loads((directory / METADATA_FILE).read_text(encoding="utf-8"))
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+        return cls(metadata["products"], metadata["countries"], metadata["years"], **arrays)
+
+    def column_mask(self, countries: Collection[str]) -> np.ndarray:
+        """Masque booléen des colonnes appartenant à `countries` (codes ISO3), à précalculer"""
+        wanted = set(countries)
+        return np.fromiter((code in wanted for code in self.countries), dtype=bool, count=len(self.countries))
+
+    def covers(self, product: str, year: int) -> bool:
+        return product in self.product_index and year in self.year_index
+
+    def top_exporters(self, product: str, year: int, mask: Optional[np.ndarray] = None,
+                      limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Les `limit` premiers exportateurs d'un SH4 pour une année, restreints à `mask`
+
+        Sélection partielle (argpartition) puis tri des seuls `limit` retenus.
+        """
+        if not self.covers(product, year):
+            return []
+        row = self.year_index[year] * len(self.products) + self.product_index[product]
+        start, end = int(self.indptr[row]), int(self.indptr[row + 1])
+        columns = np.asarray(self.indices[start:end])
+        values = np.asarray(self.data[start:end])
+        if mask is not None:
+            keep = mask[columns]
+            columns, values = columns[keep], values[keep]
+        if len(values) > limit:
+            selected = np.argpartition(-values, limit - 1)[:limit]
+            columns, values = columns[selected], values[selected]
+        order = np.lexsort((columns, -values))
+        return [(self.countries[columns[i]], float(values[i])) for i in order]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "products": len(self.products),
+            "countries": len(self.countries),
+            "years": self.years,
+            "entries": int(len(self.data)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matrice creuse des exportations SH4 × pays")
+    parser.add_argument("dump", help="Export CSV (SH4, exportateur ISO3, année, valeur), éventuellement .gz ou .zip")
+    parser.add_argument("output", help="Répertoire de la matrice (à indiquer dans TRADE_MATRIX_DIR)")
+    args = parser.parse_args()
+    matrix = TradeMatrix.ingest(args.dump, args.output)
+    print(json.dumps(matrix.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# Préchauffage des caches de données externes
+# Au démarrage puis périodiquement, les indicateurs Banque mondiale de tous les
+# pays membres et les top producteurs OEC des codes SH4 les plus demandés sont
+# chargés en cache avant l'arrivée du trafic. L'instance n'est déclarée prête
+# (/api/health/ready) qu'après un premier passage complet.
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+DISABLED = "disabled"
+
+
+class CacheWarmer:
+    """
+    Tâche de fond de préchauffage des caches Banque mondiale et OEC
+
+    `popular_hs_codes` fournit, à chaque passage, les codes SH à précharger
+    (ramenés au SH4 par le client OEC). Les échecs d'un fournisseur sont
+    comptés mais n'empêchent pas l'instance de devenir prête.
+    """
+
+    def __init__(self, wb_client, oec_client, wb_codes: List[str],
+                 popular_hs_codes: Callable[[], Awaitable[List[str]]],
+                 interval: float = 6 * 3600, wb_batch_size: int = 20, concurrency: int = 8,
+                 enabled: bool = True):
+        self.wb_client = wb_client
+        self.oec_client = oec_client
+        self.wb_codes = list(dict.fromkeys(wb_codes))
+        self.popular_hs_codes = popular_hs_codes
+        self.interval = interval
+        self.wb_batch_size = wb_batch_size
+        self.concurrency = concurrency
+        self.status = PENDING if enabled else DISABLED
+        self.rounds = 0
+        self.progress = self._empty_progress()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _empty_progress() -> Dict[str, Dict[str, int]]:
+        return {
+            "world_bank": {"done": 0, "total": 0, "failed": 0},
+            "oec": {"done": 0, "total": 0, "failed": 0},
+        }
+
+    @property
+    def ready(self) -> bool:
+        """Prête dès le premier passage terminé (ou si le préchauffage est désactivé)"""
+        return self.status == DISABLED or self.rounds > 0
+
+    async def _warm_world_bank(self, progress: Dict[str, int]):
+        # Hors ligne, les réponses viennent du téléchargement en masse : aucun cache à remplir
+        if self.wb_client.offline:
+            return
+        batches = [self.wb_codes[i:i + self.wb_batch_size] for i in range(0, len(self.wb_codes), self.wb_batch_size)]
+        progress["total"] = len(self.wb_codes)
+        for batch in batches:
+            await self.wb_client.get_country_data(batch)
+            progress["done"] += len(batch)
+            # Échec : paires toujours absentes du cache (une paire sans observation y figure)
+            progress["failed"] += len(self.wb_client.uncached_countries(batch))
+
+    async def _warm_oec(self, progress: Dict[str, int]):
+        await self.oec_client.warm_cache(await self.popular_hs_codes(), concurrency=self.concurrency,
+                                         progress=progress)
+
+    async def warm_once(self) -> Dict[str, Dict[str, int]]:
+        """Un passage complet ; retourne la progression finale"""
+        self.progress = self._empty_progress()
+        self.started_at = datetime.utcnow()
+        if self.status != READY:
+            self.status = WARMING
+        results = await asyncio.gather(
+            self._warm_world_bank(self.progress["world_bank"]),
+            self._warm_oec(self.progress["oec"]),
+            return_exceptions=True
+        )
+        for name, result in zip(self.progress, results):
+            if isinstance(result, Exception):
+                logger.error(f"Préchauffage {name} interrompu: {result}")
+        self.rounds += 1
+        self.finished_at = datetime.utcnow()
+        self.status = READY
+        logger.info(f"Préchauffage des caches terminé: {self.progress}")
+        return self.progress
+
+    async def _run(self):
+        while True:
+            try:
+                await self.warm_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Préchauffage des caches impossible: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.status == DISABLED or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run(), name="cache-warmup")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "rounds": self.rounds,
+            "progress": self.progress,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "interval": self.interval,
+        }
@@ -0,0 +1,166 @@
+# Indicateurs Banque mondiale à partir d'un téléchargement en masse (hors ligne)
+# Les fichiers CSV du World Development Indicators (WDICSV.csv / WDIData.csv)
+# ou les archives ZIP « API_<indicateur>_DS2_*.zip » déposés sur disque sont
+# lus en flux et rangés dans un tableau NumPy pays × indicateur × année.
+# WorldBankAPIClient répond alors sans aucun appel HTTP (mode hors ligne).
+
+import csv
+import io
+import logging
+import zipfile
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Colonnes d'identification des fichiers de la Banque mondiale
+COUNTRY_CODE = "Country Code"
+INDICATOR_CODE = "Indicator Code"
+
+
+def _iter_csv_rows(text: Iterable[str]) -> Iterator[Tuple[str, str, Dict[int, float]]]:
+    """
+    (ISO3, indicateur, {année: valeur}) pour chaque ligne d'un CSV de la Banque mondiale
+
+    Les lignes de préambule des fichiers API_* (« Data Source », « Last
+    Updated Date ») précédant l'en-tête sont ignorées.
+    """
+    header: Optional[List[str]] = None
+    for values in csv.reader(text):
+        if header is None:
+            if COUNTRY_CODE in values and INDICATOR_CODE in values:
+                header = [value.strip() for value in values]
+                country_index = header.index(COUNTRY_CODE)
+                indicator_index = header.index(INDICATOR_CODE)
+                year_columns = [(i, int(name)) for i, name in enumerate(header) if name.isdigit()]
+            continue
+        if len(values) <= max(country_index, indicator_index):
+            continue
+        observations = {}
+        for index, year in year_columns:
+            if index < len(values) and values[index].strip():
+                try:
+                    observations[year] = float(values[index])
+                except ValueError:
+                    continue
+        yield values[country_index].strip(), values[indicator_index].strip(), observations
+
+
+def iter_indicator_rows(path: Union[str, Path]) -> Iterator[Tuple[str, str, Dict[int, float]]]:
+    """Lignes d'un fichier CSV, d'une archive ZIP ou de tous ceux d'un répertoire"""
+    path = Path(path)
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            if child.suffix.lower() in (".csv", ".zip"):
+                yield from iter_indicator_rows(child)
+        return
+    if path.suffix.lower() == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                # Les fichiers Metadata_* décrivent pays et indicateurs, sans observations
+                if not name.lower().endswith(".csv") or Path(name).name.startswith("Metadata"):
+                    continue
+                with archive.open(name) as raw:
+                    yield from _iter_csv_rows(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+        return
+    if path.name.startswith("Metadata"):
+        return
+    with open(path, encoding="utf-8-sig", newline="") as handle:
+        yield from _iter_csv_rows(handle)
+
+
+class IndicatorTable:
+    """
+    Tableau colonnaire des indicateurs : values[pays, indicateur, année]
+
+    Les observations absentes valent NaN ; pays et indicateurs sont indexés par
+    dictionnaire, les années forment un axe contigu.
+    """
+
+    def __init__(self, countries: List[str], indicators: List[str], years: np.ndarray, values: np.ndarray):
+        self.countries = list(countries)
+        self.indicators = list(indicators)
+        self.years = np.asarray(years, dtype=np.int16)
+        self.values = values
+        self.values.setflags(write=False)
+        self.country_index = {code: i for i, code in enumerate(self.countries)}
+        self.indicator_index = {code: i for i, code in enumerate(self.indicators)}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, Dict[int, float]]],
+                  countries: Optional[Collection[str]] = None,
+                  indicators: Optional[Collection[str]] = None) -> "IndicatorTable":
+        """Construire le tableau en ne conservant que les pays et indicateurs demandés"""
+        wanted_countries = set(countries) if countries is not None else None
+        wanted_indicators = set(indicators) if indicators is not None else None
+        kept = []
+        for country, indicator, observations in rows:
+            if wanted_countries is not None and country not in wanted_countries:
+                continue
+            if wanted_indicators is not None and indicator not in wanted_indicators:
+                continue
+            if observations:
+                kept.append((country, indicator, observations))
+
+        country_codes = sorted({country for country, _, _ in kept})
+        indicator_codes = sorted({indicator for _, indicator, _ in kept})
+        all_years = {year for _, _, observations in kept for year in observations}
+        years = np.arange(min(all_years), max(all_years) + 1) if all_years else np.zeros(0, dtype=np.int16)
+
+        values = np.full((len(country_codes), len(indicator_codes), len(years)), np.nan)
+        country_index = {code: i for i, code in enumerate(country_codes)}
+        indicator_index = {code: i for i, code in enumerate(indicator_codes)}
+        first_year = int(years[0]) if len(years) else 0
+        for country, indicator, observations in kept:
+            row = values[country_index[country], indicator_index[indicator]]
+            for year, value in observations.items():
+                row[year - first_year] = value
+        return cls(country_codes, indicator_codes, years, values)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], countries: Optional[Collection[str]] = None,
+             indicators: Optional[Collection[str]] = None) -> "IndicatorTable":
+        table = cls.from_rows(iter_indicator_rows(path), countries, indicators)
+        logger.info(f"Indicateurs Banque mondiale chargés depuis {path}: {table.stats()}")
+        return table
+
+    def latest(self, country: str, indicator: str, first_year: int, last_year: int) -> Optional[Dict[str, Any]]:
+        """
+        Observation de l'année la plus récente de [first_year, last_year], comme l'API
+
+        L'API renvoie une ligne par année même non renseignée ; seule la plus
+        récente est retenue, et l'indicateur est omis si elle est vide.
+        """
+        i, j = self.country_index.get(country), self.indicator_index.get(indicator)
+        if i is None or j is None or not len(self.years):
+            return None
+        last = min(last_year, int(self.years[-1]))
+        if last < max(first_year, int(self.years[0])):
+            return None
+        value = self.values[i, j, last - int(self.years[0])]
+        if np.isnan(value) or not value:
+            return None
+        return {"value": float(value), "date": str(last)}
+
+    def country_data(self, countries: List[str], indicators: List[str], date_range: str) -> Dict[str, Dict[str, Any]]:
+        """Même forme que WorldBankAPIClient.get_country_data, pour une plage « AAAA:AAAA »"""
+        first, _, last = date_range.partition(":")
+        first_year, last_year = int(first), int(last or first)
+        all_data = {country: {} for country in countries}
+        for country in countries:
+            for indicator in indicators:
+                entry = self.latest(country, indicator, first_year, last_year)
+                if entry is not None:
+                    all_data[country][indicator] = entry
+        return all_data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "countries": len(self.countries),
+            "indicators": len(self.indicators),
+            "years": [int(self.years[0]), int(self.years[-1])] if len(self.years) else [],
+            "observations": int(np.count_nonzero(~np.isnan(self.values))),
+            "bytes": int(self.values.nbytes),
+        }
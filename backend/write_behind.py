@@ -0,0 +1,161 @@
+# File d'écriture différée (write-behind) pour les insertions MongoDB
+# Les documents sont mis en file puis insérés par lots avec insert_many,
+# ce qui retire l'aller-retour base de données du temps de réponse.
+# Un lot en échec est réessayé avec un délai croissant avant d'être abandonné.
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Clé dupliquée : le document a déjà été inséré (par une tentative précédente)
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindQueue:
+    """
+    File bornée vidée par lots, par taille (`batch_size`) ou par délai (`flush_interval`)
+
+    Lorsque la file est pleine, `enqueue` attend qu'une place se libère
+    (contre-pression) : la mémoire reste bornée à `max_queue` documents.
+    `on_flush` est appelé avec les documents effectivement insérés de chaque lot.
+    Les documents non insérés sont réessayés `retries` fois, après
+    `retry_backoff`, puis 2×, 4×… ce délai ; seules les erreurs d'écriture
+    propres à un document (hors clé dupliquée) ne sont pas réessayées.
+    """
+
+    def __init__(self, collection, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_queue: int = 10000, name: str = "write_behind",
+                 on_flush: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+                 retries: int = 3, retry_backoff: float = 0.5):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+        self.last_flush_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """Démarrer la tâche de vidage sur la boucle d'événements courante"""
+        if self.running:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.create_task(self._run(), name=self.name)
+
+    async def enqueue(self, document: Dict[str, Any]):
+        """Ajouter un document (attend si la file est pleine)"""
+        if self._closing:
+            raise RuntimeError(f"{self.name}: file en cours d'arrêt")
+        if not self.running:
+            self.start()
+        await self._queue.put(document)
+        self.enqueued += 1
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        """Attendre un premier document puis accumuler jusqu'à la taille ou au délai maximal"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insérer un lot avec réessais ; retourne les documents effectivement insérés"""
+        inserted: List[Dict[str, Any]] = []
+        pending = batch
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += len(pending)
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                await self.collection.insert_many(pending, ordered=False)
+                return inserted + pending
+            except BulkWriteError as e:
+                errors = {error["index"]: error.get("code") for error in e.details.get("writeErrors", [])}
+                inserted += [doc for i, doc in enumerate(pending) if errors.get(i, DUPLICATE_KEY) == DUPLICATE_KEY]
+                rejected = [doc for i, doc in enumerate(pending) if errors.get(i, DUPLICATE_KEY) != DUPLICATE_KEY]
+                logger.error(f"{self.name}: {len(rejected)} documents refusés sur {len(pending)}: {e}")
+                return inserted
+            except Exception as e:
+                logger.warning(f"{self.name}: échec d'insertion de {len(pending)} documents "
+                               f"(tentative {attempt + 1}/{self.retries + 1}): {e}")
+        return inserted
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            inserted = await self._insert(batch)
+            self.written += len(inserted)
+            self.failed += len(batch) - len(inserted)
+            if len(inserted) < len(batch):
+                logger.error(f"{self.name}: {len(batch) - len(inserted)} documents abandonnés")
+            if inserted and self.on_flush is not None:
+                try:
+                    await self.on_flush(inserted)
+                except Exception as e:
+                    logger.error(f"{self.name}: échec du traitement post-écriture: {e}")
+        finally:
+            self.batches += 1
+            self.last_flush_at = time.time()
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            await self._write(batch)
+
+    async def drain(self, timeout: Optional[float] = 30.0):
+        """Arrêt propre : refuser les nouveaux documents et écrire tout ce qui reste"""
+        if self._queue is None:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{self.name}: {self._queue.qsize()} documents non écrits à l'arrêt")
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retried": self.retried,
+            "last_flush_at": self.last_flush_at,
+        }
@@ -30,6 +30,20 @@ const countryFlags = {
   'TZ': '🇹🇿', 'TG': '🇹🇬', 'TN': '🇹🇳', 'UG': '🇺🇬', 'ZM': '🇿🇲', 'ZW': '🇿🇼'
 };
 
+// Variation SSE appliquée à un classement de /statistics : les entrées affichées sont mises à jour
+// puis retriées ; une clé absente du classement n'y entre qu'au prochain instantané (total inconnu)
+const patchRanking = (rows, changes, sortField) => {
+  if (!rows || !changes) return rows;
+  return rows.map((row) => {
+    const change = changes[row._id];
+    if (!change) return row;
+    const patched = { ...row, count: row.count + change.count };
+    if ('total_savings' in row) patched.total_savings = row.total_savings + change.total_savings;
+    if ('avg_savings' in row) patched.avg_savings = (row.avg_savings * row.count + change.total_savings) / patched.count;
+    return patched;
+  }).sort((a, b) => b[sortField] - a[sortField]);
+};
+
 function ZLECAfCalculator() {
   const [countries, setCountries] = useState([]);
   const [originCountry, setOriginCountry] = useState('');
@@ -96,7 +110,40 @@ function ZLECAfCalculator() {
 
   useEffect(() => {
     fetchCountries();
-    fetchStatistics();
+  }, []);
+
+  // Statistiques poussées par le serveur (SSE) : instantané à l'ouverture (et à chaque reconnexion),
+  // puis variations après chaque lot de calculs enregistrés (vue d'ensemble et classements)
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') {
+      fetchStatistics();
+      return undefined;
+    }
+    const events = new EventSource(`${API}/events?topics=statistics`);
+    events.addEventListener('statistics_snapshot', (event) => {
+      setStatistics(JSON.parse(event.data));
+    });
+    events.addEventListener('statistics', (event) => {
+      const delta = JSON.parse(event.data);
+      setStatistics((current) => {
+        if (!current || !current.overview) return current;
+        return {
+          ...current,
+          overview: {
+            ...current.overview,
+            total_calculations: (current.overview.total_calculations || 0) + delta.total_calculations,
+            total_savings: (current.overview.total_savings || 0) + delta.total_savings
+          },
+          trade_statistics: current.trade_statistics && {
+            ...current.trade_statistics,
+            most_active_countries: patchRanking(current.trade_statistics.most_active_countries, delta.origin_country, 'count'),
+            popular_hs_codes: patchRanking(current.trade_statistics.popular_hs_codes, delta.hs_code, 'count'),
+            top_beneficiary_sectors: patchRanking(current.trade_statistics.top_beneficiary_sectors, delta.sector, 'total_savings')
+          }
+        };
+      });
+    });
+    return () => events.close();
   }, []);
 
   useEffect(() => {
@@ -128,6 +175,27 @@ function ZLECAfCalculator() {
     }
   };
 
+  // Top producteurs africains récupérés après l'affichage des droits et taxes
+  const fetchTopProducers = async (calculation) => {
+    try {
+      const response = await axios.get(`${API}/trade-enrichment`, {
+        params: {
+          origin_country: calculation.origin_country,
+          destination_country: calculation.destination_country,
+          hs_code: calculation.hs_code,
+          include: 'producers'
+        }
+      });
+      setResult((current) => (
+        current && current.id === calculation.id
+          ? { ...current, top_african_producers: response.data.top_african_producers }
+          : current
+      ));
+    } catch (error) {
+      console.error('Erreur lors du chargement des producteurs:', error);
+    }
+  };
+
   const fetchPartnerImportStats = async () => {
     if (!destinationCountry || hsCode.length < 4) return;
     
@@ -195,10 +263,10 @@ function ZLECAfCalculator() {
         destination_country: destinationCountry,
         hs_code: hsCode,
         value: parseFloat(value)
-      });
+      }, { params: { include: 'none' } });
       
       setResult(response.data);
-      await fetchStatistics();
+      fetchTopProducers(response.data);
       await fetchRulesOfOrigin(hsCode);
       await fetchPartnerImportStats();
       
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Configuration commune des tests
+
+server.py lit sa configuration à l'import (aucune connexion n'est ouverte) :
+les variables d'environnement sont fixées ici, avant l'import des modules de test.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'zlecaf_test')
+os.environ.setdefault('OEC_CACHE_DIR', tempfile.mkdtemp())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Tests des caches de données externes (backend/cache.py)
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from cache import TTLCache, PersistentCache, SingleFlight, FRESH, STALE, MISS, main as cache_main
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_states():
+    """Une entrée passe de fraîche à périmée puis absente"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=10, stale_ttl=5, clock=clock)
+    cache.set("k", 1)
+
+    assert cache.lookup("k") == (1, FRESH)
+    clock.now = 12
+    assert cache.lookup("k") == (1, STALE)
+    clock.now = 16
+    assert cache.lookup("k") == (None, MISS)
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    """L'entrée la moins récemment utilisée est évincée"""
+    cache = TTLCache(maxsize=2, ttl=60, stale_ttl=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_get_or_fetch_counts_and_skips_none():
+    """Un hit ne rappelle pas la source ; les échecs ne sont pas mis en cache"""
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=0)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"value": 42}
+
+    async def failing():
+        return None
+
+    async def scenario():
+        assert await cache.get_or_fetch("k", fetch) == {"value": 42}
+        assert await cache.get_or_fetch("k", fetch) == {"value": 42}
+        assert await cache.get_or_fetch("missing", failing) is None
+        assert await cache.get_or_fetch("missing", failing) is None
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+
+
+def test_stale_while_revalidate():
+    """Une entrée périmée est servie immédiatement puis rafraîchie en arrière-plan"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=10, stale_ttl=100, clock=clock)
+    cache.set("k", "old")
+    clock.now = 20
+
+    async def fetch():
+        return "new"
+
+    async def scenario():
+        assert await cache.get_or_fetch("k", fetch) == "old"
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert cache.lookup("k") == ("new", FRESH)
+
+    asyncio.run(scenario())
+    assert cache.stats()["background_refreshes"] == 1
+
+
+def test_persistent_cache_survives_reopen(tmp_path):
+    """Les entrées sont relues après réouverture du fichier SQLite"""
+    path = tmp_path / 'oec.sqlite3'
+    cache = PersistentCache(path, namespace='top_producers', ttl=3600)
+    cache.set('8701:2021', [{'country_code': 'ZAF', 'export_value': 10}])
+    cache.close()
+
+    reopened = PersistentCache(path, namespace='top_producers', ttl=3600)
+    assert reopened.get('8701:2021') == [{'country_code': 'ZAF', 'export_value': 10}]
+    assert reopened.get('0101:2021') is None
+    reopened.close()
+
+
+def test_persistent_cache_expiry_and_snapshot(tmp_path):
+    """Les entrées expirées sont ignorées ; un instantané peut être exporté puis rechargé"""
+    cache = PersistentCache(tmp_path / 'a.sqlite3', ttl=60)
+    cache.set_many({'old': 1}, stored_at=0)
+    cache.set('new', 2)
+    assert cache.get('old') is None
+    assert cache.purge_expired() == 1
+
+    snapshot = tmp_path / 'snapshot.json'
+    assert cache.export_snapshot(snapshot) == 1
+
+    other = PersistentCache(tmp_path / 'b.sqlite3', ttl=60)
+    assert other.load_snapshot(snapshot) == 1
+    assert other.get('new') == 2
+
+
+def test_persistent_cache_memory_front_and_async_access(tmp_path):
+    """aget/aset passent par un thread ; les entrées récentes sont servies depuis la mémoire"""
+    cache = PersistentCache(tmp_path / 'front.sqlite3', ttl=60, memory_size=2)
+
+    async def scenario():
+        await cache.aset('a', [1])
+        await cache.aset('b', [2])
+        await cache.aset('c', [3])
+        first = await cache.aget('a')
+        first.append('modifié')
+        return first, await cache.aget('a'), await cache.aget('missing')
+
+    first, again, missing = asyncio.run(scenario())
+    assert again == [1] and missing is None
+    assert cache.stats()['in_memory'] == 2 and cache.stats()['hits'] == 2
+    cache.close()
+
+
+def test_export_snapshot_cli(tmp_path, monkeypatch, capsys):
+    """python backend/cache.py exporte un instantané rechargeable"""
+    database = tmp_path / 'oec.sqlite3'
+    cache = PersistentCache(database, namespace='top_producers')
+    cache.set('8701:2021', [{'country_code': 'ZAF'}])
+    cache.close()
+
+    snapshot = tmp_path / 'snapshot.json'
+    monkeypatch.setattr(sys, 'argv', ['cache.py', str(database), str(snapshot)])
+    assert cache_main() == 0
+    assert json.loads(capsys.readouterr().out)['entries'] == 1
+
+    other = PersistentCache(tmp_path / 'other.sqlite3', namespace='top_producers')
+    assert other.load_snapshot(snapshot) == 1 and other.get('8701:2021') == [{'country_code': 'ZAF'}]
+    other.close()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Des appels simultanés pour la même clé partagent un seul appel"""
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "CI-SN"
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.do("CIV", fetch) for _ in range(10)))
+        assert results == ["CI-SN"] * 10
+        # L'appel terminé n'est plus partagé
+        assert await flights.do("CIV", fetch) == "CI-SN"
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert flights.stats() == {"in_flight": 0, "originated": 2, "coalesced": 9}
+
+
+def test_stale_refresh_is_deduplicated_and_backs_off():
+    """Une seule tâche par clé périmée ; après un échec, pas de nouvel essai avant refresh_backoff"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=10, stale_ttl=100, clock=clock, refresh_backoff=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    clock.now = 20
+    calls = []
+
+    async def failing(keys):
+        calls.append(list(keys))
+        return None
+
+    async def fetch(keys):
+        calls.append(list(keys))
+        return {key: "new" for key in keys}
+
+    async def scenario():
+        assert cache.refresh_in_background(["a", "b"], failing)
+        assert not cache.refresh_in_background(["a"], failing)
+        await asyncio.sleep(0)
+        assert not cache.refresh_in_background(["a", "b"], fetch)
+        clock.now = 60
+        assert cache.refresh_in_background(["a", "b", "a"], fetch)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert calls == [["a", "b"], ["a", "b"]]
+    assert cache.state("a") == FRESH and cache.stats()["background_refreshes"] == 1
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests de la gestion des index MongoDB (backend/db_indexes.py)
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from db_indexes import CALCULATION_INDEXES, benchmark_cases, _find_execution_stats
+from statistics_rollup import BUCKET_INDEXES, ROLLUP_INDEXES, TOP_READS, top_query
+
+
+def test_benchmark_cases_are_the_statistics_reads():
+    """Le benchmark évalue les lectures de StatisticsRollup, chacune sur un index déclaré"""
+    names = {index.document["name"] for index in ROLLUP_INDEXES + BUCKET_INDEXES}
+    cases = benchmark_cases(datetime(2025, 1, 8))
+    assert [case[0] for case in cases][:len(TOP_READS)] == [name for name, _, _ in TOP_READS]
+    for name, collection, query, sort, limit, index_name in cases:
+        assert index_name in names, name
+        # Le tri suit les clés de l'index après l'égalité : pas de tri en mémoire
+        index = next(i for i in ROLLUP_INDEXES + BUCKET_INDEXES if i.document["name"] == index_name)
+        assert list(index.document["key"].items())[1:] == sort, name
+    assert (cases[0][2], cases[0][3]) == top_query("origin_country", "count")
+    assert cases[-1][2]["bucket_start"]["$gte"] == datetime(2025, 1, 1)
+
+
+def test_no_index_is_a_prefix_of_another():
+    """Un index préfixe d'un index composé est redondant"""
+    keys = [list(index.document["key"].items()) for index in CALCULATION_INDEXES]
+    for i, key in enumerate(keys):
+        for j, other in enumerate(keys):
+            assert i == j or other[:len(key)] != key
+
+
+def test_execution_stats_extraction():
+    """Les compteurs sont trouvés dans les formats d'explain classique et SBE"""
+    classic = {"stages": [{"$cursor": {"executionStats": {"totalDocsExamined": 10, "totalKeysExamined": 0}}}]}
+    sbe = {"executionStats": {"totalDocsExamined": 0, "totalKeysExamined": 54, "executionTimeMillis": 1}}
+
+    assert _find_execution_stats(classic)["totalDocsExamined"] == 10
+    assert _find_execution_stats(sbe)["totalKeysExamined"] == 54
+    assert _find_execution_stats({"ok": 1}) == {}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests des enrichissements à la demande (backend/enrichment.py)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from enrichment import COUNTRY_DATA, ENRICHMENTS, PRODUCERS, fetch_enrichment, parse_include
+
+
+class FakeOEC:
+    def __init__(self):
+        self.calls = []
+
+    async def get_top_producers(self, hs_code):
+        self.calls.append(hs_code)
+        return [{"country_code": "CIV", "export_value": 10}]
+
+
+class FakeWorldBank:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    async def get_country_data(self, codes):
+        self.calls.append(codes)
+        await asyncio.sleep(self.delay)
+        return {"CIV": {"gdp": 1}, "SEN": {"gdp": 2}}
+
+    def cached_country_data(self, codes):
+        return {"CIV": {"gdp": 1}, "SEN": {}}
+
+
+def test_parse_include():
+    """Absent : tout (compatibilité) ; none : rien ; valeurs inconnues refusées"""
+    assert parse_include(None) == ENRICHMENTS
+    assert parse_include("all") == ENRICHMENTS
+    assert parse_include("") == ()
+    assert parse_include("none") == ()
+    assert parse_include(" country_data ,producers") == (PRODUCERS, COUNTRY_DATA)
+    with pytest.raises(ValueError):
+        parse_include("producers,gdp")
+
+
+def test_only_requested_providers_are_called():
+    """Sans enrichissement demandé, aucune API externe n'est interrogée"""
+    oec, wb = FakeOEC(), FakeWorldBank()
+
+    empty = asyncio.run(fetch_enrichment(oec, wb, "870120", "CIV", "SEN", ()))
+    assert empty == {"top_african_producers": [], "origin_country_data": {}, "destination_country_data": {}, "degraded": []}
+    assert oec.calls == [] and wb.calls == []
+
+    producers = asyncio.run(fetch_enrichment(oec, wb, "870120", "CIV", "SEN", (PRODUCERS,)))
+    assert producers["top_african_producers"][0]["country_code"] == "CIV"
+    assert producers["origin_country_data"] == {} and wb.calls == []
+
+    full = asyncio.run(fetch_enrichment(oec, wb, "870120", "CIV", "SEN"))
+    assert full["origin_country_data"] == {"gdp": 1} and full["destination_country_data"] == {"gdp": 2}
+    assert wb.calls == [["CIV", "SEN"]]
+
+
+def test_slow_provider_is_cut_at_the_budget():
+    """Un fournisseur lent est abandonné au budget : données en cache et enrichissement signalé dégradé"""
+    oec, wb = FakeOEC(), FakeWorldBank(delay=5.0)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        enrichment = await fetch_enrichment(oec, wb, "870120", "CIV", "SEN", budget=0.05)
+        return enrichment, loop.time() - started
+
+    enrichment, elapsed = asyncio.run(scenario())
+    assert elapsed < 1.0
+    assert enrichment["degraded"] == [COUNTRY_DATA]
+    assert enrichment["top_african_producers"] and enrichment["origin_country_data"] == {"gdp": 1}
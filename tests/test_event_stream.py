@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests de la diffusion d'événements SSE (backend/event_stream.py)
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from event_stream import EventBroadcaster, format_sse
+from statistics_rollup import statistics_delta
+
+
+def _parse(message: str):
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_format_sse():
+    """Un événement est encodé en lignes id/event/data terminées par une ligne vide"""
+    message = format_sse("job", {"id": "a", "progress": 50.0}, event_id=3)
+    assert message == 'id: 3\nevent: job\ndata: {"id": "a", "progress": 50.0}\n\n'
+
+
+def test_statistics_delta():
+    """La variation regroupe la vue d'ensemble et les compteurs par dimension"""
+    delta = statistics_delta([
+        {"origin_country": "CI", "hs_code": "870120", "savings": 100.0},
+        {"origin_country": "CI", "hs_code": "010121", "savings": 50.0},
+    ])
+    assert delta["total_calculations"] == 2 and delta["total_savings"] == 150.0
+    assert delta["origin_country"]["CI"] == {"count": 2, "total_savings": 150.0}
+    assert set(delta["sector"]) == {"87", "01"}
+
+
+def test_stream_sends_snapshot_then_filtered_events():
+    """L'instantané précède les événements ; sujets et prédicat filtrent ce que reçoit l'abonné"""
+    broadcaster = EventBroadcaster()
+
+    async def scenario():
+        subscription = broadcaster.subscribe(
+            {"statistics", "job"}, accept=lambda topic, data: topic != "job" or data["id"] == "mine"
+        )
+        stream = broadcaster.stream(subscription, [("statistics_snapshot", {"total_calculations": 1})])
+        messages = [await stream.__anext__()]
+        broadcaster.publish("job", {"id": "other"})
+        broadcaster.publish("job", {"id": "mine"})
+        broadcaster.publish("statistics", {"total_calculations": 2})
+        messages += [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return messages
+
+    messages = asyncio.run(scenario())
+    assert [_parse(message)[0] for message in messages] == ["statistics_snapshot", "job", "statistics"]
+    assert _parse(messages[1])[1] == {"id": "mine"}
+    assert broadcaster.stats()["subscribers"] == 0
+
+
+def test_events_already_in_the_snapshot_are_dropped():
+    """Les variations publiées pendant la construction de l'instantané et déjà incluses ne sont pas renvoyées"""
+    broadcaster = EventBroadcaster()
+
+    async def scenario():
+        subscription = broadcaster.subscribe({"statistics"})
+        # Lots 1 et 2 cumulés pendant la lecture de l'instantané (séquence 2), lot 3 ensuite
+        for sequence in (1, 2, 3):
+            broadcaster.publish("statistics", {"total_calculations": 1, "sequence": sequence})
+        stream = broadcaster.stream(
+            subscription, [("statistics_snapshot", {"total_calculations": 2, "sequence": 2})],
+            stale=lambda topic, data: data["sequence"] <= 2
+        )
+        messages = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return messages
+
+    messages = asyncio.run(scenario())
+    assert [_parse(message)[1]["sequence"] for message in messages] == [2, 3]
+
+
+def test_slow_subscriber_drops_oldest_events():
+    """Une file pleine abandonne les événements les plus anciens sans bloquer la publication"""
+    broadcaster = EventBroadcaster(max_queue=2)
+
+    async def scenario():
+        subscription = broadcaster.subscribe({"statistics"})
+        for count in range(5):
+            broadcaster.publish("statistics", {"total_calculations": count})
+        return [subscription.queue.get_nowait()[2] for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [{"total_calculations": 3}, {"total_calculations": 4}]
+    assert broadcaster.stats()["dropped"] == 3
+
+
+def test_heartbeat_when_idle():
+    """Un commentaire keep-alive est émis en l'absence d'événement"""
+    broadcaster = EventBroadcaster()
+
+    async def scenario():
+        stream = broadcaster.stream(broadcaster.subscribe({"job"}), heartbeat=0.01)
+        message = await stream.__anext__()
+        await stream.aclose()
+        return message
+
+    assert asyncio.run(scenario()) == ": keep-alive\n\n"
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Tests de la file de travaux de calcul (backend/job_queue.py)
+"""
+
+import asyncio
+import copy
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from job_queue import JobQueue, COMPLETED, FAILED, QUEUED, RECEIVING, RUNNING, compute_tariff_chunk, init_process_engine
+from landed_cost import calculate_tariff_batch
+from tariff_engine import TariffEngine
+from tax_rates import VAT_RATES
+
+ENGINE = TariffEngine(VAT_RATES.keys())
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict) and "$in" in condition:
+            if document.get(key) not in condition["$in"]:
+                return False
+        elif isinstance(condition, dict) and "$lt" in condition:
+            if document.get(key) is None or not document[key] < condition["$lt"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class UpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction=1):
+        self.documents = sorted(self.documents, key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def __aiter__(self):
+        async def iterate():
+            for document in self.documents:
+                yield copy.deepcopy(document)
+        return iterate()
+
+
+class FakeCollection:
+    """Collection MongoDB minimale en mémoire"""
+
+    def __init__(self):
+        self.documents = []
+
+    async def create_index(self, keys, **kwargs):
+        return "index"
+
+    async def insert_one(self, document):
+        document.setdefault("_id", len(self.documents))
+        self.documents.append(copy.deepcopy(document))
+
+    async def insert_many(self, documents, ordered=True):
+        for document in documents:
+            await self.insert_one(document)
+
+    async def find_one(self, query):
+        for document in self.documents:
+            if _matches(document, query):
+                return copy.deepcopy(document)
+        return None
+
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.documents if _matches(d, query)])
+
+    @staticmethod
+    def _apply(document, update):
+        for key, value in update.get("$set", {}).items():
+            document[key] = value
+        for key, value in update.get("$inc", {}).items():
+            target = document
+            *parents, leaf = key.split(".")
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = target.get(leaf, 0) + value
+
+    async def update_one(self, query, update):
+        for document in self.documents:
+            if _matches(document, query):
+                self._apply(document, update)
+                return UpdateResult(1)
+        return UpdateResult(0)
+
+    async def update_many(self, query, update):
+        matched = [d for d in self.documents if _matches(d, query)]
+        for document in matched:
+            self._apply(document, update)
+        return UpdateResult(len(matched))
+
+    async def find_one_and_update(self, query, update):
+        for document in self.documents:
+            if _matches(document, query):
+                before = copy.deepcopy(document)
+                self._apply(document, update)
+                return before
+        return None
+
+    async def delete_one(self, query):
+        for document in self.documents:
+            if _matches(document, query):
+                self.documents.remove(document)
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def delete_many(self, query):
+        self.documents = [d for d in self.documents if not _matches(d, query)]
+
+
+SHIPMENTS = [
+    {"origin_country": "CI", "destination_country": "SN", "hs_code": "870120", "value": 1000.0 + i, "year": None}
+    for i in range(7)
+] + [{"origin_country": "NG", "destination_country": "MA", "hs_code": "847130", "value": 500.0, "year": 2030}]
+
+
+def _compute(shipments):
+    return compute_tariff_chunk(shipments, ENGINE)
+
+
+def _wait_for(queue, job_id, status=COMPLETED):
+    async def poll():
+        for _ in range(200):
+            job = await queue.status(job_id)
+            if job["status"] == status:
+                return job
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"statut {status} non atteint")
+    return poll()
+
+
+def test_job_runs_in_chunks_and_reports_progress():
+    """Un travail est traité bloc par bloc ; résultats et totaux correspondent au calcul par lot"""
+    progress = []
+    queue = JobQueue(FakeCollection(), FakeCollection(), _compute, chunk_size=3,
+                     on_progress=lambda job: progress.append(job["processed"]))
+
+    async def scenario():
+        await queue.start()
+        job = await queue.submit(SHIPMENTS)
+        assert job["status"] == QUEUED and job["chunks"] == 3
+        done = await _wait_for(queue, job["id"])
+        rows = [row async for row in queue.iter_results(job["id"])]
+        await queue.stop()
+        return done, rows
+
+    done, rows = asyncio.run(scenario())
+    batch = calculate_tariff_batch(
+        ENGINE, [s["destination_country"] for s in SHIPMENTS], [s["hs_code"] for s in SHIPMENTS],
+        [s["value"] for s in SHIPMENTS], [s["year"] for s in SHIPMENTS]
+    )
+
+    assert done["progress"] == 100.0 and done["chunks_done"] == 3
+    assert [row["value"] for row in rows] == [s["value"] for s in SHIPMENTS]
+    assert np.allclose([row["zlecaf_total_cost"] for row in rows], batch["zlecaf_total_cost"])
+    assert np.isclose(done["totals"]["normal_total_cost"], batch["normal_total_cost"].sum())
+    assert progress[:3] == [3, 6, 8]
+
+
+def test_unfinished_jobs_resume_after_restart():
+    """Les travaux persistés en file reprennent au redémarrage, sans refaire les blocs terminés"""
+    jobs, chunks = FakeCollection(), FakeCollection()
+    computed = []
+
+    def compute(shipments):
+        computed.append(len(shipments))
+        return _compute(shipments)
+
+    async def scenario():
+        # Premier processus : le travail est enregistré mais les workers s'arrêtent avant de le traiter
+        first = JobQueue(jobs, chunks, compute, chunk_size=5, workers=0)
+        job = await first.submit(SHIPMENTS)
+        chunks.documents[0].update(done=True, results=[], shipments=[])
+        jobs.documents[0].update(processed=5, chunks_done=1)
+
+        second = JobQueue(jobs, chunks, compute, chunk_size=5)
+        await second.start()
+        done = await _wait_for(second, job["id"])
+        await second.stop()
+        return done
+
+    done = asyncio.run(scenario())
+    assert done["status"] == COMPLETED and done["processed"] == 8
+    assert computed == [3]
+
+
+def test_shipments_are_written_while_streamed():
+    """Les blocs sont écrits au fil de l'itération ; une erreur supprime le travail et ses blocs"""
+    jobs, chunks = FakeCollection(), FakeCollection()
+    queue = JobQueue(jobs, chunks, _compute, chunk_size=3, workers=0)
+    written = []
+
+    async def stream(fail):
+        for index, shipment in enumerate(SHIPMENTS):
+            written.append(len(chunks.documents))
+            if fail and index == 5:
+                raise ValueError("ligne invalide")
+            yield shipment
+
+    async def scenario():
+        job = await queue.submit(stream(fail=False))
+        try:
+            await queue.submit(stream(fail=True))
+        except ValueError:
+            pass
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["status"] == QUEUED and job["total"] == 8 and job["chunks"] == 3
+    assert written[:8] == [0, 0, 0, 1, 1, 1, 2, 2]
+    assert [d["_id"] for d in jobs.documents] == [job["id"]]
+    assert {c["job_id"] for c in chunks.documents} == {job["id"]} and len(chunks.documents) == 3
+
+
+def test_concurrent_submissions_respect_max_pending():
+    """Deux soumissions simultanées pour la dernière place : une seule est admise"""
+    queue = JobQueue(FakeCollection(), FakeCollection(), _compute, workers=0, max_pending=1)
+
+    async def scenario():
+        results = await asyncio.gather(
+            queue.submit(SHIPMENTS[:1]), queue.submit(SHIPMENTS[:1]), return_exceptions=True
+        )
+        await queue.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(r, RuntimeError) for r in results) == 1
+    assert len(queue.jobs.documents) == 1
+
+
+def test_start_requeues_more_jobs_than_max_pending():
+    """Le démarrage reprend tous les travaux inachevés, même au-delà de max_pending"""
+    jobs, chunks = FakeCollection(), FakeCollection()
+
+    async def scenario():
+        first = JobQueue(jobs, chunks, _compute, workers=0, max_pending=10)
+        for _ in range(3):
+            await first.submit(SHIPMENTS[:1])
+        await first.stop()
+        second = JobQueue(jobs, chunks, _compute, max_pending=1)
+        await asyncio.wait_for(second.start(), timeout=5)
+        for job in jobs.documents:
+            await _wait_for(second, job["_id"])
+        await second.stop()
+
+    asyncio.run(scenario())
+    assert all(job["status"] == COMPLETED for job in jobs.documents)
+
+
+def test_job_is_claimed_by_a_single_instance():
+    """Deux instances partageant la base : chaque bloc n'est calculé et compté qu'une fois"""
+    jobs, chunks = FakeCollection(), FakeCollection()
+    computed = []
+
+    def compute(shipments):
+        computed.append(len(shipments))
+        return _compute(shipments)
+
+    async def scenario():
+        first = JobQueue(jobs, chunks, compute, chunk_size=3)
+        second = JobQueue(jobs, chunks, compute, chunk_size=3)
+        job = await first.submit(SHIPMENTS)
+        await second.start()
+        await second._requeue()
+        done = await _wait_for(first, job["id"])
+        await first.stop()
+        await second.stop()
+        return done
+
+    done = asyncio.run(scenario())
+    assert computed == [3, 3, 2]
+    assert done["processed"] == 8 and done["chunks_done"] == 3
+
+
+def test_expired_lease_is_taken_over():
+    """Un travail en cours dont le bail a expiré est repris par une autre instance"""
+    jobs, chunks = FakeCollection(), FakeCollection()
+
+    async def scenario():
+        first = JobQueue(jobs, chunks, _compute, workers=0)
+        job = await first.submit(SHIPMENTS)
+        jobs.documents[0].update(status=RUNNING, owner="crashed", lease_expires_at=datetime.utcnow())
+        live = JobQueue(jobs, chunks, _compute)
+        await live.start()
+        done = await _wait_for(live, job["id"])
+        await live.stop()
+        return done
+
+    done = asyncio.run(scenario())
+    assert done["status"] == COMPLETED and done["processed"] == 8
+
+
+def test_interrupted_upload_is_reaped_after_its_lease():
+    """Un travail resté en réception (instance arrêtée) est supprimé avec ses blocs une fois son bail expiré"""
+    jobs, chunks = FakeCollection(), FakeCollection()
+
+    async def leftover():
+        job_id = "left"
+        await jobs.insert_one({"_id": job_id, "id": job_id, "status": RECEIVING, "owner": "stopped",
+                               "lease_expires_at": datetime.utcnow(), "created_at": datetime.utcnow()})
+        await chunks.insert_one({"job_id": job_id, "index": 0, "done": False, "shipments": SHIPMENTS[:3]})
+        await jobs.insert_one({"_id": "live", "id": "live", "status": RECEIVING, "owner": "other",
+                               "lease_expires_at": datetime.utcnow() + timedelta(minutes=5),
+                               "created_at": datetime.utcnow()})
+        live = JobQueue(jobs, chunks, _compute, workers=0)
+        await live.start()
+        await live.stop()
+
+    asyncio.run(leftover())
+    assert [job["_id"] for job in jobs.documents] == ["live"]
+    assert chunks.documents == []
+
+
+def test_failed_chunk_marks_job_failed():
+    """Une erreur de calcul est enregistrée dans le travail"""
+    def compute(shipments):
+        raise ValueError("calcul impossible")
+
+    queue = JobQueue(FakeCollection(), FakeCollection(), compute)
+
+    async def scenario():
+        job = await queue.submit(SHIPMENTS)
+        failed = await _wait_for(queue, job["id"], FAILED)
+        await queue.stop()
+        return failed
+
+    failed = asyncio.run(scenario())
+    assert "calcul impossible" in failed["error"]
+
+
+def test_full_queue_rejects_submissions():
+    """Au-delà de max_pending travaux en attente, la soumission est refusée"""
+    queue = JobQueue(FakeCollection(), FakeCollection(), _compute, workers=0, max_pending=1)
+
+    async def scenario():
+        await queue.submit(SHIPMENTS[:1])
+        try:
+            await queue.submit(SHIPMENTS[:1])
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(scenario())
+
+
+def test_process_pool_chunk():
+    """Le calcul d'un bloc fonctionne dans un processus séparé initialisé avec le moteur"""
+    countries = list(VAT_RATES.keys())
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_process_engine,
+                             initargs=(str(Path(__file__).parent / "missing-data"), countries, {})) as executor:
+        rows, totals = executor.submit(compute_tariff_chunk, SHIPMENTS).result(timeout=60)
+
+    expected, _ = _compute(SHIPMENTS)
+    assert [row["zlecaf_total_cost"] for row in rows] == [row["zlecaf_total_cost"] for row in expected]
+    assert totals["value"] == sum(s["value"] for s in SHIPMENTS)
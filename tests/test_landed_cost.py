@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests du moteur vectorisé de coût de revient (backend/landed_cost.py)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+import landed_cost
+from landed_cost import (
+    calculate_tariff_batch, calculate_tariff_trajectory, corridor_savings_matrix, solve_max_values,
+    summarize_batch
+)
+from tariff_engine import TariffEngine
+from tax_rates import VAT_RATES, calculate_all_taxes, get_normal_tariff_rate, get_zlecaf_tariff_rate
+
+# Moteur sans surcharge : taux SH2 de tax_rates
+ENGINE = TariffEngine(VAT_RATES.keys())
+
+
+SHIPMENTS = [
+    ("SN", "010121", 10000.0),
+    ("NG", "870120", 250000.0),
+    ("ZA", "999999", 1234.5),
+    ("LY", "610110", 0.0),
+    ("CI", "270900", 98000.0),
+]
+
+
+def test_batch_matches_scalar_calculation():
+    """Chaque ligne du lot correspond au calcul unitaire de calculate_all_taxes"""
+    columns = calculate_tariff_batch(
+        ENGINE,
+        destinations=[s[0] for s in SHIPMENTS],
+        hs_codes=[s[1] for s in SHIPMENTS],
+        values=[s[2] for s in SHIPMENTS],
+    )
+
+    for index, (destination, hs_code, value) in enumerate(SHIPMENTS):
+        normal_amount = value * get_normal_tariff_rate(hs_code[:2])
+        zlecaf_amount = value * get_zlecaf_tariff_rate(hs_code[:2])
+        normal_taxes = calculate_all_taxes(value, normal_amount, destination)
+        zlecaf_taxes = calculate_all_taxes(value, zlecaf_amount, destination)
+
+        assert columns["normal_tariff_amount"][index] == normal_amount
+        assert columns["zlecaf_tariff_amount"][index] == zlecaf_amount
+        assert columns["normal_vat_amount"][index] == normal_taxes["vat_amount"]
+        assert columns["normal_ecowas_levy"][index] == normal_taxes["ecowas_levy_amount"]
+        assert columns["normal_total_cost"][index] == normal_taxes["total_cost"]
+        assert columns["zlecaf_total_cost"][index] == zlecaf_taxes["total_cost"]
+
+
+def test_zero_value_has_no_percentage_division():
+    """Une valeur nulle donne des pourcentages d'économie nuls"""
+    columns = calculate_tariff_batch(ENGINE, ["LY"], ["610110"], [0.0])
+    assert columns["savings_percentage"][0] == 0
+    assert columns["total_savings_percentage"][0] == 0
+
+
+def test_summarize_batch_totals():
+    """Les totaux agrégés sont la somme des lignes"""
+    columns = calculate_tariff_batch(
+        ENGINE,
+        destinations=[s[0] for s in SHIPMENTS],
+        hs_codes=[s[1] for s in SHIPMENTS],
+        values=[s[2] for s in SHIPMENTS],
+    )
+    totals = summarize_batch(columns)
+
+    assert np.isclose(totals["value"], sum(s[2] for s in SHIPMENTS))
+    assert np.isclose(totals["savings"], columns["savings"].sum())
+    expected_pct = totals["total_savings_with_taxes"] / totals["normal_total_cost"] * 100
+    assert np.isclose(totals["total_savings_percentage"], expected_pct)
+
+
+def test_empty_batch():
+    """Un lot vide ne lève pas d'erreur"""
+    columns = calculate_tariff_batch(ENGINE, [], [], [])
+    assert columns["normal_total_cost"].size == 0
+    assert summarize_batch(columns)["total_savings_percentage"] == 0
+
+
+def test_trajectory_matches_batch_per_year():
+    """La trajectoire annuelle correspond au calcul par lot avec la même année"""
+    engine = TariffEngine(VAT_RATES.keys(), overrides=[("NG", "870120", 0.35, 0.0)], schedules=[("NG", "870120", "B")])
+    years = list(range(2025, 2036))
+    trajectory = calculate_tariff_trajectory(engine, "NG", "870120", 50000.0, years)
+    batch = calculate_tariff_batch(engine, ["NG"] * len(years), ["870120"] * len(years), [50000.0] * len(years), years)
+
+    assert trajectory["year"].tolist() == years
+    for name in ["zlecaf_tariff_rate", "zlecaf_total_cost", "normal_total_cost", "total_savings_with_taxes"]:
+        assert np.allclose(trajectory[name], batch[name])
+    # Le droit ZLECAf décroît jusqu'au taux final
+    assert np.all(np.diff(trajectory["zlecaf_tariff_amount"]) <= 0)
+    assert trajectory["zlecaf_tariff_amount"][-1] == 0
+
+
+def test_corridor_matrix_matches_batch_and_is_memoized():
+    """La matrice des corridors correspond au calcul par lot et est mémorisée par version"""
+    countries = ENGINE.countries
+    matrix = corridor_savings_matrix(ENGINE, "87", 20000.0)
+    batch = calculate_tariff_batch(ENGINE, countries, ["87"] * len(countries), [20000.0] * len(countries))
+
+    assert matrix["total_savings_with_taxes"].shape == (len(countries), len(countries))
+    assert np.all(np.isnan(np.diag(matrix["total_savings_with_taxes"])))
+    origin = 0 if countries[0] != "SN" else 1
+    destination = countries.index("SN")
+    assert np.isclose(matrix["total_savings_with_taxes"][origin, destination], batch["total_savings_with_taxes"][destination])
+    assert np.isclose(matrix["total_savings_percentage"][origin, destination], batch["total_savings_percentage"][destination])
+
+    # Deuxième appel : matrices unitaires réutilisées, seule l'échelle change
+    memo_size = len(landed_cost._corridor_memo)
+    doubled = corridor_savings_matrix(ENGINE, "87", 40000.0)
+    assert len(landed_cost._corridor_memo) == memo_size
+    assert np.isclose(doubled["savings"][origin, destination], 2 * matrix["savings"][origin, destination])
+
+
+def test_reverse_solver_inverts_landed_cost():
+    """La valeur maximale trouvée redonne exactement le coût de revient cible"""
+    destinations = ["SN", "NG", "MA", "LY"]
+    solved = solve_max_values(ENGINE, destinations, "870120", 100000.0)
+    normal = calculate_tariff_batch(ENGINE, destinations, ["870120"] * 4, solved["normal_max_value"])
+    zlecaf = calculate_tariff_batch(ENGINE, destinations, ["870120"] * 4, solved["zlecaf_max_value"])
+
+    assert np.allclose(normal["normal_total_cost"], 100000.0)
+    assert np.allclose(zlecaf["zlecaf_total_cost"], 100000.0)
+    assert np.all(solved["value_gain"] >= 0)
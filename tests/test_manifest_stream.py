@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests du calcul de manifestes en flux (backend/manifest_stream.py)
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from landed_cost import calculate_tariff_batch
+from manifest_stream import iter_lines, stream_tariff_results
+from tariff_engine import TariffEngine
+from tax_rates import VAT_RATES
+
+ENGINE = TariffEngine(VAT_RATES.keys())
+COUNTRIES = set(VAT_RATES.keys())
+
+
+async def _chunks(data: bytes, size: int, consumed=None):
+    for start in range(0, len(data), size):
+        if consumed is not None:
+            consumed.append(start)
+        yield data[start:start + size]
+
+
+def _run(fmt: str, data: bytes, chunk_size: int = 2, read_size: int = 7):
+    async def collect():
+        output = b""
+        async for part in stream_tariff_results(ENGINE, _chunks(data, read_size), fmt, COUNTRIES, chunk_size):
+            output += part
+        return [json.loads(line) for line in output.decode("utf-8").splitlines()]
+    return asyncio.run(collect())
+
+
+def test_iter_lines_handles_split_multibyte_characters():
+    """Les lignes sont reconstituées même si un caractère UTF-8 est coupé entre deux morceaux"""
+    data = "é1\r\nà2\nsans fin".encode("utf-8")
+
+    async def collect():
+        return [line async for line in iter_lines(_chunks(data, 1))]
+
+    assert asyncio.run(collect()) == ["é1", "à2", "sans fin"]
+
+
+def test_iter_lines_drops_overlong_lines_and_resumes():
+    """Une ligne trop longue est remplacée par None sans être accumulée ; la ligne suivante est lue"""
+    data = ("a" * 50 + "\nok\n" + "b" * 50).encode("utf-8")
+
+    async def collect():
+        return [line async for line in iter_lines(_chunks(data, 7), max_line_length=20)]
+
+    assert asyncio.run(collect()) == [None, "ok", None]
+
+
+def test_years_outside_schedule_are_line_errors():
+    """Une année hors du calendrier chargé donne une erreur sur la ligne au lieu d'être ramenée à la borne"""
+    data = (
+        "origin_country,destination_country,hs_code,value,year\n"
+        "CI,SN,870120,1000,1800\n"
+        "CI,SN,870120,1000,2041\n"
+        "CI,SN,870120,1000,2040\n"
+    ).encode("utf-8")
+    lines = _run("csv", data)
+
+    assert [line["line"] for line in lines if "error" in line] == [2, 3]
+    assert "2041" in lines[1]["error"]
+    assert lines[-1]["summary"]["count"] == 1
+
+
+def test_csv_stream_matches_batch_and_reports_errors():
+    """Résultats identiques au calcul par lot ; lignes invalides signalées sans interrompre le flux"""
+    data = (
+        "origin_country,destination_country,hs_code,value,year\n"
+        "CI,SN,870120,1000,\n"
+        "CI,XX,870120,1000,\n"
+        "NG,MA,847130,500,2030\n"
+        "\n"
+        "GH,KE,010121,abc,\n"
+        "ZA,NG,610110,2500.5,\n"
+    ).encode("utf-8")
+    lines = _run("csv", data)
+
+    errors = [line for line in lines if "error" in line]
+    results = [line for line in lines if "destination_country" in line]
+    summary = lines[-1]["summary"]
+
+    assert [error["line"] for error in errors] == [3, 6]
+    assert [result["line"] for result in results] == [2, 4, 7]
+    assert summary["count"] == 3 and summary["errors"] == 2
+
+    batch = calculate_tariff_batch(ENGINE, ["SN", "MA", "NG"], ["870120", "847130", "610110"], [1000, 500, 2500.5], [None, 2030, None])
+    assert np.allclose([r["zlecaf_total_cost"] for r in results], batch["zlecaf_total_cost"])
+    assert np.isclose(summary["totals"]["normal_total_cost"], batch["normal_total_cost"].sum())
+
+
+def test_ndjson_stream():
+    """Le NDJSON accepte les champs numériques natifs et rejette les lignes non objets"""
+    data = (
+        '{"origin_country": "CI", "destination_country": "SN", "hs_code": "01", "value": 5}\n'
+        '[1, 2]\n'
+    ).encode("utf-8")
+    lines = _run("ndjson", data)
+    by_line = {line["line"]: line for line in lines[:-1]}
+    assert by_line[1]["destination_country"] == "SN"
+    assert "error" in by_line[2]
+    assert lines[-1]["summary"]["count"] == 1
+
+
+def test_non_finite_and_negative_values_are_rejected():
+    """nan, inf et valeurs négatives donnent une erreur par ligne, sans fausser les totaux"""
+    data = (
+        "origin_country,destination_country,hs_code,value,year\n"
+        "CI,SN,870120,nan,\n"
+        "CI,SN,870120,inf,\n"
+        "CI,SN,870120,-10,\n"
+        "CI,SN,870120,1000,\n"
+    ).encode("utf-8")
+    lines = _run("csv", data)
+    ndjson = _run("ndjson", b'{"origin_country": "CI", "destination_country": "SN", "hs_code": "01", "value": NaN}\n')
+
+    assert [line["line"] for line in lines if "error" in line] == [2, 3, 4]
+    summary = lines[-1]["summary"]
+    assert summary["count"] == 1 and np.isfinite(summary["totals"]["normal_total_cost"])
+    assert "error" in ndjson[0] and ndjson[-1]["summary"]["count"] == 0
+
+
+def test_results_are_streamed_before_the_upload_ends():
+    """Le premier bloc est produit avant la lecture complète du corps"""
+    row = "CI,SN,870120,1000,\n"
+    data = ("origin_country,destination_country,hs_code,value,year\n" + row * 1000).encode("utf-8")
+    consumed = []
+
+    async def first_block():
+        stream = stream_tariff_results(ENGINE, _chunks(data, len(row), consumed), "csv", COUNTRIES, chunk_size=10)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(first_block())
+    assert len(first.decode("utf-8").splitlines()) == 10
+    assert len(consumed) < 20
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests de la résilience des appels externes (backend/resilience.py)
+"""
+
+import asyncio
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyTracker, hedged
+import server
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_probes_once():
+    """Ouvert après N échecs, un seul essai admis après le délai, refermé sur succès"""
+    clock = FakeClock()
+    breaker = CircuitBreaker("oec", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.stats()["opened"] == 2
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_adaptive_timeout():
+    """Délai maximal sans historique, puis multiple du p95 borné"""
+    latency = LatencyTracker(minimum=0.5, maximum=10, multiplier=3, min_samples=5)
+    assert latency.timeout() == 10 and latency.hedge_delay() is None
+    for _ in range(20):
+        latency.record(0.1)
+    assert latency.timeout() == 0.5
+    for _ in range(20):
+        latency.record(1.0)
+    assert latency.timeout() == 3.0 and latency.hedge_delay() == 1.0
+
+
+def test_hedged_request_wins_over_slow_first_attempt():
+    """La seconde tentative est lancée après le délai et la plus rapide l'emporte"""
+    delays = [1.0, 0.01]
+    hedges = []
+
+    async def call():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await hedged(call, 0.02, on_hedge=lambda: hedges.append(1))
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == 0.01 and elapsed < 0.5 and hedges == [1]
+
+
+def test_hedged_raises_when_every_attempt_fails():
+    """L'erreur est propagée si aucune tentative ne réussit"""
+    async def call():
+        raise ConnectionError("indisponible")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(hedged(call, 0.01))
+
+
+class UnavailableProvider(BaseHTTPRequestHandler):
+    """Fournisseur en panne : chaque requête reçoit une erreur 503"""
+    requests_seen = []
+
+    def do_GET(self):
+        UnavailableProvider.requests_seen.append(self.path)
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_breaker_stops_calls_to_a_failing_provider():
+    """Après des erreurs 5xx consécutives, le disjoncteur s'ouvre et plus aucune requête n'est émise"""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), UnavailableProvider)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    UnavailableProvider.requests_seen = []
+    client = server.WorldBankAPIClient()
+    client.base_url = f"http://127.0.0.1:{httpd.server_address[1]}/v2"
+    client.breaker.failure_threshold = 2
+
+    async def scenario():
+        try:
+            for country in ('CIV', 'SEN', 'GHA'):
+                assert await client.get_country_data([country]) == {country: {}}
+            return client.breaker.stats()
+        finally:
+            await client.aclose()
+
+    try:
+        stats = asyncio.run(scenario())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert stats['state'] == OPEN and stats['rejected'] == 1
+    assert len(UnavailableProvider.requests_seen) == 2
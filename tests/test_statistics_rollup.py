@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Tests des statistiques cumulées (backend/statistics_rollup.py)
+"""
+
+import asyncio
+import copy
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from pymongo.errors import DuplicateKeyError
+
+from statistics_rollup import (
+    StatisticsRollup, build_rollup_increments, build_bucket_increments, bucket_start, OVERVIEW_ID, REBUILD_ID
+)
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, alternative) for alternative in condition):
+                return False
+            continue
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$gte" in condition and not (value is not None and value >= condition["$gte"]):
+                return False
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+            if "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _apply_update(document, update):
+    for key, value in update.get("$set", {}).items():
+        document[key] = value
+    for key, value in update.get("$inc", {}).items():
+        target = document
+        *parents, leaf = key.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = target.get(leaf, 0) + value
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents = sorted(self.documents, key=lambda d: d.get(field, 0), reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.documents = self.documents[:limit]
+        return self
+
+    async def to_list(self, length):
+        return copy.deepcopy(self.documents[:length])
+
+    def __aiter__(self):
+        async def iterate():
+            for document in self.documents:
+                yield copy.deepcopy(document)
+        return iterate()
+
+
+class FakeCollection:
+    """Collection MongoDB minimale : bulk_write d'UpdateOne avec $inc (champs imbriqués) et $set"""
+
+    def __init__(self, documents=None):
+        self.documents = {d.get("_id", i): d for i, d in enumerate(documents or [])}
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            await self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+
+    async def update_one(self, query, update, upsert=False):
+        document = next((d for d in self.documents.values() if _matches(d, query)), None)
+        if document is None:
+            if not upsert:
+                return
+            if query["_id"] in self.documents:
+                raise DuplicateKeyError("duplicate key")
+            document = self.documents[query["_id"]] = {"_id": query["_id"]}
+        _apply_update(document, update)
+
+    async def find_one_and_update(self, query, update, upsert=False):
+        before = await self.find_one(query)
+        await self.update_one(query, update, upsert=upsert)
+        return before
+
+    async def delete_many(self, query):
+        self.documents = {key: d for key, d in self.documents.items() if not _matches(d, query)}
+
+    async def find_one(self, query, projection=None, sort=None):
+        cursor = FakeCursor([d for d in self.documents.values() if _matches(d, query)])
+        if sort:
+            cursor.sort(sort)
+        return next((copy.deepcopy(d) for d in cursor.documents), None)
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([d for d in self.documents.values() if _matches(d, query or {})])
+
+
+CALCULATIONS = [
+    {"origin_country": "CI", "hs_code": "010121", "savings": 100.0},
+    {"origin_country": "CI", "hs_code": "010129", "savings": 50.0},
+    {"origin_country": "SN", "hs_code": "870120", "savings": 0.0},
+]
+
+
+def test_increments_match_statistics_pipelines():
+    """Les incréments reproduisent les groupements des anciens pipelines /statistics"""
+    increments = build_rollup_increments(CALCULATIONS)
+
+    assert increments[(OVERVIEW_ID, "")] == {"count": 3, "total_savings": 150.0}
+    assert increments[("origin_country", "CI")] == {"count": 2, "total_savings": 150.0}
+    assert increments[("origin_country", "SN")]["count"] == 1
+    assert increments[("hs_code", "010121")] == {"count": 1, "total_savings": 100.0}
+    assert increments[("sector", "01")] == {"count": 2, "total_savings": 150.0}
+    assert increments[("sector", "87")] == {"count": 1, "total_savings": 0.0}
+
+
+def test_empty_batch_has_no_increments():
+    assert build_rollup_increments([]) == {}
+
+
+def test_bucket_start_truncation():
+    timestamp = datetime(2025, 3, 14, 15, 9, 26, 535)
+    assert bucket_start(timestamp, "hour") == datetime(2025, 3, 14, 15)
+    assert bucket_start(timestamp, "day") == datetime(2025, 3, 14)
+
+
+def test_bucket_increments_per_corridor_and_chapter():
+    """Chaque calcul alimente un compartiment horaire et journalier, par corridor et chapitre"""
+    documents = [
+        {"origin_country": "CI", "destination_country": "SN", "hs_code": "010121", "savings": 10.0,
+         "timestamp": datetime(2025, 3, 14, 15, 5)},
+        {"origin_country": "CI", "destination_country": "SN", "hs_code": "870120", "savings": 5.0,
+         "timestamp": datetime(2025, 3, 14, 16, 30)},
+        {"origin_country": "CI", "destination_country": "SN", "hs_code": "870120", "savings": 5.0},
+    ]
+    increments = build_bucket_increments(documents)
+
+    day = increments[("day", datetime(2025, 3, 14))]
+    assert day["count"] == 2
+    assert day["total_savings"] == 15.0
+    assert day["corridors.CI-SN.count"] == 2
+    assert day["chapters.87.total_savings"] == 5.0
+
+    hour = increments[("hour", datetime(2025, 3, 14, 15))]
+    assert hour["count"] == 1 and "chapters.87.count" not in hour
+    assert len(increments) == 3
+
+
+def test_unsafe_keys_stay_out_of_field_paths():
+    """Un code SH ou pays contenant « . » ou « $ » n'entre pas dans le chemin du champ"""
+    documents = [
+        {"origin_country": "CI", "destination_country": "S.N", "hs_code": "1.0121", "savings": 1.0,
+         "timestamp": datetime(2025, 3, 14, 15)},
+        {"origin_country": "CI", "destination_country": "SN", "hs_code": "$x", "savings": 1.0,
+         "timestamp": datetime(2025, 3, 14, 15)},
+    ]
+    day = build_bucket_increments(documents)[("day", datetime(2025, 3, 14))]
+
+    assert day["count"] == 2
+    assert set(day) == {"count", "total_savings", "corridors.CI-SN.count", "corridors.CI-SN.total_savings"}
+
+
+def test_apply_then_read_and_read_range():
+    """apply() cumule les lots ; read() et read_range() restituent compteurs, séries et classements"""
+    stats = StatisticsRollup(FakeCollection(), FakeCollection(), FakeCollection())
+    documents = [
+        {"origin_country": "CI", "destination_country": "SN", "hs_code": "010121", "savings": 10.0,
+         "timestamp": datetime(2025, 3, 14, 15, 5)},
+        {"origin_country": "CI", "destination_country": "SN", "hs_code": "870120", "savings": 5.0,
+         "timestamp": datetime(2025, 3, 14, 16, 30)},
+        {"origin_country": "NG", "destination_country": "MA", "hs_code": "870321", "savings": 20.0,
+         "timestamp": datetime(2025, 3, 15, 9)},
+    ]
+
+    async def scenario():
+        await stats.apply(documents[:2])
+        await stats.apply(documents[2:])
+        await stats.apply([])
+        return (
+            await stats.read(),
+            await stats.read_range(datetime(2025, 3, 14, 12), datetime(2025, 3, 16), "day"),
+            await stats.read_range(datetime(2025, 3, 14, 16), datetime(2025, 3, 14, 17), "hour"),
+        )
+
+    overview, days, hours = asyncio.run(scenario())
+
+    assert overview["total_calculations"] == 3 and overview["total_savings"] == 35.0
+    assert overview["most_active_countries"][0] == {"_id": "CI", "count": 2}
+    assert overview["top_beneficiary_sectors"][0] == {"_id": "87", "count": 2, "total_savings": 25.0}
+
+    assert [point["count"] for point in days["series"]] == [2, 1]
+    assert days["total_calculations"] == 3 and days["total_savings"] == 35.0
+    assert days["top_corridors"][0] == {"_id": "CI-SN", "count": 2, "total_savings": 15.0}
+    assert days["top_hs_chapters"][0] == {"_id": "87", "count": 2, "total_savings": 25.0}
+
+    assert hours["total_calculations"] == 1
+    assert hours["top_hs_chapters"] == [{"_id": "87", "count": 1, "total_savings": 5.0}]
+
+
+class SlowSource(FakeCollection):
+    """Historique parcouru en cédant la main entre deux documents, en notant l'état du cumul"""
+
+    def __init__(self, documents, rollup):
+        super().__init__(documents)
+        self.rollup = rollup
+        self.overview_seen = []
+
+    def find(self, query=None, projection=None):
+        source = self
+
+        class Cursor:
+            def __aiter__(self):
+                async def iterate():
+                    for document in [d for d in source.documents.values() if _matches(d, query or {})]:
+                        await asyncio.sleep(0)
+                        source.overview_seen.append(OVERVIEW_ID in source.rollup.documents)
+                        yield copy.deepcopy(document)
+                return iterate()
+
+        return Cursor()
+
+
+def test_rebuild_is_exclusive_and_writes_overview_last():
+    """Une seule reconstruction à la fois ; la vue d'ensemble n'apparaît qu'à la fin"""
+    rollup = FakeCollection()
+    source = SlowSource([dict(doc, _id=i) for i, doc in enumerate(CALCULATIONS)], rollup)
+    stats = StatisticsRollup(rollup, source)
+
+    async def scenario():
+        results = await asyncio.gather(stats.rebuild(batch_size=2), stats.rebuild(batch_size=2))
+        return results, await stats.read()
+
+    results, overview = asyncio.run(scenario())
+    marker = rollup.documents[REBUILD_ID]
+
+    assert sorted(results) == [False, True]
+    assert source.overview_seen == [False] * len(CALCULATIONS)
+    assert overview["total_calculations"] == 3 and overview["total_savings"] == 150.0
+    assert overview["most_active_countries"][0] == {"_id": "CI", "count": 2}
+    assert marker["rebuilding"] is False and marker["completed_at"] is not None
+
+
+def test_ensure_initialized_resumes_an_interrupted_rebuild():
+    """Un marqueur resté « rebuilding » avec un bail expiré relance la reconstruction ; un marqueur terminé non"""
+    rollup = FakeCollection([
+        {"_id": REBUILD_ID, "rebuilding": True, "owner": "crashed", "completed_at": None,
+         "lease_expires_at": datetime(2000, 1, 1)},
+        {"_id": OVERVIEW_ID, "dimension": OVERVIEW_ID, "key": "", "count": 1, "total_savings": 1.0},
+    ])
+    stats = StatisticsRollup(rollup, FakeCollection([dict(doc, _id=i) for i, doc in enumerate(CALCULATIONS)]))
+
+    async def scenario():
+        await stats.ensure_initialized()
+        first = await stats.read()
+        stats.source.documents.clear()
+        await stats.ensure_initialized()
+        return first, await stats.read()
+
+    first, second = asyncio.run(scenario())
+    assert first["total_calculations"] == 3
+    assert second["total_calculations"] == 3
+
+
+def test_background_initialization_counts_concurrent_writes_once():
+    """Les lots enregistrés pendant la reconstruction attendent sa fin ; ceux sous la limite haute ne sont pas recomptés"""
+    rollup = FakeCollection()
+    source = SlowSource([dict(doc, _id=i) for i, doc in enumerate(CALCULATIONS)], rollup)
+    stats = StatisticsRollup(rollup, source)
+    late = {"_id": 3, "origin_country": "NG", "hs_code": "870321", "savings": 20.0}
+
+    async def writer():
+        # Lot déjà présent dans l'historique au début du parcours, puis lot écrit pendant le parcours
+        await stats.record([dict(CALCULATIONS[2], _id=2)])
+        await asyncio.sleep(0)
+        source.documents[3] = dict(late)
+        await stats.record([dict(late)])
+        return await stats.read()
+
+    async def scenario():
+        stats.start()
+        during = await writer()
+        await stats._task
+        await stats.record([{"_id": 4, "origin_country": "NG", "hs_code": "870321", "savings": 1.0}])
+        return during, await stats.read()
+
+    during, after = asyncio.run(scenario())
+
+    assert during["total_calculations"] == 0
+    assert after["total_calculations"] == 5 and after["total_savings"] == 171.0
+    assert rollup.documents[REBUILD_ID]["high_water"] == 2
+    assert stats.ready and stats._pending == []
+
+
+def test_snapshot_reports_the_last_recorded_batch():
+    """Chaque lot cumulé reçoit un numéro ; l'instantané indique le dernier lot qu'il inclut"""
+    stats = StatisticsRollup(FakeCollection(), FakeCollection())
+    stats.ready = True
+
+    async def scenario():
+        first = await stats.record(CALCULATIONS[:2])
+        second = await stats.record(CALCULATIONS[2:])
+        return first, second, await stats.snapshot()
+
+    first, second, (overview, sequence) = asyncio.run(scenario())
+    assert (first, second, sequence) == (1, 2, 2)
+    assert overview["total_calculations"] == 3
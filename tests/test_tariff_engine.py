@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests du moteur tarifaire précompilé (backend/tariff_engine.py)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from tariff_engine import TariffEngine, normalize_hs_code
+from tax_rates import (
+    VAT_RATES,
+    calculate_all_taxes,
+    DEFAULT_NORMAL_TARIFF_RATE,
+    DEFAULT_ZLECAF_TARIFF_RATE,
+    get_normal_tariff_rate,
+    get_zlecaf_tariff_rate,
+)
+
+COUNTRIES = list(VAT_RATES.keys())
+
+OVERRIDES = [
+    ("MA", "84", 0.10, 0.0),
+    ("MA", "8471", 0.08, None),
+    ("MA", "847130", None, 0.01),
+    ("SN", "870120", 0.35, 0.20),
+]
+
+
+def test_base_tables_without_overrides():
+    """Sans surcharge, les taux sont ceux des tables SH2 de tax_rates"""
+    engine = TariffEngine(COUNTRIES)
+    for hs_code in ["010121", "870120", "610110", "270900"]:
+        assert engine.resolve(hs_code, "SN") == (
+            get_normal_tariff_rate(hs_code[:2]), get_zlecaf_tariff_rate(hs_code[:2])
+        )
+
+
+def test_hs6_hs4_hs2_fallback_per_country():
+    """Résolution SH6 -> SH4 -> SH2, propre à chaque pays de destination"""
+    engine = TariffEngine(COUNTRIES, overrides=OVERRIDES)
+
+    # SH6 : ZLECAf surchargé, NPF hérité de la position SH4
+    assert engine.resolve("847130", "MA") == (0.08, 0.01)
+    # SH6 inconnu : repli sur SH4 puis SH2
+    assert engine.resolve("847190", "MA") == (0.08, 0.0)
+    assert engine.resolve("840110", "MA") == (0.10, 0.0)
+    # Autre pays : tables de base
+    assert engine.resolve("847130", "CI") == (get_normal_tariff_rate("84"), get_zlecaf_tariff_rate("84"))
+    assert engine.resolve("8701.20", "SN") == (0.35, 0.20)
+
+
+def test_unknown_chapter_uses_defaults():
+    """Un code non numérique retombe sur les taux par défaut"""
+    engine = TariffEngine(COUNTRIES)
+    assert engine.resolve("ab", "SN") == (DEFAULT_NORMAL_TARIFF_RATE, DEFAULT_ZLECAF_TARIFF_RATE)
+    assert normalize_hs_code("0101.21") == "010121"
+
+
+def test_resolve_many_matches_resolve():
+    """La résolution vectorisée correspond à la résolution unitaire"""
+    engine = TariffEngine(COUNTRIES, overrides=OVERRIDES)
+    hs_codes = ["847130", "847190", "870120", "010121", "847130"]
+    destinations = ["MA", "MA", "SN", "NG", "CI"]
+    normal, zlecaf = engine.resolve_many(hs_codes, destinations)
+    for index, (hs_code, destination) in enumerate(zip(hs_codes, destinations)):
+        assert (normal[index], zlecaf[index]) == engine.resolve(hs_code, destination)
+
+
+def test_nomenclature_scales_and_is_read_only():
+    """5000 lignes SH6 x 54 pays restent des matrices denses en lecture seule"""
+    nomenclature = [f"{chapter:02d}{position:04d}" for chapter in range(1, 98) for position in range(52)]
+    engine = TariffEngine(COUNTRIES, nomenclature=nomenclature)
+
+    assert len(engine.hs6_rows) >= 5000
+    assert engine.normal_rates.shape == (engine.default_row + 1 + len(engine.hs6_rows), len(COUNTRIES))
+    assert not engine.normal_rates.flags.writeable
+    assert engine.resolve(nomenclature[-1], "ZA") == (
+        get_normal_tariff_rate(nomenclature[-1][:2]), get_zlecaf_tariff_rate(nomenclature[-1][:2])
+    )
+
+
+def test_version_changes_with_overrides():
+    """La version identifie le jeu de taux chargé"""
+    assert TariffEngine(COUNTRIES).version == TariffEngine(COUNTRIES).version
+    assert TariffEngine(COUNTRIES).version != TariffEngine(COUNTRIES, overrides=OVERRIDES).version
+
+
+def test_load_release_files(tmp_path):
+    """Chargement du calendrier SH2 et des taux SH6 par année (ISO3 -> ISO2)"""
+    (tmp_path / "zlecaf_dismantling_schedule.csv").write_text(
+        "Country,HS2,Category,Year_0,Year_5,Year_10,Year_13\n"
+        "MA,84,A,10.0,5.0,2.0,0.0\n"
+    )
+    (tmp_path / "zlecaf_afcfta_rates_by_year_2025.csv").write_text(
+        "country,hs6_code,year,mfn_rate_pct,afcfta_rate_pct,schedule,immediate_flag,source_url\n"
+        "NGA,870120,2025,35,20,B,0,\n"
+        "NGA,870120,2030,35,10,B,0,\n"
+        "NGA,010121,2025,,,A,0,\n"
+    )
+    engine = TariffEngine.load(tmp_path, COUNTRIES, {"NGA": "NG", "MAR": "MA"})
+
+    assert engine.resolve("847130", "MA") == (0.10, 0.0)
+    assert np.isclose(engine.resolve("847130", "MA", 2030)[1], 0.05)
+    assert np.isclose(engine.resolve("870120", "NG")[1], 0.10)
+    assert np.isclose(engine.resolve("870120", "NG", 2027)[1], 0.16)
+    assert engine.resolve("010121", "NG") == (get_normal_tariff_rate("01"), get_zlecaf_tariff_rate("01"))
+
+
+def test_year_cube_categories_and_points():
+    """Le cube annuel applique catégories de démantèlement et points publiés"""
+    engine = TariffEngine(
+        COUNTRIES,
+        overrides=[("MA", "84", 0.10, 0.0), ("NG", "870120", 0.35, 0.0)],
+        schedules=[
+            ("MA", "84", {2025: 0.10, 2030: 0.05, 2035: 0.02, 2038: 0.0}),
+            ("NG", "870120", "B"),
+            ("SN", "610110", "Excluded"),
+        ],
+    )
+    # Points interpolés, hérités par les lignes SH6 sans taux propre
+    assert np.isclose(engine.resolve("847130", "MA", 2025)[1], 0.10)
+    assert np.isclose(engine.resolve("847130", "MA", 2028)[1], 0.07)
+    assert np.isclose(engine.resolve("847130", "MA", 2040)[1], 0.0)
+    # Catégorie B : réduction linéaire sur 10 ans
+    assert np.isclose(engine.resolve("870120", "NG", 2025)[1], 0.35)
+    assert np.isclose(engine.resolve("870120", "NG", 2030)[1], 0.175)
+    assert np.isclose(engine.resolve("870120", "NG", 2035)[1], 0.0)
+    # Exclusion : taux NPF chaque année
+    normal, zlecaf = engine.resolve("610110", "SN", 2030)
+    assert zlecaf == normal
+    # Sans calendrier : taux final quelle que soit l'année
+    assert engine.resolve("010121", "CI", 2026) == engine.resolve("010121", "CI")
+
+
+def test_excluded_lines_keep_mfn_as_final_rate():
+    """Une ligne exclue garde le taux NPF, avec ou sans année, y compris pour ses lignes SH6 héritées"""
+    engine = TariffEngine(COUNTRIES, nomenclature=["847130"],
+                          schedules=[("SN", "847130", "Excluded"), ("SN", "61", "Excluded")])
+    normal = engine.resolve("847130", "SN")[0]
+    assert engine.resolve("847130", "SN") == (normal, normal)
+    assert engine.resolve("847130", "SN", 2030) == engine.resolve("847130", "SN", 2040) == (normal, normal)
+    assert engine.resolve("610110", "SN") == (get_normal_tariff_rate("61"), get_normal_tariff_rate("61"))
+    assert engine.resolve("847130", "CI")[1] == get_zlecaf_tariff_rate("84")
+
+
+def test_resolve_many_with_years():
+    """Résolution vectorisée avec années mélangées (None = taux final)"""
+    engine = TariffEngine(COUNTRIES, overrides=[("NG", "870120", 0.35, 0.0)], schedules=[("NG", "870120", "A")])
+    normal, zlecaf = engine.resolve_many(["870120", "870120", "870120"], ["NG", "NG", "NG"], [2025, None, 2027])
+    assert np.allclose(zlecaf, [0.35, 0.0, 0.35 * 0.6])
+    assert np.allclose(normal, 0.35)
+
+
+def test_years_outside_schedule_are_rejected():
+    """Une année hors de la période chargée lève ValueError au lieu d'être ramenée à la borne"""
+    engine = TariffEngine(COUNTRIES, overrides=[("NG", "870120", 0.35, 0.0)], schedules=[("NG", "870120", "A")])
+    assert engine.check_year(2040) == 2040
+    for year in (1800, 2024, 2041):
+        with pytest.raises(ValueError):
+            engine.resolve("870120", "NG", year)
+        with pytest.raises(ValueError):
+            engine.resolve_many(["870120", "870120"], ["NG", "NG"], [2025, year])
+
+
+def test_affine_coefficients_match_calculate_all_taxes():
+    """total = a·valeur + b·droits pour chacune des 54 destinations"""
+    engine = TariffEngine(COUNTRIES)
+    for country in COUNTRIES:
+        column = engine.country_index[country]
+        a, b = engine.value_coefficient[column], engine.duty_coefficient[column]
+        for value, duty in [(10000.0, 1500.0), (1234.5, 0.0), (0.0, 0.0)]:
+            expected = calculate_all_taxes(value, duty, country)["total_cost"]
+            assert np.isclose(a * value + b * duty, expected)
+    assert engine.duty_coefficient[engine.country_index["SN"]] == 1 + VAT_RATES["SN"] / 100
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests de la matrice creuse des exportations SH4 (backend/trade_matrix.py)
+"""
+
+import asyncio
+import gzip
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from trade_matrix import TradeMatrix, hs4_code, iter_trade_rows
+import server
+
+
+DUMP = (
+    "HS4 ID,Year,Exporter ISO3,Export Value\n"
+    "178703,2021,ZAF,9000\n"
+    "178703,2021,MAR,5000\n"
+    "178703,2021,DEU,90000\n"
+    "178703,2021,EGY,300\n"
+    "178703,2021,EGY,200\n"
+    "178703,2021,NGA,700\n"
+    "178703,2021,KEN,100\n"
+    "178703,2021,TUN,450\n"
+    "178703,2022,ZAF,9500\n"
+    "10101,2021,ETH,12\n"
+    "bad,2021,ETH,x\n"
+)
+AFRICA = {"ZAF", "MAR", "EGY", "NGA", "KEN", "TUN", "ETH"}
+
+
+def _dump(tmp_path: Path) -> Path:
+    path = tmp_path / "exports_hs4.csv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        handle.write(DUMP)
+    return path
+
+
+def test_rows_are_normalized_to_hs4(tmp_path):
+    """Identifiants OEC ramenés au SH4 ; lignes invalides ignorées"""
+    rows = list(iter_trade_rows(_dump(tmp_path)))
+    assert rows[0] == ("8703", "ZAF", 2021, 9000.0)
+    assert ("0101", "ETH", 2021, 12.0) in rows and len(rows) == 10
+
+
+def test_hs6_codes_keep_their_heading_and_other_lengths_are_rejected(tmp_path):
+    """Un code SH6 donne sa position SH4 (847130 -> 8471) ; un code de longueur inattendue est rejeté"""
+    path = tmp_path / "exports_hs6.csv"
+    path.write_text(
+        "HS6,Year,Exporter ISO3,Export Value\n"
+        "847130,2021,ZAF,10\n"
+        "8703,2021,MAR,20\n"
+        "87032,2021,MAR,30\n"
+        "84713000,2021,MAR,40\n"
+    )
+    assert list(iter_trade_rows(path)) == [("8471", "ZAF", 2021, 10.0), ("8703", "MAR", 2021, 20.0)]
+    assert hs4_code("178703", oec_id=True) == "8703" and hs4_code("8703", oec_id=True) is None
+
+
+def test_ingested_matrix_is_memory_mapped_and_ranks_african_exporters(tmp_path):
+    """Doublons additionnés, pays non africains masqués, top 5 trié par valeur"""
+    matrix = TradeMatrix.ingest(_dump(tmp_path), tmp_path / "matrix")
+    assert isinstance(matrix.data, np.memmap) and matrix.stats()["entries"] == 9
+
+    mask = matrix.column_mask(AFRICA)
+    top = matrix.top_exporters("8703", 2021, mask)
+    assert top == [("ZAF", 9000.0), ("MAR", 5000.0), ("NGA", 700.0), ("EGY", 500.0), ("TUN", 450.0)]
+    assert matrix.top_exporters("8703", 2021)[0] == ("DEU", 90000.0)
+    assert matrix.top_exporters("8703", 2022, mask) == [("ZAF", 9500.0)]
+    assert matrix.top_exporters("0101", 2022, mask) == []
+    assert not matrix.covers("9999", 2021)
+
+
+def test_oec_top_producers_from_local_trade_matrix(tmp_path):
+    """Avec une matrice locale, le top des producteurs africains est calculé sans appel à l'API"""
+    matrix = TradeMatrix.build([
+        ("8703", "ZAF", 2021, 9000.0), ("8703", "DEU", 2021, 90000.0), ("8703", "MAR", 2021, 5000.0),
+    ])
+    matrix.save(tmp_path)
+    client = server.OECAPIClient()
+    client.attach_trade_matrix(TradeMatrix.open(tmp_path))
+    client.base_url = "http://127.0.0.1:9"
+
+    producers = asyncio.run(client.get_top_producers("870323"))
+
+    assert [p['country_code'] for p in producers] == ['ZAF', 'MAR']
+    assert producers[0]['country_name'] == server.AFRICAN_COUNTRIES_BY_ISO3['ZAF']['name']
+    assert client.flights.stats()['originated'] == 0
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests du préchauffage des caches externes (backend/warmup.py)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from warmup import DISABLED, PENDING, READY, CacheWarmer
+import server
+
+
+class FakeWorldBank:
+    def __init__(self, offline=False):
+        self.batches = []
+        self.offline = offline
+
+    async def get_country_data(self, countries):
+        self.batches.append(countries)
+        return {country: ({} if country == "SSD" else {"SP.POP.TOTL": 1}) for country in countries}
+
+    def uncached_countries(self, countries):
+        # Requête échouée pour le Soudan du Sud : rien en cache
+        return [country for country in countries if country == "SSD"]
+
+
+class FakeOEC:
+    def __init__(self, fail=False):
+        self.products = []
+        self.fail = fail
+
+    @staticmethod
+    def product_code(hs_code):
+        return hs_code[:4] if len(hs_code) > 4 else hs_code
+
+    async def warm_cache(self, hs_codes, concurrency=8, progress=None):
+        if self.fail:
+            raise ConnectionError("OEC indisponible")
+        products = sorted({self.product_code(code) for code in hs_codes})
+        progress["total"] = len(products)
+        for product in products:
+            self.products.append(product)
+            progress["done"] += 1
+            # Requête échouée pour 9999 : rien en cache
+            progress["failed"] += product == "9999"
+        return len(products) - progress["failed"]
+
+
+async def _popular():
+    return ["870120", "870190", "180100", "9999"]
+
+
+def test_warm_once_covers_every_country_and_popular_hs4():
+    """Tous les pays par lots et chaque SH4 populaire une seule fois ; la progression compte les échecs"""
+    wb, oec = FakeWorldBank(), FakeOEC()
+    warmer = CacheWarmer(wb, oec, ["CIV", "SEN", "GHA", "SSD", "CIV"], _popular, wb_batch_size=2)
+    assert warmer.status == PENDING and not warmer.ready
+
+    progress = asyncio.run(warmer.warm_once())
+
+    assert wb.batches == [["CIV", "SEN"], ["GHA", "SSD"]]
+    assert sorted(oec.products) == ["1801", "8701", "9999"]
+    assert progress["world_bank"] == {"done": 4, "total": 4, "failed": 1}
+    assert progress["oec"] == {"done": 3, "total": 3, "failed": 1}
+    assert warmer.ready and warmer.stats()["status"] == READY
+
+
+def test_failing_provider_does_not_block_readiness():
+    """Un fournisseur en erreur est journalisé ; l'instance devient prête après le passage"""
+    warmer = CacheWarmer(FakeWorldBank(), FakeOEC(fail=True), ["CIV"], _popular)
+    progress = asyncio.run(warmer.warm_once())
+    assert progress["world_bank"]["done"] == 1 and progress["oec"]["done"] == 0
+    assert warmer.ready
+
+
+def test_background_task_and_disabled_mode():
+    """La tâche de fond effectue le premier passage ; désactivé, l'instance est prête d'emblée"""
+    async def scenario():
+        warmer = CacheWarmer(FakeWorldBank(), FakeOEC(), ["CIV"], _popular, interval=3600)
+        warmer.start()
+        for _ in range(100):
+            if warmer.ready:
+                break
+            await asyncio.sleep(0.01)
+        await warmer.stop()
+        return warmer
+
+    assert asyncio.run(scenario()).rounds == 1
+
+    disabled = CacheWarmer(FakeWorldBank(), FakeOEC(), ["CIV"], _popular, enabled=False)
+    disabled.start()
+    assert disabled.ready and disabled.status == DISABLED
+
+
+def test_offline_world_bank_is_not_warmed():
+    """En mode hors ligne, aucun lot Banque mondiale n'est demandé ni compté en échec"""
+    wb, oec = FakeWorldBank(offline=True), FakeOEC()
+    warmer = CacheWarmer(wb, oec, ["CIV", "SSD"], _popular)
+    progress = asyncio.run(warmer.warm_once())
+
+    assert wb.batches == []
+    assert progress["world_bank"] == {"done": 0, "total": 0, "failed": 0}
+    assert warmer.ready
+
+
+def test_popular_hs_codes_fall_back_to_the_shipped_schedule(monkeypatch):
+    """Sans calcul enregistré, les positions SH4 du calendrier livré (lignes SH6) sont préchauffées"""
+    async def empty_rollup(limit):
+        return {"popular_hs_codes": []}
+
+    monkeypatch.setattr(server.statistics_rollup, "read", empty_rollup)
+    codes = asyncio.run(server.popular_hs_codes())
+
+    assert server.tariff_engine.hs6_rows and codes
+    assert len(codes) <= server.WARMUP_HS_LIMIT
+    assert all(len(code) == 4 for code in codes) and codes == sorted(set(codes))
+    assert set(codes) <= {code[:4] for code in server.tariff_engine.hs6_rows}
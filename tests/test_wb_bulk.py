@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests du chargement hors ligne des indicateurs Banque mondiale (backend/wb_bulk.py)
+"""
+
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from wb_bulk import IndicatorTable, iter_indicator_rows
+
+WDI_CSV = (
+    '\ufeff"Country Name","Country Code","Indicator Name","Indicator Code","2020","2021","2022","2023",\n'
+    '"Cote d\'Ivoire","CIV","Population, total","SP.POP.TOTL","26172000","26900000","27700000","28500000",\n'
+    '"Senegal","SEN","Population, total","SP.POP.TOTL","16400000","16900000","17300000","17800000",\n'
+    '"Senegal","SEN","Inflation, consumer prices (annual %)","FP.CPI.TOTL.ZG","2.5","2.2","9.7","",\n'
+    '"France","FRA","Population, total","SP.POP.TOTL","67500000","67700000","67900000","68100000",\n'
+)
+
+API_CSV = (
+    '"Data Source","World Development Indicators",\n'
+    '\n'
+    '"Last Updated Date","2024-06-28",\n'
+    '\n'
+    '"Country Name","Country Code","Indicator Name","Indicator Code","2021","2022",\n'
+    '"Ghana","GHA","GDP (current US$)","NY.GDP.MKTP.CD","79500000000","72800000000",\n'
+)
+
+
+def _write_bulk(directory: Path) -> Path:
+    (directory / "WDICSV.csv").write_text(WDI_CSV, encoding="utf-8")
+    with zipfile.ZipFile(directory / "API_NY.GDP.MKTP.CD_DS2_en_csv_v2.zip", "w") as archive:
+        archive.writestr("API_NY.GDP.MKTP.CD_DS2_en_csv_v2.csv", API_CSV)
+        archive.writestr("Metadata_Country_API_NY.GDP.MKTP.CD_DS2_en_csv_v2.csv", '"Country Code","Region"\n"GHA","Sub-Saharan Africa"\n')
+    return directory
+
+
+def test_reads_wdi_csv_and_api_zip(tmp_path):
+    """Préambule des fichiers API_* ignoré, fichiers Metadata_* exclus, cellules vides omises"""
+    rows = {(country, indicator): obs for country, indicator, obs in iter_indicator_rows(_write_bulk(tmp_path))}
+    assert rows[("GHA", "NY.GDP.MKTP.CD")] == {2021: 79.5e9, 2022: 72.8e9}
+    assert rows[("SEN", "FP.CPI.TOTL.ZG")] == {2020: 2.5, 2021: 2.2, 2022: 9.7}
+    assert len(rows) == 5
+
+
+def test_columnar_table_filters_and_answers_like_the_api(tmp_path):
+    """Seuls les pays demandés sont gardés ; l'année la plus récente de la plage fait foi"""
+    table = IndicatorTable.load(_write_bulk(tmp_path), countries=["CIV", "SEN", "GHA"])
+    assert table.values.shape == (3, 3, 4) and table.stats()["observations"] == 13
+    assert "FRA" not in table.country_index
+
+    data = table.country_data(["CIV", "SEN", "GHA", "MLI"], ["SP.POP.TOTL", "FP.CPI.TOTL.ZG", "NY.GDP.MKTP.CD"], "2020:2023")
+    assert data["CIV"] == {"SP.POP.TOTL": {"value": 28500000.0, "date": "2023"}}
+    # Inflation 2023 non renseignée : omise, comme avec l'API
+    assert data["SEN"] == {"SP.POP.TOTL": {"value": 17800000.0, "date": "2023"}}
+    assert data["GHA"] == {}
+    assert data["MLI"] == {}
+
+    assert table.country_data(["GHA"], ["NY.GDP.MKTP.CD"], "2020:2022")["GHA"]["NY.GDP.MKTP.CD"]["date"] == "2022"
+    assert np.isnan(table.values[table.country_index["GHA"], table.indicator_index["NY.GDP.MKTP.CD"], 0])
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test des requêtes groupées Banque Mondiale contre un serveur local de substitution
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+import server
+
+
+YEARS = ['2023', '2022', '2021', '2020']
+
+
+class WorldBankStandIn(BaseHTTPRequestHandler):
+    """Imite /v2/country/{pays}/indicator/{indicateurs} avec pagination"""
+    requests_seen = []
+
+    def do_GET(self):
+        parsed = urlsplit(self.path)
+        parts = unquote(parsed.path).strip('/').split('/')
+        countries = parts[2].split(';')
+        indicators = parts[4].split(';')
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        WorldBankStandIn.requests_seen.append((countries, indicators, query))
+
+        rows = []
+        for indicator in indicators:
+            for country in countries:
+                for year in YEARS:
+                    # Valeur manquante pour l'inflation 2023 du Sénégal
+                    value = None if (country, indicator, year) == ('SEN', 'FP.CPI.TOTL.ZG', '2023') else float(year)
+                    rows.append({
+                        'indicator': {'id': indicator, 'value': indicator},
+                        'country': {'id': country[:2], 'value': country},
+                        'countryiso3code': country,
+                        'date': year,
+                        'value': value,
+                    })
+
+        per_page = int(query.get('per_page', 50))
+        page = int(query.get('page', 1))
+        pages = max(1, -(-len(rows) // per_page))
+        body = [
+            {'page': page, 'pages': pages, 'per_page': per_page, 'total': len(rows)},
+            rows[(page - 1) * per_page:page * per_page],
+        ]
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _run_against_stand_in(scenario):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), WorldBankStandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    WorldBankStandIn.requests_seen = []
+
+    client = server.WorldBankAPIClient()
+    client.base_url = f"http://127.0.0.1:{httpd.server_address[1]}/v2"
+    try:
+        async def run():
+            try:
+                return await scenario(client)
+            finally:
+                await client.aclose()
+        return asyncio.run(run())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_batch_query_single_round_trip():
+    """Deux pays × quatre indicateurs en une seule requête, même forme de résultat"""
+    async def scenario(client):
+        return await client.get_country_data(['CIV', 'SEN'])
+
+    data = _run_against_stand_in(scenario)
+
+    assert len(WorldBankStandIn.requests_seen) == 1
+    countries, indicators, query = WorldBankStandIn.requests_seen[0]
+    assert countries == ['CIV', 'SEN']
+    assert len(indicators) == 4
+    assert query['source'] == '2'
+
+    assert data['CIV']['NY.GDP.MKTP.CD'] == {'value': 2023.0, 'date': '2023'}
+    assert len(data['CIV']) == 4
+    # Comme la requête unitaire : seule l'observation la plus récente est retenue
+    assert 'FP.CPI.TOTL.ZG' not in data['SEN']
+
+
+def test_batch_query_follows_pagination():
+    """Toutes les pages sont récupérées lorsque le résultat dépasse per_page"""
+    async def scenario(client):
+        client.batch_page_size = 5
+        return await client.get_country_data(['CIV', 'SEN'])
+
+    data = _run_against_stand_in(scenario)
+
+    # 2 pays × 4 indicateurs × 4 années = 32 lignes, soit 7 pages de 5
+    assert len(WorldBankStandIn.requests_seen) == 7
+    assert len(data['CIV']) == 4 and len(data['SEN']) == 3
+
+
+def test_cached_pairs_are_not_refetched():
+    """Un second appel sur les mêmes pays est servi par le cache, y compris les paires sans observation"""
+    async def scenario(client):
+        await client.get_country_data(['CIV', 'SEN'])
+        data = await client.get_country_data(['SEN', 'CIV'])
+        return data, client.uncached_countries(['CIV', 'SEN'])
+
+    data, uncached = _run_against_stand_in(scenario)
+
+    # L'inflation du Sénégal (non renseignée) est mise en cache comme absente : aucune nouvelle requête
+    assert len(WorldBankStandIn.requests_seen) == 1
+    assert len(data['CIV']) == 4 and 'FP.CPI.TOTL.ZG' not in data['SEN']
+    assert uncached == []
+
+
+def test_offline_mode_answers_from_bulk_snapshot_without_http(tmp_path):
+    """En mode hors ligne, les données viennent du téléchargement en masse et aucune requête n'est émise"""
+    (tmp_path / "WDICSV.csv").write_text(
+        '"Country Name","Country Code","Indicator Name","Indicator Code","2022","2023"\n'
+        '"Senegal","SEN","Population, total","SP.POP.TOTL","17300000","17800000"\n',
+        encoding="utf-8"
+    )
+
+    async def scenario(client):
+        client.offline = True
+        client.load_snapshot(tmp_path, ['SEN'])
+        return await client.get_country_data(['SEN', 'CIV']), client.uncached_countries(['SEN', 'CIV'])
+
+    data, uncached = _run_against_stand_in(scenario)
+
+    assert WorldBankStandIn.requests_seen == []
+    assert data == {'SEN': {'SP.POP.TOTL': {'value': 17800000.0, 'date': '2023'}}, 'CIV': {}}
+    # Le cache n'est pas utilisé hors ligne : rien n'est signalé comme manquant
+    assert uncached == []
+
+
+def test_stale_pairs_are_refreshed_once():
+    """Des appels répétés sur des paires périmées ne lancent qu'un rafraîchissement"""
+    async def scenario(client):
+        await client.get_country_data(['CIV'])
+        client.cache.ttl = 0
+        for _ in range(5):
+            await client.get_country_data(['CIV'])
+        await asyncio.sleep(0.5)
+        return client.cache.stats()
+
+    stats = _run_against_stand_in(scenario)
+
+    assert len(WorldBankStandIn.requests_seen) == 2
+    assert stats['background_refreshes'] == 1
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests de la file d'écriture différée (backend/write_behind.py)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Ajouter le backend au path pour l'import
+backend_path = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_path))
+
+from pymongo.errors import BulkWriteError
+
+from write_behind import WriteBehindQueue
+
+
+class FakeCollection:
+    """Collection minimale enregistrant les appels insert_many ; échoue `fail` fois (toujours si True)"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.calls = 0
+        self.fail = fail
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.fail is True or self.calls <= self.fail:
+            raise RuntimeError("base indisponible")
+        self.batches.append(list(documents))
+
+
+def test_flush_by_size():
+    """Les documents sont écrits par lots de batch_size"""
+    collection = FakeCollection()
+    queue = WriteBehindQueue(collection, batch_size=3, flush_interval=0.2, max_queue=100)
+
+    async def scenario():
+        queue.start()
+        for i in range(7):
+            await queue.enqueue({"n": i})
+        await queue.drain()
+
+    asyncio.run(scenario())
+    sizes = [len(batch) for batch in collection.batches]
+    assert sizes[:2] == [3, 3]
+    assert sum(sizes) == 7
+    assert queue.stats()["written"] == 7
+
+
+def test_flush_by_time():
+    """Un lot incomplet est écrit une fois le délai écoulé"""
+    collection = FakeCollection()
+    queue = WriteBehindQueue(collection, batch_size=100, flush_interval=0.05)
+
+    async def scenario():
+        await queue.enqueue({"n": 1})
+        await asyncio.sleep(0.2)
+        assert collection.batches == [[{"n": 1}]]
+        await queue.drain()
+
+    asyncio.run(scenario())
+
+
+def test_backpressure_bounds_memory():
+    """enqueue attend lorsque la file est pleine"""
+    release = None
+
+    class SlowCollection(FakeCollection):
+        async def insert_many(self, documents, ordered=True):
+            await release.wait()
+            await super().insert_many(documents, ordered)
+
+    collection = SlowCollection()
+    queue = WriteBehindQueue(collection, batch_size=1, flush_interval=0.01, max_queue=2)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        # Un document en cours d'écriture + deux en file : le quatrième attend
+        for i in range(3):
+            await queue.enqueue({"n": i})
+            await asyncio.sleep(0.02)
+        blocked = asyncio.ensure_future(queue.enqueue({"n": 3}))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        assert queue.stats()["queued"] == 2
+
+        release.set()
+        await blocked
+        await queue.drain()
+
+    asyncio.run(scenario())
+    assert queue.stats()["written"] == 4
+
+
+def test_drain_rejects_new_documents_and_counts_failures():
+    """Après drain, enqueue est refusé ; les échecs d'insertion sont comptés"""
+    collection = FakeCollection(fail=True)
+    queue = WriteBehindQueue(collection, batch_size=10, flush_interval=0.01, retries=2, retry_backoff=0)
+
+    async def scenario():
+        await queue.enqueue({"n": 1})
+        await queue.drain()
+        try:
+            await queue.enqueue({"n": 2})
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(scenario())
+    assert queue.stats()["failed"] == 1 and collection.calls == 3
+
+
+def test_on_flush_receives_written_batches():
+    """on_flush est appelé après chaque insertion réussie"""
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.append(len(batch))
+
+    queue = WriteBehindQueue(FakeCollection(), batch_size=2, flush_interval=0.01, on_flush=on_flush)
+
+    async def scenario():
+        for i in range(3):
+            await queue.enqueue({"n": i})
+        await queue.drain()
+
+    asyncio.run(scenario())
+    assert sum(flushed) == 3
+
+
+def test_transient_failure_is_retried_with_backoff():
+    """Un échec passager est réessayé après un délai croissant, sans perte"""
+    collection = FakeCollection(fail=2)
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.extend(batch)
+
+    queue = WriteBehindQueue(collection, batch_size=10, flush_interval=0.01, retry_backoff=0.02, on_flush=on_flush)
+
+    async def scenario():
+        await queue.enqueue({"n": 1})
+        started = asyncio.get_running_loop().time()
+        await queue.drain()
+        return asyncio.get_running_loop().time() - started
+
+    elapsed = asyncio.run(scenario())
+    assert elapsed >= 0.06
+    assert collection.calls == 3 and flushed == [{"n": 1}]
+    assert queue.stats()["written"] == 1 and queue.stats()["failed"] == 0 and queue.stats()["retried"] == 2
+
+
+def test_partial_bulk_write_passes_inserted_documents_to_on_flush():
+    """Sur BulkWriteError, seuls les documents insérés (ou déjà présents) sont transmis à on_flush"""
+    class PartialCollection(FakeCollection):
+        async def insert_many(self, documents, ordered=True):
+            self.calls += 1
+            raise BulkWriteError({
+                "writeErrors": [
+                    {"index": 1, "code": 121, "errmsg": "Document failed validation"},
+                    {"index": 2, "code": 11000, "errmsg": "duplicate key"},
+                ],
+                "nInserted": 1,
+            })
+
+    collection = PartialCollection()
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.extend(batch)
+
+    queue = WriteBehindQueue(collection, batch_size=10, flush_interval=0.01, retry_backoff=0, on_flush=on_flush)
+
+    async def scenario():
+        for i in range(3):
+            await queue.enqueue({"n": i})
+        await queue.drain()
+
+    asyncio.run(scenario())
+    assert flushed == [{"n": 0}, {"n": 2}]
+    assert collection.calls == 1
+    assert queue.stats()["written"] == 2 and queue.stats()["failed"] == 1